@@ -0,0 +1,248 @@
+"""Runs the benchmark workloads and reports, for each phase of each one, its
+time, peak memory and how many objects it allocates.
+
+    python -m bench.bench [--engine ENGINE] [--no-optimize] [--repeat N]
+                          [--output FILE] [--baseline FILE] [--save-baseline]
+                          [--threshold T]
+
+Programs are optimized before they are evaluated, as when running a file,
+unless --no-optimize is given. The results are printed as JSON, or written
+to --output. The baseline file holds results for each engine; --save-baseline
+records those of --engine. Every time or peak more than T (a fraction) above
+the baseline of the same engine is reported to stderr and the exit status is
+1."""
+import argparse
+import gc
+import json
+import os
+import platform
+import string
+import sys
+import time
+import tracemalloc
+
+from src.ast import ast_
+from src.lexer.lexer import FastLexer
+from src.lexer.token_ import Token, TokenType
+from src.optimizer.inliner import Inliner, let_counts, names_bound_once
+from src.parser.parser import Parser
+from src.profiler.allocations import TRACKED_TYPES, AllocationCounter
+from src.repl.repl import ENGINES, new_runner, optimized
+
+PROGRAMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "programs")
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+PHASES = ("lex", "parse", "evaluate")
+
+# The objects whose allocations are counted in each phase: the tokens, the
+# AST nodes, and the Monkey objects counted by --alloc-stats.
+ALLOCATED_TYPES = {
+    "lex": (Token,),
+    "parse": tuple(c for c in vars(ast_).values()
+                   if isinstance(c, type) and issubclass(c, ast_.Node) and "__init__" in c.__dict__),
+    "evaluate": TRACKED_TYPES,
+}
+
+# Differences smaller than this are timer noise, whatever their ratio.
+MIN_SECONDS = 0.002
+
+
+class TokenList:
+    """Hands a Parser tokens that were read beforehand, so parsing can be
+    timed apart from lexing."""
+
+    def __init__(self, tokens):
+        self.tokens = iter(tokens)
+        self.eof = tokens[-1]
+
+    def next_token(self):
+        return next(self.tokens, self.eof)
+
+
+def lex(source):
+    tokens = []
+    for token in FastLexer(source):
+        tokens.append(token)
+        if token.token_type == TokenType.EOF:
+            return tokens
+
+
+def parse(tokens):
+    parser = Parser(TokenList(tokens))
+    program = parser.parse_program()
+    if parser.errors:
+        raise ValueError(f"parser errors: {parser.errors}")
+    return program
+
+
+def generated_source(functions=1500):
+    """A long script of many small functions, each called once."""
+    lines = []
+    for i in range(functions):
+        name = generated_name(i)
+        lines.append(f'let {name} = fn(x, y) {{ if (x < y) {{ [x, y, "{name}"] }} '
+                     f'else {{ {{"sum": x + y, "product": x * y}} }} }};')
+        lines.append(f'let {name}_value = {name}({i % 7}, 3);')
+    lines.append("len(" + generated_name(functions - 1) + "_value)")
+    return "\n".join(lines) + "\n"
+
+
+def generated_name(i):
+    letters = string.ascii_lowercase
+    name = ""
+    while True:
+        name = letters[i % 26] + name
+        i //= 26
+        if i == 0:
+            return "fun_" + name
+
+
+def workloads():
+    """Maps each workload's name to its source, in a fixed order."""
+    sources = {}
+    for filename in sorted(os.listdir(PROGRAMS_DIR)):
+        if filename.endswith(".monkey"):
+            with open(os.path.join(PROGRAMS_DIR, filename)) as file:
+                sources[filename[:-len(".monkey")]] = file.read()
+    sources["generated"] = generated_source()
+    return sources
+
+
+def optimize_program(program):
+    """program with small functions inlined and constants folded, as
+    start_with_file runs a script by default."""
+    inliner = Inliner(names_bound_once(let_counts(program)))
+    result = ast_.Program()
+    result.statements = list(optimized(program.statements, inliner))
+    return result
+
+
+def run_phase(phase, value, engine, optimize):
+    if phase == "lex":
+        return lex(value)
+    elif phase == "parse":
+        return parse(value)
+    if optimize:
+        value = optimize_program(value)
+    return new_runner(engine)(value)
+
+
+def measure(source, engine="eval", repeat=3, optimize=True):
+    """Runs source through each phase repeat times and returns, per phase,
+    the best time in seconds. A further run under tracemalloc gives each
+    phase's peak bytes above what was allocated before it, and how many
+    objects of its ALLOCATED_TYPES it allocated, whether or not they were
+    freed before it ended. When optimize is set, the evaluate phase includes
+    optimizing the program, which start_with_file also does as it runs."""
+    results = {phase: {"seconds": float("inf")} for phase in PHASES}
+    value = None
+    for _ in range(repeat):
+        value = source
+        for phase in PHASES:
+            gc.collect()
+            start = time.perf_counter()
+            value = run_phase(phase, value, engine, optimize)
+            results[phase]["seconds"] = min(results[phase]["seconds"], time.perf_counter() - start)
+    output = value.inspect() if value is not None else None
+
+    value = source
+    tracemalloc.start()
+    try:
+        for phase in PHASES:
+            counter = AllocationCounter(types=ALLOCATED_TYPES[phase])
+            counter.start()
+            try:
+                value = run_phase(phase, value, engine, optimize)
+            finally:
+                counter.stop()
+            results[phase]["peak_bytes"] = counter.peak_bytes
+            results[phase]["allocations"] = counter.allocated()
+    finally:
+        tracemalloc.stop()
+    return {"phases": results, "result": output}
+
+
+def run(engine="eval", repeat=3, names=None, optimize=True):
+    benchmarks = {}
+    for name, source in workloads().items():
+        if names and name not in names:
+            continue
+        benchmarks[name] = measure(source, engine, repeat, optimize)
+    return {
+        "engine": engine,
+        "optimize": optimize,
+        "python": platform.python_version(),
+        "benchmarks": benchmarks,
+    }
+
+
+def compare(results, baseline, threshold=0.25):
+    """Lists each time or peak in results more than threshold above the one
+    in baseline, the results of the same engine and mode, as readable
+    lines."""
+    regressions = []
+    if results["engine"] != baseline["engine"]:
+        return [f"baseline is for engine {baseline['engine']}, not {results['engine']}"]
+    if results["optimize"] != baseline["optimize"]:
+        return [f"baseline is for {mode(baseline)}, not {mode(results)}"]
+    for name, benchmark in results["benchmarks"].items():
+        old = baseline["benchmarks"].get(name)
+        if old is None:
+            continue
+        for phase, measures in benchmark["phases"].items():
+            for key in ("seconds", "peak_bytes"):
+                now, then = measures[key], old["phases"][phase][key]
+                if key == "seconds" and now - then < MIN_SECONDS:
+                    continue
+                if now > then * (1 + threshold):
+                    change = (now / then - 1) * 100 if then else float("inf")
+                    regressions.append(f"{name} {phase} {key}: {now:.6g} against {then:.6g} (+{change:.0f}%)")
+    return regressions
+
+
+def mode(results):
+    return "optimized programs" if results["optimize"] else "programs as parsed"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Monkey benchmarks.")
+    parser.add_argument("names", nargs="*", help="Workloads to run (default: all)")
+    parser.add_argument("--engine", choices=ENGINES, default="eval")
+    parser.add_argument("--no-optimize", dest="optimize", action="store_false",
+                        help="Evaluate programs as parsed, as main.py --no-optimize does")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs of each phase; the best is kept")
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout")
+    parser.add_argument("--baseline", default=BASELINE, help="Results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results to --baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Fraction above the baseline counted as a regression")
+    args = parser.parse_args()
+
+    results = run(args.engine, args.repeat, args.names, args.optimize)
+    text = json.dumps(results, indent=2) + "\n"
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text)
+    else:
+        sys.stdout.write(text)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baselines = json.load(file)
+    if args.save_baseline:
+        baselines[args.engine] = results
+        with open(args.baseline, "w") as file:
+            file.write(json.dumps(baselines, indent=2) + "\n")
+        return 0
+    if args.engine not in baselines:
+        sys.stderr.write(f"no baseline for engine {args.engine}\n")
+        return 0
+    regressions = compare(results, baselines[args.engine], args.threshold)
+    for line in regressions:
+        sys.stderr.write(f"regression: {line}\n")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,10 @@
 import getpass
 import argparse
+import glob
+import sys
 
-from src.repl.repl import start, start_with_file
+from src.repl.batch import expand_paths, run_files, write_results
+from src.repl.repl import ENGINES, start, start_with_file
 
 
 def greet_user():
@@ -11,24 +14,94 @@ def greet_user():
 
 
 def get_for_file_input():
-    parser = argparse.ArgumentParser(description="Process a file.")
-    parser.add_argument("file_path", type=str, nargs='?', help="The path to the file to process", default="none")
+    parser = argparse.ArgumentParser(description="Process files.")
+    parser.add_argument("file_paths", type=str, nargs='*',
+                        help="The files to process, or glob patterns matching them; with none, start the REPL")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Processes running the files when there are several, or the jobs of --daemon "
+                             "(default: one per CPU)")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Run jobs sent as JSON lines on stdin, or on --socket, and write a JSON line with the "
+                             "result of each")
+    parser.add_argument("--socket", metavar="PATH", default=None,
+                        help="With --daemon, accept jobs from clients of a Unix domain socket at PATH")
+    parser.add_argument("--engine", choices=ENGINES, default="eval",
+                        help="Execution engine: the tree-walking evaluator, the bytecode VM, the closure compiler "
+                             "or the non-recursive stack evaluator")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always parse the file instead of loading it from __monkeycache__")
+    parser.add_argument("--no-optimize", action="store_true",
+                        help="Run the program as parsed, without inlining, folding constants or pruning branches")
+    parser.add_argument("--inline-stats", action="store_true",
+                        help="Print how many calls to each function were inlined to stderr")
+    parser.add_argument("--memoize", action="store_true",
+                        help="Cache the results of pure recursive top-level functions of the script")
+    parser.add_argument("--memo-size", type=int, default=None,
+                        help="How many results each memoized function keeps (default 4096)")
+    parser.add_argument("--memo-stats", action="store_true",
+                        help="Print the cache hits and misses of each memoized function to stderr")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print the calls to each function and the time spent in it to stderr at exit")
+    parser.add_argument("--profile-json", metavar="FILE", default=None,
+                        help="Write the profile of each function as JSON to FILE")
+    parser.add_argument("--sample", metavar="FILE", default=None,
+                        help="Sample the Monkey call stack while the script runs and write the stacks seen to FILE "
+                             "in the collapsed format of flamegraph.pl")
+    parser.add_argument("--sample-interval", type=float, default=None, metavar="SECONDS",
+                        help="CPU time between samples (default 0.005)")
+    parser.add_argument("--alloc-stats", action="store_true",
+                        help="Print how many objects of each type were allocated and are alive, and the peak "
+                             "memory allocated, to stderr")
+    parser.add_argument("--max-calls", type=int, default=None, metavar="N",
+                        help="Stop a script, or each job of --daemon, with an error after N function calls")
+    parser.add_argument("--timeout", type=float, default=None, metavar="SECONDS",
+                        help="Stop a script, or each job of --daemon, with an error after SECONDS of wall-clock time")
+    parser.add_argument("--max-memory", type=float, default=None, metavar="MB",
+                        help="Stop a script, or each job of --daemon, with an error once the process has grown by "
+                             "about MB megabytes")
 
     args = parser.parse_args()
-    return args.file_path
+    if is_batch(args.file_paths) and (args.profile_json or args.sample):
+        parser.error("--profile-json and --sample take a single file")
+    if args.socket and not args.daemon:
+        parser.error("--socket needs --daemon")
+    if args.daemon and args.file_paths:
+        parser.error("--daemon reads its jobs instead of files")
+    for name in ("max_calls", "timeout", "max_memory"):
+        if getattr(args, name) is not None and getattr(args, name) < 0:
+            parser.error(f"--{name.replace('_', '-')} must not be negative")
+    if args.jobs is not None and args.jobs < 1:
+        parser.error(f"--jobs must be at least 1, got {args.jobs}")
+    return args
+
+
+def is_batch(file_paths):
+    return len(file_paths) > 1 or any(glob.has_magic(path) for path in file_paths)
 
 
 def main():
-    file_path = get_for_file_input()
-    file_mode = file_path != "none"
-    if file_mode:
+    args = get_for_file_input()
+    if args.daemon:
+        from src.daemon.daemon import run_daemon
+
+        limits = dict(max_calls=args.max_calls, timeout=args.timeout, max_memory=args.max_memory)
+        return run_daemon(args.socket, args.jobs, args.engine, limits)
+    options = dict(engine=args.engine, cache=not args.no_cache, optimize=not args.no_optimize,
+                   inline_stats=args.inline_stats, memoize=args.memoize, memo_size=args.memo_size,
+                   memo_stats=args.memo_stats, profile=args.profile, alloc_stats=args.alloc_stats,
+                   max_calls=args.max_calls, timeout=args.timeout, max_memory=args.max_memory)
+    if is_batch(args.file_paths):
+        return write_results(run_files(expand_paths(args.file_paths), args.jobs, **options))
+    elif args.file_paths:
+        file_path = args.file_paths[0]
         print(file_path + " output:")
-        start_with_file(file_path)
+        start_with_file(file_path, profile_json=args.profile_json, sample=args.sample,
+                        sample_interval=args.sample_interval, **options)
         return
     else:
         greet_user()
-        start()
+        start(engine=args.engine, optimize=not args.no_optimize, profile=args.profile)
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
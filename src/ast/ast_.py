@@ -109,6 +109,8 @@ class Identifier(Expression):
     def __init__(self, token, value):
         self.token = token
         self.value = value
+        # Set by src.resolver: where the name is found at run time.
+        self.resolution = None
 
     def expression_node(self):
         pass
@@ -139,6 +141,8 @@ class IntegerLiteral(Expression):
     def __init__(self, token, value):
         self.token = token
         self.value = value
+        # The Integer object built on first evaluation and returned after.
+        self.constant = None
 
     def expression_node(self):
         pass
@@ -172,6 +176,10 @@ class InfixExpression(Expression):
         self.left = left
         self.operator = operator
         self.right = right
+        # Set by the evaluator: a handler specialized for the operand types
+        # seen at this node, and how often its type guard has failed.
+        self.specialized = None
+        self.guard_failures = 0
 
     def expression_node(self):
         pass
@@ -208,6 +216,10 @@ class FunctionLiteral(Expression):
         self.token = token
         self.parameters = parameters
         self.body = body
+        # Set by src.resolver: the names of the frame slots and the slot of
+        # each parameter.
+        self.frame_names = None
+        self.parameter_slots = None
 
     def expression_node(self):
         pass
@@ -241,6 +253,8 @@ class StringLiteral(Expression):
     def __init__(self, token, value):
         self.token = token
         self.value = value
+        # The String object built on first evaluation and returned after.
+        self.constant = None
 
     def expression_node(self):
         pass
@@ -273,6 +287,9 @@ class IndexExpression(Expression):
         self.token = token
         self.left = left
         self.index = index
+        # Set by the evaluator, as for InfixExpression.
+        self.specialized = None
+        self.guard_failures = 0
 
     def expression_node(self):
         pass
@@ -0,0 +1,49 @@
+from src.ast import ast_
+
+
+def collect_nodes(node, nodes, into_functions=True):
+    """Appends node and every node below it, leaving out the bodies of inner
+    function literals unless into_functions is set."""
+    nodes.append(node)
+    node_type = type(node)
+    if node_type is ast_.Program or node_type is ast_.BlockStatement:
+        for statement in node.statements:
+            collect_nodes(statement, nodes, into_functions)
+    elif node_type is ast_.ExpressionStatement:
+        collect_nodes(node.expression, nodes, into_functions)
+    elif node_type is ast_.LetStatement:
+        collect_nodes(node.value, nodes, into_functions)
+    elif node_type is ast_.ReturnStatement:
+        collect_nodes(node.return_value, nodes, into_functions)
+    elif node_type is ast_.PrefixExpression:
+        collect_nodes(node.right, nodes, into_functions)
+    elif node_type is ast_.InfixExpression:
+        collect_nodes(node.left, nodes, into_functions)
+        collect_nodes(node.right, nodes, into_functions)
+    elif node_type is ast_.IndexExpression:
+        collect_nodes(node.left, nodes, into_functions)
+        collect_nodes(node.index, nodes, into_functions)
+    elif node_type is ast_.CallExpression:
+        collect_nodes(node.function, nodes, into_functions)
+        for argument in node.arguments:
+            collect_nodes(argument, nodes, into_functions)
+    elif node_type is ast_.IfExpression:
+        collect_nodes(node.condition, nodes, into_functions)
+        collect_nodes(node.consequence, nodes, into_functions)
+        if node.alternative is not None:
+            collect_nodes(node.alternative, nodes, into_functions)
+    elif node_type is ast_.ArrayLiteral:
+        for element in node.elements:
+            collect_nodes(element, nodes, into_functions)
+    elif node_type is ast_.HashLiteral:
+        for key, value in node.pairs.items():
+            collect_nodes(key, nodes, into_functions)
+            collect_nodes(value, nodes, into_functions)
+    elif node_type is ast_.FunctionLiteral and into_functions:
+        collect_nodes(node.body, nodes, into_functions)
+
+
+def identifier_names(node):
+    nodes = []
+    collect_nodes(node, nodes)
+    return [n.value for n in nodes if type(n) is ast_.Identifier]
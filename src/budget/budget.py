@@ -0,0 +1,190 @@
+import os
+import time
+
+from src.evaluator import closure_compiler, evaluator, stack_evaluator
+from src.object.object import Error
+from src.vm import vm
+
+# Calls between two reads of the clock and of the memory in use.
+CHECK_EVERY = 1024
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class Budget:
+    """Limits one run to max_calls calls to functions and builtins, seconds
+    of wall-clock time and max_bytes of memory above what the process used
+    when it started. A limit of None is no limit.
+
+    The engines call spend() for each call once run_within_budget() has set
+    the budget on them. spend() only counts down; every check_every calls,
+    and whenever the calls left run out, check() reads the clock and the
+    resident memory of the process and raises BudgetExceeded when a limit
+    is passed. Time is thus checked between calls: a single builtin call is
+    never interrupted. So that a few calls cannot allocate far past
+    max_bytes, where the address space of the process can be limited,
+    start() limits it to max_bytes above its size, making larger
+    allocations raise MemoryError, until stop(). Memory is the process's,
+    so it is only approximately the run's."""
+
+    def __init__(self, max_calls=None, seconds=None, max_bytes=None, clock=time.monotonic, check_every=CHECK_EVERY):
+        self.max_calls = max_calls
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.check_every = check_every
+        # Calls granted so far, and how many of those are left.
+        self.calls = 0
+        self.left = 0
+        self.deadline = None
+        self.memory_limit = None
+        # The soft address space limit to restore at stop().
+        self.address_space_limit = None
+
+    def start(self):
+        self.calls = 0
+        self.left = 0
+        self.deadline = self.clock() + self.seconds if self.seconds is not None else None
+        self.memory_limit = resident_bytes() + self.max_bytes if self.max_bytes is not None else None
+        if self.max_bytes is not None:
+            self.limit_address_space()
+        self.grant()
+
+    def stop(self):
+        if self.address_space_limit is not None:
+            import resource
+
+            _, hard = resource.getrlimit(resource.RLIMIT_AS)
+            resource.setrlimit(resource.RLIMIT_AS, (self.address_space_limit, hard))
+            self.address_space_limit = None
+
+    def limit_address_space(self):
+        size = address_space_bytes()
+        if size is None:
+            return
+        try:
+            import resource
+        except ImportError:
+            return
+        soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+        limit = size + self.max_bytes
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        if soft == resource.RLIM_INFINITY or limit < soft:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+            self.address_space_limit = soft
+
+    def spend(self):
+        self.left -= 1
+        if self.left < 0:
+            self.check()
+
+    def check(self):
+        if self.max_calls is not None and self.calls >= self.max_calls:
+            raise BudgetExceeded(f"more than {self.max_calls} calls")
+        if self.deadline is not None and self.clock() > self.deadline:
+            raise BudgetExceeded(self.time_exceeded())
+        if self.memory_limit is not None and resident_bytes() > self.memory_limit:
+            raise BudgetExceeded(self.memory_exceeded())
+        self.grant()
+        # This call is the first of the new grant.
+        self.left -= 1
+
+    def grant(self):
+        granted = self.check_every
+        if self.max_calls is not None:
+            granted = min(granted, self.max_calls - self.calls)
+        self.calls += granted
+        self.left = granted
+
+    def used(self):
+        """The calls made since start()."""
+        return self.calls - self.left
+
+    def charge(self, calls):
+        """Counts calls made for this run in another process, such as a pmap
+        worker. The next spend() checks the other limits."""
+        self.calls = self.used() + calls
+        self.left = 0
+        if self.max_calls is not None and self.calls > self.max_calls:
+            raise BudgetExceeded(f"more than {self.max_calls} calls")
+
+    def seconds_left(self):
+        """The time to the deadline, or None when there is none."""
+        return max(0.0, self.deadline - self.clock()) if self.deadline is not None else None
+
+    def remaining(self):
+        """The limits left to the run, as the max_calls, seconds and
+        max_bytes of a Budget for another process to spend them in."""
+        calls = self.max_calls - self.used() if self.max_calls is not None else None
+        return calls, self.seconds_left(), self.max_bytes
+
+    def time_exceeded(self):
+        return f"ran for more than {self.seconds:g} seconds"
+
+    def memory_exceeded(self):
+        return f"used more than {self.max_bytes} bytes of memory"
+
+
+def new_budget(max_calls=None, timeout=None, max_memory=None):
+    """The Budget for limits given as on the command line, with max_memory in
+    megabytes, or None when there are none."""
+    if max_calls is None and timeout is None and max_memory is None:
+        return None
+    max_bytes = int(max_memory * 1024 * 1024) if max_memory is not None else None
+    return Budget(max_calls, timeout, max_bytes)
+
+
+def resident_bytes():
+    """The memory the process has in RAM, or the most it has had where the
+    current amount cannot be read."""
+    try:
+        return read_statm()[1]
+    except OSError:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Bytes on macOS, kilobytes elsewhere.
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def address_space_bytes():
+    """The size of the address space of the process, or None where it cannot
+    be read."""
+    try:
+        return read_statm()[0]
+    except OSError:
+        return None
+
+
+def read_statm():
+    """The virtual and resident sizes of the process in bytes, on Linux."""
+    with open("/proc/self/statm") as file:
+        fields = file.read().split()
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    return int(fields[0]) * page_size, int(fields[1]) * page_size
+
+
+def run_within_budget(budget, run, *args):
+    """Returns run(*args) with budget set on every engine, or an Error once it
+    is exceeded. With no budget, run is called as it is."""
+    if budget is None:
+        return run(*args)
+    engines = (evaluator, stack_evaluator, closure_compiler, vm)
+    for engine in engines:
+        engine.set_budget(budget)
+    budget.start()
+    try:
+        return run(*args)
+    except BudgetExceeded as e:
+        return Error(f"budget exceeded: {e}")
+    except MemoryError:
+        if budget.max_bytes is None:
+            raise
+        return Error(f"budget exceeded: {budget.memory_exceeded()}")
+    finally:
+        budget.stop()
+        for engine in engines:
+            engine.set_budget(None)
@@ -0,0 +1,265 @@
+import codecs
+import functools
+import hashlib
+import io
+import itertools
+import locale
+import marshal
+import os
+import sys
+
+from src.ast import ast_
+from src.lexer.lexer import CHUNK_SIZE, FastLexer, operators
+from src.lexer.token_ import Token, TokenType
+from src.parser.parser import Parser
+
+CACHE_DIR = "__monkeycache__"
+CACHE_SUFFIX = ".cache"
+MAGIC = b"MONKEYC3"
+
+# The modules whose code decides what a parsed program looks like. A change
+# to any of them gives a new interpreter version and invalidates the cache.
+PARSER_MODULES = ("src/lexer/lexer.py", "src/lexer/token_.py", "src/parser/parser.py", "src/ast/ast_.py")
+
+
+@functools.lru_cache(maxsize=None)
+def interpreter_version():
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    h = hashlib.sha256(sys.version.encode())
+    for module in PARSER_MODULES:
+        with open(os.path.join(root, module), "rb") as file:
+            h.update(file.read())
+    return h.digest()
+
+
+def cache_key(filename):
+    """Hashes the file's content together with the interpreter version."""
+    h = hashlib.sha256(interpreter_version())
+    with open(filename, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 16), b""):
+            h.update(chunk)
+    return h.digest()
+
+
+def hashed_chunks(file, h):
+    """Yields the text of a file opened in binary mode, decoded as open()
+    would in text mode, adding each chunk of bytes to the hash h as it is
+    read."""
+    decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(locale.getpreferredencoding(False))(), True)
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+        h.update(chunk)
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+def cache_path(filename):
+    directory, name = os.path.split(os.path.abspath(filename))
+    return os.path.join(directory, CACHE_DIR, name + CACHE_SUFFIX)
+
+
+def cached_statements(filename):
+    """Yields the top-level statements of a script, like
+    Parser.parse_statements.
+
+    When the cache file for the script was written for the same content and
+    interpreter version, the statements are decoded from it and the script
+    is not lexed or parsed. Otherwise the script is parsed, and each
+    statement is written to a new cache file before it is yielded. The new
+    file replaces the old one once the whole script has been parsed."""
+    key = cache_key(filename)
+    path = cache_path(filename)
+    try:
+        cache = open(path, "rb")
+    except OSError:
+        cache = None
+    loaded = 0
+    if cache is not None:
+        with cache:
+            if cache.read(len(MAGIC) + len(key)) == MAGIC + key:
+                try:
+                    for statement in load_statements(cache):
+                        yield statement
+                        loaded += 1
+                    return
+                except (EOFError, ValueError, TypeError, IndexError, KeyError):
+                    # A damaged file, such as one cut short by a full disk,
+                    # is a miss. The statements already yielded are parsed
+                    # again for the new file but not yielded twice.
+                    pass
+
+    with open(filename, "rb") as file:
+        # The file may have changed since the key was computed, so the key
+        # written is that of the bytes actually parsed.
+        h = hashlib.sha256(interpreter_version())
+        statements = Parser(FastLexer(hashed_chunks(file, h))).parse_statements()
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            out = open(temporary_path, "wb")
+        except OSError:
+            # A read-only directory just goes without a cache.
+            yield from itertools.islice(statements, loaded, None)
+            return
+
+        complete = False
+        try:
+            # The key is filled in once the whole script has been read.
+            out.write(MAGIC + bytes(len(key)))
+            for statement in statements:
+                write_record(out, statement)
+                if loaded:
+                    loaded -= 1
+                else:
+                    yield statement
+            complete = True
+        except GeneratorExit:
+            # The caller stopped at a top-level return. The rest is still
+            # parsed so that the cache is complete.
+            for statement in statements:
+                write_record(out, statement)
+            complete = True
+            raise
+        finally:
+            if complete:
+                # An empty record ends the file, so that one cut short
+                # between records is not taken for a shorter script.
+                out.write(bytes(4))
+                out.seek(len(MAGIC))
+                out.write(h.digest())
+            out.close()
+            if complete:
+                os.replace(temporary_path, path)
+            else:
+                os.remove(temporary_path)
+
+
+def write_record(out, statement):
+    data = marshal.dumps(encode(statement))
+    out.write(len(data).to_bytes(4, "little"))
+    out.write(data)
+
+
+def load_statements(cache):
+    while True:
+        size = cache.read(4)
+        if len(size) < 4:
+            raise EOFError("cache file cut short")
+        size = int.from_bytes(size, "little")
+        if size == 0:
+            return
+        yield decode(marshal.loads(cache.read(size)))
+
+
+# A node is stored as a tuple of plain values that marshal can write, led by
+# its tag. Tokens are rebuilt from the node wherever the parser always makes
+# the same one, so only an ExpressionStatement stores its token, and a
+# FunctionLiteral the position of its `fn`.
+LET, RETURN, EXPRESSION, BLOCK, IDENTIFIER, BOOLEAN, INTEGER, STRING, PREFIX, INFIX, IF, FUNCTION, CALL, \
+    ARRAY, INDEX, HASH = range(16)
+
+LET_TOKEN = Token(TokenType.LET, "let")
+RETURN_TOKEN = Token(TokenType.RETURN, "return")
+IF_TOKEN = Token(TokenType.IF, "if")
+TRUE_TOKEN = Token(TokenType.TRUE, "true")
+FALSE_TOKEN = Token(TokenType.FALSE, "false")
+LBRACE_TOKEN = Token(TokenType.LBRACE, "{")
+LPAREN_TOKEN = Token(TokenType.LPAREN, "(")
+LBRACKET_TOKEN = Token(TokenType.LBRACKET, "[")
+operator_tokens = {literal: Token(token_type, literal) for literal, token_type in operators.items()}
+token_types = {token_type.value: token_type for token_type in TokenType}
+
+
+def encode(node):
+    if node is None:
+        return None
+    return encoders[type(node)](node)
+
+
+def encode_all(nodes):
+    return tuple([encode(n) for n in nodes])
+
+
+encoders = {
+    ast_.LetStatement: lambda n: (LET, n.name.value, encode(n.value)),
+    ast_.ReturnStatement: lambda n: (RETURN, encode(n.return_value)),
+    ast_.ExpressionStatement: lambda n: (EXPRESSION, n.token.token_type.value, n.token.literal,
+                                         encode(n.expression)),
+    ast_.BlockStatement: lambda n: (BLOCK, encode_all(n.statements)),
+    ast_.Identifier: lambda n: (IDENTIFIER, n.value),
+    ast_.Boolean: lambda n: (BOOLEAN, n.value),
+    ast_.IntegerLiteral: lambda n: (INTEGER, n.token.literal),
+    ast_.StringLiteral: lambda n: (STRING, n.value),
+    ast_.PrefixExpression: lambda n: (PREFIX, n.operator, encode(n.right)),
+    ast_.InfixExpression: lambda n: (INFIX, encode(n.left), n.operator, encode(n.right)),
+    ast_.IfExpression: lambda n: (IF, encode(n.condition), encode(n.consequence), encode(n.alternative)),
+    ast_.FunctionLiteral: lambda n: (FUNCTION, tuple([p.value for p in n.parameters]), encode(n.body), n.token.line,
+                                     n.token.column),
+    ast_.CallExpression: lambda n: (CALL, encode(n.function), encode_all(n.arguments)),
+    ast_.ArrayLiteral: lambda n: (ARRAY, encode_all(n.elements)),
+    ast_.IndexExpression: lambda n: (INDEX, encode(n.left), encode(n.index)),
+    ast_.HashLiteral: lambda n: (HASH, encode_all([x for pair in n.pairs.items() for x in pair])),
+}
+
+
+def decode(data):
+    if data is None:
+        return None
+    return decoders[data[0]](data)
+
+
+def decode_all(data):
+    return [decode(d) for d in data]
+
+
+def decode_identifier(name):
+    return ast_.Identifier(Token(TokenType.IDENT, name), name)
+
+
+def decode_integer(literal):
+    # Parsed literals are decimal integers; folding a division can also give
+    # a float, as in `fn(x) { x * (1 / 2) }`.
+    value = int(literal) if literal.lstrip("-").isdigit() else float(literal)
+    return ast_.IntegerLiteral(Token(TokenType.INT, literal), value)
+
+
+def decode_string(value):
+    # Interned the way the parser interns it.
+    if value.isidentifier():
+        value = sys.intern(value)
+    return ast_.StringLiteral(Token(TokenType.STRING, value), value)
+
+
+def decode_function_literal(parameters, body, line, column):
+    token = Token(TokenType.FUNCTION, "fn")
+    token.line = line
+    token.column = column
+    return ast_.FunctionLiteral(token, [decode_identifier(p) for p in parameters], decode(body))
+
+
+def decode_hash(items):
+    nodes = decode_all(items)
+    return ast_.HashLiteral(LBRACE_TOKEN, dict(zip(nodes[::2], nodes[1::2])))
+
+
+decoders = {
+    LET: lambda d: ast_.LetStatement(LET_TOKEN, decode_identifier(d[1]), decode(d[2])),
+    RETURN: lambda d: ast_.ReturnStatement(RETURN_TOKEN, decode(d[1])),
+    EXPRESSION: lambda d: ast_.ExpressionStatement(Token(token_types[d[1]], d[2]), decode(d[3])),
+    BLOCK: lambda d: ast_.BlockStatement(LBRACE_TOKEN, decode_all(d[1])),
+    IDENTIFIER: lambda d: decode_identifier(d[1]),
+    BOOLEAN: lambda d: ast_.Boolean(TRUE_TOKEN if d[1] else FALSE_TOKEN, d[1]),
+    INTEGER: lambda d: decode_integer(d[1]),
+    STRING: lambda d: decode_string(d[1]),
+    PREFIX: lambda d: ast_.PrefixExpression(operator_tokens[d[1]], d[1], decode(d[2])),
+    INFIX: lambda d: ast_.InfixExpression(operator_tokens[d[2]], decode(d[1]), d[2], decode(d[3])),
+    IF: lambda d: ast_.IfExpression(IF_TOKEN, decode(d[1]), decode(d[2]), decode(d[3])),
+    FUNCTION: lambda d: decode_function_literal(d[1], d[2], d[3], d[4]),
+    CALL: lambda d: ast_.CallExpression(LPAREN_TOKEN, decode(d[1]), decode_all(d[2])),
+    ARRAY: lambda d: ast_.ArrayLiteral(LBRACKET_TOKEN, decode_all(d[1])),
+    INDEX: lambda d: ast_.IndexExpression(LBRACKET_TOKEN, decode(d[1]), decode(d[2])),
+    HASH: lambda d: decode_hash(d[1]),
+}
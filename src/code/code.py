@@ -0,0 +1,132 @@
+from typing import List
+
+# Instructions are kept as a flat list of ints: an opcode followed by its
+# operands. Indexing a list is the cheapest thing the VM loop can do in
+# Python, so operands are stored inline instead of being packed into bytes.
+Instructions = List[int]
+
+OP_CONSTANT = 0
+OP_POP = 1
+OP_ADD = 2
+OP_SUB = 3
+OP_MUL = 4
+OP_DIV = 5
+OP_TRUE = 6
+OP_FALSE = 7
+OP_EQUAL = 8
+OP_NOT_EQUAL = 9
+OP_GREATER_THAN = 10
+OP_LESS_THAN = 11
+OP_MINUS = 12
+OP_BANG = 13
+OP_JUMP_NOT_TRUTHY = 14
+OP_JUMP = 15
+OP_NULL = 16
+OP_NONE = 17
+OP_GET_GLOBAL = 18
+OP_SET_GLOBAL = 19
+OP_ARRAY = 20
+OP_HASH = 21
+OP_INDEX = 22
+OP_CALL = 23
+OP_RETURN_VALUE = 24
+OP_GET_LOCAL = 25
+OP_SET_LOCAL = 26
+OP_GET_CELL = 27
+OP_CLOSURE = 28
+OP_GET_FREE = 29
+OP_SET_CELL = 30
+OP_LOAD_CELL = 31
+OP_LOAD_FREE = 32
+
+
+class Definition:
+    def __init__(self, name: str, operand_widths: List[int]):
+        self.name = name
+        self.operand_widths = operand_widths
+
+
+definitions = {
+    OP_CONSTANT: Definition("OpConstant", [4]),
+    OP_POP: Definition("OpPop", []),
+    OP_ADD: Definition("OpAdd", []),
+    OP_SUB: Definition("OpSub", []),
+    OP_MUL: Definition("OpMul", []),
+    OP_DIV: Definition("OpDiv", []),
+    OP_TRUE: Definition("OpTrue", []),
+    OP_FALSE: Definition("OpFalse", []),
+    OP_EQUAL: Definition("OpEqual", []),
+    OP_NOT_EQUAL: Definition("OpNotEqual", []),
+    OP_GREATER_THAN: Definition("OpGreaterThan", []),
+    OP_LESS_THAN: Definition("OpLessThan", []),
+    OP_MINUS: Definition("OpMinus", []),
+    OP_BANG: Definition("OpBang", []),
+    OP_JUMP_NOT_TRUTHY: Definition("OpJumpNotTruthy", [4]),
+    OP_JUMP: Definition("OpJump", [4]),
+    OP_NULL: Definition("OpNull", []),
+    # Pushes a bare None: the value evaluate() gives an empty block or a block
+    # that ends in a let statement.
+    OP_NONE: Definition("OpNone", []),
+    OP_GET_GLOBAL: Definition("OpGetGlobal", [4]),
+    OP_SET_GLOBAL: Definition("OpSetGlobal", [4]),
+    OP_ARRAY: Definition("OpArray", [4]),
+    OP_HASH: Definition("OpHash", [4]),
+    OP_INDEX: Definition("OpIndex", []),
+    OP_CALL: Definition("OpCall", [1]),
+    OP_RETURN_VALUE: Definition("OpReturnValue", []),
+    OP_GET_LOCAL: Definition("OpGetLocal", [2]),
+    OP_SET_LOCAL: Definition("OpSetLocal", [2]),
+    # A local that an inner function refers to is kept in a Cell, which
+    # these read and set.
+    OP_GET_CELL: Definition("OpGetCell", [2]),
+    OP_CLOSURE: Definition("OpClosure", [4, 2]),
+    OP_GET_FREE: Definition("OpGetFree", [2]),
+    OP_SET_CELL: Definition("OpSetCell", [2]),
+    # Push the Cell of a local or of a free variable itself, for OpClosure.
+    OP_LOAD_CELL: Definition("OpLoadCell", [2]),
+    OP_LOAD_FREE: Definition("OpLoadFree", [2]),
+}
+
+
+def lookup(op):
+    definition = definitions.get(op)
+    if definition is None:
+        raise KeyError(f"opcode {op} undefined")
+    return definition
+
+
+def make(op, *operands) -> Instructions:
+    definition = definitions.get(op)
+    if definition is None:
+        return []
+    if len(operands) != len(definition.operand_widths):
+        raise ValueError(f"operand len {len(operands)} does not match defined {len(definition.operand_widths)}")
+    for operand, width in zip(operands, definition.operand_widths):
+        if not 0 <= operand < 1 << (8 * width):
+            raise ValueError(f"operand {operand} does not fit in {width} bytes for {definition.name}")
+    return [op, *operands]
+
+
+def read_operands(definition, ins, offset):
+    operands = list(ins[offset:offset + len(definition.operand_widths)])
+    return operands, len(operands)
+
+
+def instructions_string(ins: Instructions) -> str:
+    out = []
+    i = 0
+    while i < len(ins):
+        definition = lookup(ins[i])
+        operands, read = read_operands(definition, ins, i + 1)
+        out.append(f"{i:04d} {fmt_instruction(definition, operands)}\n")
+        i += 1 + read
+    return "".join(out)
+
+
+def fmt_instruction(definition, operands):
+    count = len(definition.operand_widths)
+    if len(operands) != count:
+        return f"ERROR: operand len {len(operands)} does not match defined {count}\n"
+    if count == 0:
+        return definition.name
+    return definition.name + " " + " ".join(str(o) for o in operands)
@@ -0,0 +1,298 @@
+from src.ast import ast_
+from src.ast.walk import collect_nodes, identifier_names
+from src.code import code
+from src.compiler.symbol_table import (
+    CELL_SCOPE,
+    FREE_SCOPE,
+    GLOBAL_SCOPE,
+    LOCAL_SCOPE,
+    new_enclosed_symbol_table,
+    new_symbol_table,
+)
+from src.evaluator.evaluator import builtins
+from src.object.object import CompiledFunction, new_integer, new_string
+
+infix_ops = {
+    "+": code.OP_ADD,
+    "-": code.OP_SUB,
+    "*": code.OP_MUL,
+    "/": code.OP_DIV,
+    ">": code.OP_GREATER_THAN,
+    "<": code.OP_LESS_THAN,
+    "==": code.OP_EQUAL,
+    "!=": code.OP_NOT_EQUAL,
+}
+
+prefix_ops = {
+    "!": code.OP_BANG,
+    "-": code.OP_MINUS,
+}
+
+builtin_names = list(builtins)
+
+
+class Bytecode:
+    def __init__(self, instructions, constants, global_names):
+        self.instructions = instructions
+        self.constants = constants
+        self.global_names = global_names
+
+
+class CompilationScope:
+    def __init__(self):
+        self.instructions = []
+        # Maps each slot that may be read before it is set to the (scope,
+        # index) of the variable read instead: the free variable of the same
+        # name, or the global.
+        self.outers = {}
+
+
+class Compiler:
+    def __init__(self, symbol_table=None, constants=None):
+        if symbol_table is None:
+            # The builtins are the first globals, which new_globals_store()
+            # fills in, so a top-level let of the same name replaces one for
+            # every function, as it does in the Environment.
+            symbol_table = new_symbol_table()
+            for name in builtin_names:
+                symbol_table.define(name)
+        self.constants = constants if constants is not None else []
+        self.symbol_table = symbol_table
+        self.scopes = [CompilationScope()]
+        self.scope_index = 0
+
+    def current_instructions(self):
+        return self.scopes[self.scope_index].instructions
+
+    def bytecode(self):
+        return Bytecode(self.current_instructions(), self.constants, self.symbol_table.global_names)
+
+    def add_constant(self, obj):
+        self.constants.append(obj)
+        return len(self.constants) - 1
+
+    def emit(self, op, *operands):
+        ins = self.current_instructions()
+        pos = len(ins)
+        ins.extend(code.make(op, *operands))
+        return pos
+
+    def change_operand(self, op_pos, operand):
+        ins = self.current_instructions()
+        ins[op_pos:op_pos + 2] = code.make(ins[op_pos], operand)
+
+    def enter_scope(self):
+        self.scopes.append(CompilationScope())
+        self.scope_index += 1
+        self.symbol_table = new_enclosed_symbol_table(self.symbol_table)
+
+    def leave_scope(self):
+        instructions = self.current_instructions()
+        self.scopes.pop()
+        self.scope_index -= 1
+        self.symbol_table = self.symbol_table.outer
+        return instructions
+
+    def compile(self, node):
+        if isinstance(node, ast_.Program):
+            self.compile_block_value(node.statements)
+            self.emit(code.OP_POP)
+        elif isinstance(node, ast_.ExpressionStatement):
+            self.compile_expression(node.expression)
+            self.emit(code.OP_POP)
+        elif isinstance(node, ast_.LetStatement):
+            self.compile_let_statement(node)
+        elif isinstance(node, ast_.ReturnStatement):
+            self.compile_expression(node.return_value)
+            self.emit(code.OP_RETURN_VALUE)
+        elif isinstance(node, ast_.BlockStatement):
+            self.compile_block_value(node.statements)
+        else:
+            self.compile_expression(node)
+
+    def compile_block_value(self, statements):
+        """Compiles statements so that exactly one value is left on the stack:
+        the value evaluate() would give for the same block."""
+        if not statements:
+            self.emit(code.OP_NONE)
+            return
+        for statement in statements[:-1]:
+            self.compile(statement)
+        last = statements[-1]
+        if isinstance(last, ast_.ExpressionStatement):
+            self.compile_expression(last.expression)
+        else:
+            self.compile(last)
+            if not isinstance(last, ast_.ReturnStatement):
+                self.emit(code.OP_NONE)
+
+    def compile_let_statement(self, node):
+        self.compile_expression(node.value)
+        symbol = self.symbol_table.define(node.name.value)
+        if symbol.scope == GLOBAL_SCOPE:
+            self.emit(code.OP_SET_GLOBAL, symbol.index)
+        elif symbol.scope == CELL_SCOPE:
+            self.emit(code.OP_SET_CELL, symbol.index)
+        else:
+            self.emit(code.OP_SET_LOCAL, symbol.index)
+
+    def compile_expression(self, node):
+        if isinstance(node, ast_.InfixExpression):
+            self.compile_expression(node.left)
+            self.compile_expression(node.right)
+            op = infix_ops.get(node.operator)
+            if op is None:
+                raise ValueError(f"unknown operator {node.operator}")
+            self.emit(op)
+        elif isinstance(node, ast_.IntegerLiteral):
+            self.emit(code.OP_CONSTANT, self.add_constant(new_integer(node.value)))
+        elif isinstance(node, ast_.Identifier):
+            self.load_symbol(self.resolve(node.value))
+        elif isinstance(node, ast_.CallExpression):
+            self.compile_expression(node.function)
+            for argument in node.arguments:
+                self.compile_expression(argument)
+            self.emit(code.OP_CALL, len(node.arguments))
+        elif isinstance(node, ast_.IfExpression):
+            self.compile_if_expression(node)
+        elif isinstance(node, ast_.Boolean):
+            self.emit(code.OP_TRUE if node.value else code.OP_FALSE)
+        elif isinstance(node, ast_.PrefixExpression):
+            self.compile_expression(node.right)
+            op = prefix_ops.get(node.operator)
+            if op is None:
+                raise ValueError(f"unknown operator {node.operator}")
+            self.emit(op)
+        elif isinstance(node, ast_.StringLiteral):
+            self.emit(code.OP_CONSTANT, self.add_constant(new_string(node.value)))
+        elif isinstance(node, ast_.FunctionLiteral):
+            self.compile_function_literal(node)
+        elif isinstance(node, ast_.ArrayLiteral):
+            for element in node.elements:
+                self.compile_expression(element)
+            self.emit(code.OP_ARRAY, len(node.elements))
+        elif isinstance(node, ast_.IndexExpression):
+            self.compile_expression(node.left)
+            self.compile_expression(node.index)
+            self.emit(code.OP_INDEX)
+        elif isinstance(node, ast_.HashLiteral):
+            for key, value in node.pairs.items():
+                self.compile_expression(key)
+                self.compile_expression(value)
+            self.emit(code.OP_HASH, len(node.pairs) * 2)
+        else:
+            self.emit(code.OP_NONE)
+
+    def compile_if_expression(self, node):
+        self.compile_expression(node.condition)
+        jump_not_truthy_pos = self.emit(code.OP_JUMP_NOT_TRUTHY, 0xFFFF)
+        self.compile_block_value(node.consequence.statements)
+        jump_pos = self.emit(code.OP_JUMP, 0xFFFF)
+        self.change_operand(jump_not_truthy_pos, len(self.current_instructions()))
+        if node.alternative is None:
+            self.emit(code.OP_NULL)
+        else:
+            self.compile_block_value(node.alternative.statements)
+        self.change_operand(jump_pos, len(self.current_instructions()))
+
+    def compile_function_literal(self, node):
+        # Every parameter and let of the function gets its slot before the
+        # body is compiled, so that a name read above its let is still the
+        # function's own, as in the Environment.
+        parameters = [p.value for p in node.parameters]
+        self.enter_scope()
+        let_names, captured = scan_body(node.body)
+        for name in parameters + let_names:
+            self.symbol_table.define(name, CELL_SCOPE if name in captured else LOCAL_SCOPE)
+        cells = []
+        for symbol in list(self.symbol_table.store.values()):
+            if symbol.scope == CELL_SCOPE:
+                cells.append((symbol.index, *self.outer_of(symbol.name)))
+        self.compile_block_value(node.body.statements)
+        self.emit(code.OP_RETURN_VALUE)
+
+        free_symbols = self.symbol_table.free_symbols
+        num_locals = max(self.symbol_table.num_definitions, len(node.parameters))
+        outers = self.scopes[self.scope_index].outers
+        instructions = self.leave_scope()
+
+        for symbol in free_symbols:
+            if symbol.scope == CELL_SCOPE:
+                self.emit(code.OP_LOAD_CELL, symbol.index)
+            else:
+                self.emit(code.OP_LOAD_FREE, symbol.index)
+
+        compiled_fn = CompiledFunction(
+            instructions,
+            num_locals=num_locals,
+            num_parameters=len(node.parameters),
+            parameters=node.parameters,
+            body=node.body,
+            free_names=[symbol.name for symbol in free_symbols],
+            cells=cells,
+            outers=outers,
+        )
+        self.emit(code.OP_CLOSURE, self.add_constant(compiled_fn), len(free_symbols))
+
+    def resolve(self, name):
+        symbol = self.symbol_table.resolve(name)
+        if symbol is None:
+            # Globals are late bound, exactly like the Environment chain: a
+            # name may be defined after the function that uses it.
+            self.define_global(name)
+            symbol = self.symbol_table.resolve(name)
+        return symbol
+
+    def outer_of(self, name):
+        """The (scope, index) of the variable a read of the current
+        function's local name goes on to while the local is unset."""
+        symbol = self.symbol_table.resolve_outer(name)
+        if symbol is None:
+            self.define_global(name)
+            symbol = self.symbol_table.resolve_outer(name)
+        return symbol.scope, symbol.index
+
+    def define_global(self, name):
+        global_table = self.symbol_table
+        while global_table.outer is not None:
+            global_table = global_table.outer
+        global_table.define(name)
+
+    def load_symbol(self, symbol):
+        if symbol.scope == GLOBAL_SCOPE:
+            self.emit(code.OP_GET_GLOBAL, symbol.index)
+        elif symbol.scope == LOCAL_SCOPE:
+            outers = self.scopes[self.scope_index].outers
+            if symbol.index not in outers:
+                outers[symbol.index] = self.outer_of(symbol.name)
+            self.emit(code.OP_GET_LOCAL, symbol.index)
+        elif symbol.scope == CELL_SCOPE:
+            self.emit(code.OP_GET_CELL, symbol.index)
+        elif symbol.scope == FREE_SCOPE:
+            self.emit(code.OP_GET_FREE, symbol.index)
+
+
+def scan_body(body):
+    """The names bound by the lets of body's function, as
+    resolver.collect_let_names finds them, and the names read inside the
+    function literals in body, at any depth: a variable of body's function
+    by any of these may outlive its frame or be read through one, so it is
+    kept in a Cell."""
+    nodes = []
+    collect_nodes(body, nodes, into_functions=False)
+    let_names = {}
+    captured = set()
+    for node in nodes:
+        if type(node) is ast_.LetStatement:
+            let_names[node.name.value] = None
+        elif type(node) is ast_.FunctionLiteral:
+            captured.update(identifier_names(node.body))
+    return list(let_names), captured
+
+
+def new_compiler():
+    return Compiler()
+
+
+def new_compiler_with_state(symbol_table, constants):
+    return Compiler(symbol_table, constants)
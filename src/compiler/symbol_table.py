@@ -0,0 +1,84 @@
+GLOBAL_SCOPE = "GLOBAL"
+LOCAL_SCOPE = "LOCAL"
+CELL_SCOPE = "CELL"
+FREE_SCOPE = "FREE"
+
+
+class Symbol:
+    def __init__(self, name, scope, index):
+        self.name = name
+        self.scope = scope
+        self.index = index
+
+    def __eq__(self, other):
+        if not isinstance(other, Symbol):
+            return NotImplemented
+        return (self.name, self.scope, self.index) == (other.name, other.scope, other.index)
+
+    def __repr__(self):
+        return f"Symbol({self.name!r}, {self.scope}, {self.index})"
+
+
+class SymbolTable:
+    """The names of one function, or of the top level when outer is None.
+
+    A function's LOCAL and CELL symbols are its parameters and lets, both
+    kept in a slot of its frame; a CELL slot holds a Cell, for a variable
+    that an inner function refers to. Its FREE symbols are the cells of
+    enclosing functions that it refers to, found by name beyond its own
+    locals, so that a local read before its let can go on to them."""
+
+    def __init__(self, outer=None):
+        self.outer = outer
+        self.store = {}
+        self.num_definitions = 0
+        self.free_store = {}
+        self.free_symbols = []
+        # Names of the global slots in index order, so the VM can report
+        # "identifier not found" for a global that was referenced but never set.
+        self.global_names = [] if outer is None else outer.global_names
+
+    def define(self, name, scope=LOCAL_SCOPE):
+        symbol = self.store.get(name)
+        if symbol is not None:
+            return symbol
+        if self.outer is None:
+            symbol = Symbol(name, GLOBAL_SCOPE, self.num_definitions)
+            self.global_names.append(name)
+        else:
+            symbol = Symbol(name, scope, self.num_definitions)
+        self.store[name] = symbol
+        self.num_definitions += 1
+        return symbol
+
+    def define_free(self, original):
+        self.free_symbols.append(original)
+        symbol = Symbol(original.name, FREE_SCOPE, len(self.free_symbols) - 1)
+        self.free_store[original.name] = symbol
+        return symbol
+
+    def resolve(self, name):
+        symbol = self.store.get(name)
+        if symbol is not None:
+            return symbol
+        return self.resolve_outer(name)
+
+    def resolve_outer(self, name):
+        """The symbol name has beyond this function's own locals."""
+        if self.outer is None:
+            return None
+        symbol = self.free_store.get(name)
+        if symbol is not None:
+            return symbol
+        symbol = self.outer.resolve(name)
+        if symbol is None or symbol.scope == GLOBAL_SCOPE:
+            return symbol
+        return self.define_free(symbol)
+
+
+def new_symbol_table():
+    return SymbolTable()
+
+
+def new_enclosed_symbol_table(outer):
+    return SymbolTable(outer)
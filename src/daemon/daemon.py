@@ -0,0 +1,255 @@
+"""Keeps the interpreter warm and runs Monkey jobs sent as JSON lines.
+
+    python main.py --daemon [--socket PATH] [--jobs N] [--engine ENGINE]
+
+Jobs are read from the Unix domain socket PATH, where any number of
+clients may connect, or from stdin. Each job is one line:
+
+    {"id": 1, "source": "puts(x); x * 2", "bindings": {"x": 21}, "engine": "vm"}
+
+Only source is required. bindings maps names to JSON values (numbers,
+strings, booleans, null, arrays and objects with string keys) bound before
+the source runs. max_calls, timeout (in seconds) and max_memory (in
+megabytes) limit the job as the options of the same names do; a job can
+only tighten the limits the daemon was started with. Each job runs in a fresh environment on a pool of worker
+processes, and its response is written as one line once it finishes, so
+responses may come in a different order from their jobs:
+
+    {"id": 1, "result": "42", "type": "INTEGER", "output": "21\\n", "seconds": 0.0004}
+
+result is what the REPL would print for the value, and output what the
+job printed with puts. A job that cannot run gets an "error" instead of a
+result; one that evaluates to a Monkey error gets both."""
+import asyncio
+import concurrent.futures
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import signal
+import stat
+import sys
+import time
+import traceback
+
+from src.budget.budget import new_budget, run_within_budget
+from src.evaluator.evaluator import FALSE, NULL, TRUE
+from src.lexer.lexer import FastLexer
+from src.object.object import Array, Error, Hash, HashPair, String, new_integer
+from src.optimizer.inliner import Inliner, final_names
+from src.optimizer.optimizer import optimize
+from src.parser.parser import Parser
+from src.repl.repl import ENGINES, new_runner
+
+
+def from_json(value):
+    """The Monkey object for a decoded JSON value."""
+    if value is None:
+        return NULL
+    elif type(value) is bool:
+        return TRUE if value else FALSE
+    elif type(value) in (int, float):
+        return new_integer(value)
+    elif type(value) is str:
+        return String(value)
+    elif type(value) is list:
+        return Array([from_json(v) for v in value])
+    elif type(value) is dict:
+        pairs = {}
+        for key, v in value.items():
+            key = String(key)
+            pairs[key.hash_key()] = HashPair(key, from_json(v))
+        return Hash(pairs)
+    raise ValueError(f"unsupported binding value: {value!r}")
+
+
+LIMITS = ("max_calls", "timeout", "max_memory")
+
+
+def parse_job(line, engine="eval", limits=None):
+    """The job a request line holds, with its defaults filled in from engine
+    and limits. Raises ValueError for a line that is not a valid job."""
+    try:
+        job = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"invalid JSON: {e}")
+    if type(job) is not dict:
+        raise ValueError("a job must be a JSON object")
+    if type(job.get("source")) is not str:
+        raise ValueError("source must be a string")
+    bindings = job.get("bindings", {})
+    if type(bindings) is not dict:
+        raise ValueError("bindings must be an object")
+    job_engine = job.get("engine", engine)
+    if job_engine not in ENGINES:
+        raise ValueError(f"unknown engine: {job_engine}")
+    job_limits = dict(limits or dict.fromkeys(LIMITS))
+    for name in LIMITS:
+        value = job.get(name)
+        if value is None:
+            continue
+        if type(value) not in (int, float) or value < 0 or (name == "max_calls" and type(value) is not int):
+            raise ValueError(f"{name} must be a non-negative number")
+        if job_limits[name] is None or value < job_limits[name]:
+            job_limits[name] = value
+    return {"id": job.get("id"), "source": job["source"], "bindings": bindings, "engine": job_engine,
+            "limits": job_limits}
+
+
+def request_id(line):
+    """The id of a request line, or None when it has none."""
+    try:
+        request = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    return request.get("id") if type(request) is dict else None
+
+
+def run_job(job):
+    """Runs a job from parse_job and returns its response."""
+    response = {"id": job["id"]}
+    output = io.StringIO()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(output):
+            bindings = {name: from_json(value) for name, value in job["bindings"].items()}
+            parser = Parser(FastLexer(job["source"]))
+            program = parser.parse_program()
+            if parser.errors:
+                response["error"] = "parser errors: " + "; ".join(parser.errors)
+            else:
+                program = optimize(Inliner(final_names(program)).inline(program))
+                budget = new_budget(**job["limits"])
+                result = run_within_budget(budget, new_runner(job["engine"], bindings), program)
+                response["result"] = result.inspect() if result is not None else None
+                response["type"] = result.type() if result is not None else None
+                if type(result) is Error:
+                    response["error"] = result.message
+    except Exception as e:
+        response["error"] = "".join(traceback.format_exception_only(type(e), e)).strip()
+    response["output"] = output.getvalue()
+    response["seconds"] = time.perf_counter() - start
+    return response
+
+
+class Daemon:
+    """Runs the jobs of any number of streams on one pool of jobs worker
+    processes (default: one per CPU), limiting each by limits, a dict with
+    the keys of LIMITS."""
+
+    def __init__(self, jobs=None, engine="eval", limits=None):
+        self.jobs = jobs
+        self.engine = engine
+        self.limits = limits
+        self.pool = None
+
+    def __enter__(self):
+        self.pool = new_pool(self.jobs)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.pool.shutdown()
+
+    async def handle(self, line):
+        """The response to one request line."""
+        try:
+            job = parse_job(line, self.engine, self.limits)
+        except ValueError as e:
+            return {"id": request_id(line), "error": f"invalid job: {e}"}
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.pool, run_job, job)
+        except concurrent.futures.process.BrokenProcessPool:
+            # A worker died, taking the pool with it: start a new one for
+            # the jobs to come.
+            self.pool.shutdown(wait=False)
+            self.pool = new_pool(self.jobs)
+            return {"id": job["id"], "error": "worker process died"}
+
+    async def serve(self, readline, write):
+        """Runs a job for each line readline returns until it returns b"",
+        and writes each response with write as soon as it is ready."""
+        lock = asyncio.Lock()
+
+        async def respond(line):
+            response = await self.handle(line)
+            async with lock:
+                await write((json.dumps(response) + "\n").encode())
+
+        tasks = set()
+        while True:
+            line = await readline()
+            if not line:
+                break
+            if line.strip():
+                task = asyncio.create_task(respond(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def serve_client(self, reader, writer):
+        async def write(data):
+            writer.write(data)
+            await writer.drain()
+
+        try:
+            await self.serve(reader.readline, write)
+        finally:
+            writer.close()
+
+    async def serve_unix(self, path):
+        """Serves clients of a Unix domain socket at path until SIGINT or
+        SIGTERM."""
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        server = await asyncio.start_unix_server(self.serve_client, path)
+        async with server:
+            await stop.wait()
+
+    async def serve_stdin(self, in_stream=None, out_stream=None):
+        in_stream = in_stream or sys.stdin.buffer
+        out_stream = out_stream or sys.stdout.buffer
+        loop = asyncio.get_running_loop()
+
+        async def readline():
+            # A thread reads, since stdin may be a file, which asyncio
+            # cannot watch.
+            return await loop.run_in_executor(None, in_stream.readline)
+
+        async def write(data):
+            out_stream.write(data)
+            out_stream.flush()
+
+        await self.serve(readline, write)
+
+
+def new_pool(jobs):
+    # Workers forked from the daemon itself would inherit the connections
+    # open at the time, and their clients would never see them close. A fork
+    # server starts clean, with the interpreter imported once for all of
+    # them.
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__])
+    return concurrent.futures.ProcessPoolExecutor(max_workers=jobs, mp_context=context)
+
+
+def run_daemon(socket_path=None, jobs=None, engine="eval", limits=None):
+    with Daemon(jobs, engine, limits) as daemon:
+        if socket_path is None:
+            asyncio.run(daemon.serve_stdin())
+            return
+        # A socket left by an earlier daemon is replaced; anything else at
+        # the path is an error from start_unix_server.
+        remove_socket(socket_path)
+        try:
+            asyncio.run(daemon.serve_unix(socket_path))
+        finally:
+            remove_socket(socket_path)
+
+
+def remove_socket(path):
+    if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+        os.unlink(path)
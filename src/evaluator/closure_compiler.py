@@ -0,0 +1,551 @@
+from src.ast import ast_
+from src.evaluator.evaluator import (
+    FALSE,
+    NULL,
+    TRUE,
+    apply_function,
+    builtins,
+    eval_bang_operator_expression,
+    eval_index_expression,
+    eval_infix_expression,
+    eval_prefix_expression,
+    function_callers,
+    new_error,
+)
+from src.object.environment import Frame
+from src.object.object import *
+from src.resolver.resolver import BUILTIN, LOCAL, Resolver
+
+
+class ClosureFunction(Function):
+    """A Function whose body has already been compiled into a closure.
+
+    It is still a Function, so apply_function and builtins can call it
+    through the tree-walking path as well."""
+
+    __slots__ = ("code", "frame_names", "parameter_slots", "simple_parameters", "extra_slots")
+
+    def __init__(self, parameters, body, env, code, frame_names, parameter_slots):
+        super().__init__(parameters, body, env)
+        self.code = code
+        self.frame_names = frame_names
+        self.parameter_slots = parameter_slots
+        # Parameters taking slots 0..n-1 in order can be copied in one go.
+        self.simple_parameters = parameter_slots == list(range(len(parameters)))
+        self.extra_slots = [None] * (len(frame_names) - len(parameters))
+
+
+def compile_node(node):
+    """Turns a resolved AST node into a Python callable taking the current
+    Environment or Frame and returning exactly what evaluate(node, env) would
+    return."""
+    compiler = compilers.get(type(node))
+    if compiler is None:
+        return compile_nothing(node)
+    return compiler(node)
+
+
+def run(program, env, resolver=None):
+    if resolver is None:
+        resolver = Resolver()
+    resolver.resolve(program)
+    return compile_node(program)(env)
+
+
+def compile_nothing(node):
+    def nothing(env):
+        return None
+
+    return nothing
+
+
+def compile_program(node):
+    codes = [compile_node(s) for s in node.statements]
+
+    def program(env):
+        result = None
+        for code in codes:
+            result = code(env)
+            if type(result) is ReturnValue:
+                return result.value
+            elif type(result) is Error:
+                return result
+        return result
+
+    return program
+
+
+def compile_block_statement(node):
+    codes = [compile_node(s) for s in node.statements]
+    if len(codes) == 1:
+        return codes[0]
+
+    def block(env):
+        result = None
+        for code in codes:
+            result = code(env)
+            if type(result) is ReturnValue or type(result) is Error:
+                return result
+        return result
+
+    return block
+
+
+def compile_expression_statement(node):
+    return compile_node(node.expression)
+
+
+def compile_return_statement(node):
+    value_code = compile_node(node.return_value)
+
+    def return_statement(env):
+        val = value_code(env)
+        if type(val) is Error:
+            return val
+        return ReturnValue(val)
+
+    return return_statement
+
+
+def compile_let_statement(node):
+    value_code = compile_node(node.value)
+    name = node.name.value
+    resolution = node.name.resolution
+
+    if resolution.scope == LOCAL:
+        slot = resolution.slot
+
+        def let_local(env):
+            val = value_code(env)
+            if type(val) is Error:
+                return val
+            env.slots[slot] = val
+
+        return let_local
+
+    def let_global(env):
+        val = value_code(env)
+        if type(val) is Error:
+            return val
+        env.store[name] = val
+
+    return let_global
+
+
+def compile_integer_literal(node):
+    result = new_integer(node.value)
+
+    def integer_literal(env):
+        return result
+
+    return integer_literal
+
+
+def compile_string_literal(node):
+    result = new_string(node.value)
+
+    def string_literal(env):
+        return result
+
+    return string_literal
+
+
+def compile_boolean(node):
+    result = TRUE if node.value else FALSE
+
+    def boolean(env):
+        return result
+
+    return boolean
+
+
+def compile_prefix_expression(node):
+    right_code = compile_node(node.right)
+    operator = node.operator
+
+    if operator == "!":
+        def bang(env):
+            right = right_code(env)
+            if type(right) is Error:
+                return right
+            return eval_bang_operator_expression(right)
+
+        return bang
+
+    if operator == "-":
+        def minus(env):
+            right = right_code(env)
+            if type(right) is Integer:
+                return new_integer(-right.value)
+            if type(right) is Error:
+                return right
+            return eval_prefix_expression("-", right)
+
+        return minus
+
+    def prefix(env):
+        right = right_code(env)
+        if type(right) is Error:
+            return right
+        return eval_prefix_expression(operator, right)
+
+    return prefix
+
+
+integer_operations = {
+    "+": lambda a, b: new_integer(a + b),
+    "-": lambda a, b: new_integer(a - b),
+    "*": lambda a, b: new_integer(a * b),
+    "/": lambda a, b: Integer(a / b),
+    "<": lambda a, b: TRUE if a < b else FALSE,
+    ">": lambda a, b: TRUE if a > b else FALSE,
+    "==": lambda a, b: TRUE if a == b else FALSE,
+    "!=": lambda a, b: TRUE if a != b else FALSE,
+}
+
+
+def compile_infix_expression(node):
+    left_code = compile_node(node.left)
+    right_code = compile_node(node.right)
+    operator = node.operator
+
+    if operator == "+":
+        def add(env):
+            left = left_code(env)
+            if type(left) is Error:
+                return left
+            right = right_code(env)
+            if type(left) is Integer and type(right) is Integer:
+                return new_integer(left.value + right.value)
+            if type(right) is Error:
+                return right
+            return eval_infix_expression("+", left, right)
+
+        return add
+
+    if operator == "-":
+        def sub(env):
+            left = left_code(env)
+            if type(left) is Error:
+                return left
+            right = right_code(env)
+            if type(left) is Integer and type(right) is Integer:
+                return new_integer(left.value - right.value)
+            if type(right) is Error:
+                return right
+            return eval_infix_expression("-", left, right)
+
+        return sub
+
+    if operator == "<":
+        def less_than(env):
+            left = left_code(env)
+            if type(left) is Error:
+                return left
+            right = right_code(env)
+            if type(left) is Integer and type(right) is Integer:
+                return TRUE if left.value < right.value else FALSE
+            if type(right) is Error:
+                return right
+            return eval_infix_expression("<", left, right)
+
+        return less_than
+
+    if operator == "==":
+        def equal(env):
+            left = left_code(env)
+            if type(left) is Error:
+                return left
+            right = right_code(env)
+            if type(left) is Integer and type(right) is Integer:
+                return TRUE if left.value == right.value else FALSE
+            if type(right) is Error:
+                return right
+            return eval_infix_expression("==", left, right)
+
+        return equal
+
+    integer_operation = integer_operations.get(operator)
+
+    def infix(env):
+        left = left_code(env)
+        if type(left) is Error:
+            return left
+        right = right_code(env)
+        if type(left) is Integer and type(right) is Integer and integer_operation is not None:
+            return integer_operation(left.value, right.value)
+        if type(right) is Error:
+            return right
+        return eval_infix_expression(operator, left, right)
+
+    return infix
+
+
+def compile_if_expression(node):
+    condition_code = compile_node(node.condition)
+    consequence_code = compile_node(node.consequence)
+    alternative_code = compile_node(node.alternative) if node.alternative is not None else None
+
+    def if_expression(env):
+        condition = condition_code(env)
+        if type(condition) is Error:
+            return condition
+        if condition is not NULL and condition is not FALSE:
+            return consequence_code(env)
+        elif alternative_code is not None:
+            return alternative_code(env)
+        return NULL
+
+    return if_expression
+
+
+def compile_identifier(node):
+    return compile_resolution(node.value, node.resolution)
+
+
+def compile_resolution(name, resolution):
+    if resolution.scope == LOCAL:
+        return compile_local(name, resolution)
+    builtin = builtins.get(name)
+    if resolution.scope == BUILTIN:
+        def builtin_identifier(env):
+            return builtin
+
+        return builtin_identifier
+
+    if resolution.depth == 0:
+        def global_identifier(env):
+            val = env.store.get(name)
+            if val is not None:
+                return val
+            if builtin is not None:
+                return builtin
+            return new_error(f"identifier not found: {name}")
+
+        return global_identifier
+
+    def global_identifier_in_frame(env):
+        val = env.globals.store.get(name)
+        if val is not None:
+            return val
+        if builtin is not None:
+            return builtin
+        return new_error(f"identifier not found: {name}")
+
+    return global_identifier_in_frame
+
+
+def compile_local(name, resolution):
+    depth = resolution.depth
+    slot = resolution.slot
+    fallback = compile_resolution(name, resolution.outer)
+
+    if depth == 0:
+        def local(env):
+            val = env.slots[slot]
+            if val is None:
+                return fallback(env)
+            return val
+
+        return local
+
+    if depth == 1:
+        def local_outer(env):
+            val = env.outer.slots[slot]
+            if val is None:
+                return fallback(env)
+            return val
+
+        return local_outer
+
+    def local_deep(env):
+        frame = env
+        for _ in range(depth):
+            frame = frame.outer
+        val = frame.slots[slot]
+        if val is None:
+            return fallback(env)
+        return val
+
+    return local_deep
+
+
+def compile_function_literal(node):
+    params = node.parameters
+    body = node.body
+    body_code = compile_node(body)
+    frame_names = node.frame_names
+    parameter_slots = node.parameter_slots
+
+    def function_literal(env):
+        return ClosureFunction(params, body, env, body_code, frame_names, parameter_slots)
+
+    return function_literal
+
+
+def compile_call_expression(node):
+    function_code = compile_node(node.function)
+    argument_codes = [compile_node(a) for a in node.arguments]
+    # While profiling, closures too are called through the profiler.
+    closure_call = call_closure if profiler is None else call_function
+
+    def call_expression(env):
+        function = function_code(env)
+        if type(function) is Error:
+            return function
+        args = []
+        for argument_code in argument_codes:
+            evaluated = argument_code(env)
+            if type(evaluated) is Error:
+                return evaluated
+            args.append(evaluated)
+        if type(function) is ClosureFunction:
+            return closure_call(function, args)
+        return call_function(function, args)
+
+    if budget is None:
+        return call_expression
+    spend = budget.spend
+
+    def budgeted_call_expression(env):
+        spend()
+        return call_expression(env)
+
+    return budgeted_call_expression
+
+
+def call_closure(function, args):
+    """Runs the body of a ClosureFunction in a new Frame holding args."""
+    if function.simple_parameters and len(args) == len(function.parameters):
+        slots = args + function.extra_slots
+    else:
+        slots = [None] * len(function.frame_names)
+        for i, slot in enumerate(function.parameter_slots):
+            slots[slot] = args[i]
+    result = function.code(Frame(function.frame_names, function.env, slots))
+    if type(result) is ReturnValue:
+        return result.value
+    return result
+
+
+def call_function(function, args):
+    """Calls any function value with evaluated args."""
+    if type(function) is ClosureFunction:
+        return call_closure(function, args)
+    if type(function) is Memoized:
+        return function.call(args, call_function)
+    return apply_function(function, args)
+
+
+# The call_function used while no profiler is set.
+plain_call_function = call_function
+
+profiler = None
+budget = None
+
+
+def set_profiler(new_profiler):
+    """Passes every call made by code compiled from now on through
+    new_profiler, or stops when it is None. Code compiled while no profiler
+    is set never checks for one."""
+    global profiler, call_function
+    profiler = new_profiler
+    call_function = plain_call_function if new_profiler is None else profiled_call_function
+
+
+def set_budget(new_budget):
+    """Charges every call expression compiled from now on to new_budget, or
+    stops when it is None. Code compiled while no budget is set never checks
+    for one."""
+    global budget
+    budget = new_budget
+
+
+def call_from_builtin(function, args):
+    """Calls a ClosureFunction for a builtin such as map."""
+    if budget is not None:
+        budget.spend()
+    return call_function(function, args)
+
+
+function_callers[ClosureFunction] = call_from_builtin
+
+
+def profiled_call_function(function, args):
+    return profiler.call(function, args, plain_call_function)
+
+
+def compile_array_literal(node):
+    element_codes = [compile_node(e) for e in node.elements]
+
+    def array_literal(env):
+        elements = []
+        for element_code in element_codes:
+            evaluated = element_code(env)
+            if type(evaluated) is Error:
+                return evaluated
+            elements.append(evaluated)
+        return Array(elements)
+
+    return array_literal
+
+
+def compile_index_expression(node):
+    left_code = compile_node(node.left)
+    index_code = compile_node(node.index)
+
+    def index_expression(env):
+        left = left_code(env)
+        if type(left) is Error:
+            return left
+        index = index_code(env)
+        if type(index) is Error:
+            return index
+        if type(left) is Array and type(index) is Integer:
+            idx = index.value
+            elements = left.elements
+            return elements[idx] if 0 <= idx < len(elements) else NULL
+        return eval_index_expression(left, index)
+
+    return index_expression
+
+
+def compile_hash_literal(node):
+    pair_codes = [(compile_node(k), compile_node(v)) for k, v in node.pairs.items()]
+
+    def hash_literal(env):
+        pairs = {}
+        for key_code, value_code in pair_codes:
+            key = key_code(env)
+            if type(key) is Error:
+                return key
+            if not isinstance(key, Hashable):
+                return new_error(f"unusable as hash key: {key.type()}")
+            value = value_code(env)
+            if type(value) is Error:
+                return value
+            pairs[key.hash_key()] = HashPair(key, value)
+        return Hash(pairs)
+
+    return hash_literal
+
+
+compilers = {
+    ast_.Program: compile_program,
+    ast_.BlockStatement: compile_block_statement,
+    ast_.ExpressionStatement: compile_expression_statement,
+    ast_.ReturnStatement: compile_return_statement,
+    ast_.LetStatement: compile_let_statement,
+    ast_.IntegerLiteral: compile_integer_literal,
+    ast_.StringLiteral: compile_string_literal,
+    ast_.Boolean: compile_boolean,
+    ast_.PrefixExpression: compile_prefix_expression,
+    ast_.InfixExpression: compile_infix_expression,
+    ast_.IfExpression: compile_if_expression,
+    ast_.Identifier: compile_identifier,
+    ast_.FunctionLiteral: compile_function_literal,
+    ast_.CallExpression: compile_call_expression,
+    ast_.ArrayLiteral: compile_array_literal,
+    ast_.IndexExpression: compile_index_expression,
+    ast_.HashLiteral: compile_hash_literal,
+}
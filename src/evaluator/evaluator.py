@@ -7,19 +7,14 @@ TRUE = Boolean(True)
 FALSE = Boolean(False)
 
 
-class BuiltinFunction:
-    def __init__(self, fn):
-        self.fn = fn
-
-
 def len_builtin(args):
     if len(args) != 1:
         return new_error(f"wrong number of arguments. got={len(args)}, want=1")
 
     if isinstance(args[0], Array):
-        return Integer(len(args[0].elements))
+        return new_integer(len(args[0].elements))
     elif isinstance(args[0], String):
-        return Integer(len(args[0].value))
+        return new_integer(len(args[0].value))
     else:
         return new_error(f"argument to `len` not supported, got {args[0].type()}")
 
@@ -59,8 +54,7 @@ def rest_builtin(args):
         return new_error(f"argument to `rest` must be ARRAY, got {args[0].type()}")
 
     if args[0].elements:
-        new_elements = args[0].elements[1:]
-        return Array(new_elements)
+        return Array(args[0].elements.rest())
     return NULL
 
 
@@ -70,17 +64,209 @@ def push_builtin(args):
     if not isinstance(args[0], Array):
         return new_error(f"argument to `push` must be ARRAY, got {args[0].type()}")
 
-    new_elements = args[0].elements + [args[1]]
-    return Array(new_elements)
+    return Array(args[0].elements.push(args[1]))
+
+
+def memo_builtin(args):
+    if not 1 <= len(args) <= 3:
+        return new_error(f"wrong number of arguments. got={len(args)}, want=1 to 3")
+    if args[0].type() not in (FUNCTION_OBJ, BUILTIN_OBJ):
+        return new_error(f"argument to `memo` must be FUNCTION, got {args[0].type()}")
+    size = DEFAULT_MEMO_SIZE
+    if len(args) > 1:
+        if type(args[1]) is not Integer or type(args[1].value) is not int or args[1].value < 1:
+            return new_error(f"size given to `memo` must be a positive INTEGER, got {args[1].inspect()}")
+        size = args[1].value
+    name = None
+    if len(args) > 2:
+        if type(args[2]) is not String:
+            return new_error(f"name given to `memo` must be STRING, got {args[2].type()}")
+        name = args[2].value
+    return Memoized(args[0], size, name)
+
+
+def memo_stats_builtin(args):
+    if len(args) != 1:
+        return new_error(f"wrong number of arguments. got={len(args)}, want=1")
+    if type(args[0]) is not Memoized:
+        return new_error(f"argument to `memo_stats` must be a memoized FUNCTION, got {args[0].type()}")
+
+    memoized = args[0]
+    stats = {
+        "hits": memoized.hits,
+        "misses": memoized.misses,
+        "evictions": memoized.evictions,
+        "uncached": memoized.uncached,
+        "entries": len(memoized.cache),
+    }
+    pairs = {}
+    for name, count in stats.items():
+        key = new_string(name)
+        pairs[key.hash_key()] = HashPair(key, new_integer(count))
+    return Hash(pairs)
+
+
+def map_builtin(args):
+    if len(args) != 2:
+        return new_error(f"wrong number of arguments. got={len(args)}, want=2")
+    error = check_function_and_array("map", args[0], args[1])
+    if error is not None:
+        return error
+
+    fn = args[0]
+    results = []
+    for element in args[1].elements:
+        result = call_function_value(fn, [element])
+        if is_error(result):
+            return result
+        results.append(result)
+    return Array(results)
+
+
+def filter_builtin(args):
+    if len(args) != 2:
+        return new_error(f"wrong number of arguments. got={len(args)}, want=2")
+    error = check_function_and_array("filter", args[0], args[1])
+    if error is not None:
+        return error
+
+    fn = args[0]
+    kept = []
+    for element in args[1].elements:
+        result = call_function_value(fn, [element])
+        if is_error(result):
+            return result
+        if is_truthy(result):
+            kept.append(element)
+    return Array(kept)
+
+
+def reduce_builtin(args):
+    if not 2 <= len(args) <= 3:
+        return new_error(f"wrong number of arguments. got={len(args)}, want=2 or 3")
+    error = check_function_and_array("reduce", args[0], args[1])
+    if error is not None:
+        return error
+
+    fn = args[0]
+    elements = iter(args[1].elements)
+    if len(args) == 3:
+        accumulated = args[2]
+    else:
+        accumulated = next(elements, None)
+        if accumulated is None:
+            return new_error("`reduce` of an empty ARRAY needs an initial value")
+    for element in elements:
+        accumulated = call_function_value(fn, [accumulated, element])
+        if is_error(accumulated):
+            return accumulated
+    return accumulated
+
+
+def check_function_and_array(name, fn, array):
+    if fn.type() not in (FUNCTION_OBJ, BUILTIN_OBJ):
+        return new_error(f"first argument to `{name}` must be FUNCTION, got {fn.type()}")
+    if not isinstance(array, Array):
+        return new_error(f"second argument to `{name}` must be ARRAY, got {array.type()}")
+    return None
+
+
+def range_builtin(args):
+    if not 1 <= len(args) <= 3:
+        return new_error(f"wrong number of arguments. got={len(args)}, want=1 to 3")
+    for arg in args:
+        if type(arg) is not Integer or type(arg.value) is not int:
+            return new_error(f"arguments to `range` must be INTEGER, got {arg.inspect()}")
+
+    bounds = [arg.value for arg in args]
+    if len(bounds) == 1:
+        bounds.insert(0, 0)
+    if len(bounds) == 3 and bounds[2] == 0:
+        return new_error("step given to `range` must not be 0")
+    return Array([new_integer(i) for i in range(*bounds)])
+
+
+def sum_builtin(args):
+    if len(args) != 1:
+        return new_error(f"wrong number of arguments. got={len(args)}, want=1")
+    if not isinstance(args[0], Array):
+        return new_error(f"argument to `sum` must be ARRAY, got {args[0].type()}")
+
+    total = 0
+    for element in args[0].elements:
+        if type(element) is not Integer:
+            return new_error(f"elements summed by `sum` must be INTEGER, got {element.type()}")
+        total += element.value
+    return new_integer(total)
+
+
+def min_builtin(args):
+    return extreme("min", min, args)
+
+
+def max_builtin(args):
+    return extreme("max", max, args)
+
+
+def extreme(name, pick, args):
+    """pick of one ARRAY argument's elements or of several arguments, all
+    INTEGERs or all STRINGs. NULL for an empty ARRAY, as `first` gives."""
+    if not args:
+        return new_error("wrong number of arguments. got=0, want=at least 1")
+    if len(args) == 1:
+        if not isinstance(args[0], Array):
+            return new_error(f"argument to `{name}` must be ARRAY, got {args[0].type()}")
+        args = list(args[0].elements)
+        if not args:
+            return NULL
+
+    kind = type(args[0])
+    if kind is not Integer and kind is not String:
+        return new_error(f"values compared by `{name}` must be INTEGER or STRING, got {args[0].type()}")
+    for arg in args:
+        if type(arg) is not kind:
+            return new_error(f"values compared by `{name}` must all be {args[0].type()}, got {arg.type()}")
+    return pick(args, key=value_of)
+
+
+def value_of(obj):
+    return obj.value
+
+
+def zip_builtin(args):
+    if not args:
+        return new_error("wrong number of arguments. got=0, want=at least 1")
+    for arg in args:
+        if not isinstance(arg, Array):
+            return new_error(f"arguments to `zip` must be ARRAY, got {arg.type()}")
+
+    return Array([Array(list(elements)) for elements in zip(*(arg.elements for arg in args))])
+
+
+def pmap_builtin(args):
+    from src.parallel.pmap import pmap
+
+    return pmap(args)
 
 
 builtins = {
-    "len": BuiltinFunction(len_builtin),
-    "puts": BuiltinFunction(puts_builtin),
-    "first": BuiltinFunction(first_builtin),
-    "last": BuiltinFunction(last_builtin),
-    "rest": BuiltinFunction(rest_builtin),
-    "push": BuiltinFunction(push_builtin),
+    "len": Builtin(len_builtin),
+    "puts": Builtin(puts_builtin),
+    "first": Builtin(first_builtin),
+    "last": Builtin(last_builtin),
+    "rest": Builtin(rest_builtin),
+    "push": Builtin(push_builtin),
+    "memo": Builtin(memo_builtin),
+    "memo_stats": Builtin(memo_stats_builtin),
+    "map": Builtin(map_builtin),
+    "filter": Builtin(filter_builtin),
+    "reduce": Builtin(reduce_builtin),
+    "range": Builtin(range_builtin),
+    "sum": Builtin(sum_builtin),
+    "min": Builtin(min_builtin),
+    "max": Builtin(max_builtin),
+    "zip": Builtin(zip_builtin),
+    "pmap": Builtin(pmap_builtin),
 }
 
 
@@ -90,6 +276,14 @@ def new_error(message):
 
 
 def evaluate(node, env):
+    # Quickened nodes are matched on their exact type first, which is much
+    # cheaper than the isinstance checks below.
+    node_type = type(node)
+    if node_type is ast_.InfixExpression:
+        return eval_infix_node(node, env)
+    elif node_type is ast_.IndexExpression:
+        return eval_index_node(node, env)
+
     # Statements
     if isinstance(node, ast_.Program):
         return eval_program(node, env)
@@ -110,9 +304,13 @@ def evaluate(node, env):
 
     # Expressions
     elif isinstance(node, ast_.IntegerLiteral):
-        return Integer(node.value)
+        if node.constant is None:
+            node.constant = new_integer(node.value)
+        return node.constant
     elif isinstance(node, ast_.StringLiteral):
-        return String(node.value)
+        if node.constant is None:
+            node.constant = new_string(node.value)
+        return node.constant
     elif isinstance(node, ast_.Boolean):
         return native_bool_to_boolean_object(node.value)
     elif isinstance(node, ast_.PrefixExpression):
@@ -120,14 +318,6 @@ def evaluate(node, env):
         if is_error(right):
             return right
         return eval_prefix_expression(node.operator, right)
-    elif isinstance(node, ast_.InfixExpression):
-        left = evaluate(node.left, env)
-        if is_error(left):
-            return left
-        right = evaluate(node.right, env)
-        if is_error(right):
-            return right
-        return eval_infix_expression(node.operator, left, right)
     elif isinstance(node, ast_.IfExpression):
         return eval_if_expression(node, env)
     elif isinstance(node, ast_.Identifier):
@@ -135,7 +325,7 @@ def evaluate(node, env):
     elif isinstance(node, ast_.FunctionLiteral):
         params = node.parameters
         body = node.body
-        return Function(params, env, body)
+        return Function(params, body, env)
     elif isinstance(node, ast_.CallExpression):
         function = evaluate(node.function, env)
         if is_error(function):
@@ -149,14 +339,6 @@ def evaluate(node, env):
         if len(elements) == 1 and is_error(elements[0]):
             return elements[0]
         return Array(elements)
-    elif isinstance(node, ast_.IndexExpression):
-        left = evaluate(node.left, env)
-        if is_error(left):
-            return left
-        index = evaluate(node.index, env)
-        if is_error(index):
-            return index
-        return eval_index_expression(left, index)
     elif isinstance(node, ast_.HashLiteral):
         return eval_hash_literal(node, env)
 
@@ -214,7 +396,7 @@ def eval_minus_prefix_operator_expression(right):
     if right.type() != "INTEGER":
         return new_error(f"unknown operator: -{right.type()}")
     value = right.value
-    return Integer(-value)
+    return new_integer(-value)
 
 
 def eval_infix_expression(operator, left, right):
@@ -232,15 +414,157 @@ def eval_infix_expression(operator, left, right):
         return new_error(f"unknown operator: {left.type()} {operator} {right.type()}")
 
 
+# Quickening. An InfixExpression or IndexExpression node starts out generic.
+# After its first evaluation it is given a handler specialized for the
+# operand types it saw. Each handler checks those types itself and returns
+# None when they do not match, in which case the node takes the generic path
+# and is re-specialized for the new types. A node whose guard keeps failing
+# is left generic for good.
+MAX_GUARD_FAILURES = 4
+
+
+def add_integers(left, right):
+    if type(left) is Integer and type(right) is Integer:
+        return new_integer(left.value + right.value)
+
+
+def subtract_integers(left, right):
+    if type(left) is Integer and type(right) is Integer:
+        return new_integer(left.value - right.value)
+
+
+def multiply_integers(left, right):
+    if type(left) is Integer and type(right) is Integer:
+        return new_integer(left.value * right.value)
+
+
+def divide_integers(left, right):
+    if type(left) is Integer and type(right) is Integer:
+        return Integer(left.value / right.value)
+
+
+def less_than_integers(left, right):
+    if type(left) is Integer and type(right) is Integer:
+        return TRUE if left.value < right.value else FALSE
+
+
+def greater_than_integers(left, right):
+    if type(left) is Integer and type(right) is Integer:
+        return TRUE if left.value > right.value else FALSE
+
+
+def equal_integers(left, right):
+    if type(left) is Integer and type(right) is Integer:
+        return TRUE if left.value == right.value else FALSE
+
+
+def not_equal_integers(left, right):
+    if type(left) is Integer and type(right) is Integer:
+        return TRUE if left.value != right.value else FALSE
+
+
+def concatenate_strings(left, right):
+    if type(left) is String and type(right) is String:
+        return String(left.value + right.value)
+
+
+def equal_booleans(left, right):
+    if type(left) is Boolean and type(right) is Boolean:
+        return TRUE if left is right else FALSE
+
+
+def not_equal_booleans(left, right):
+    if type(left) is Boolean and type(right) is Boolean:
+        return TRUE if left is not right else FALSE
+
+
+def index_array_with_integer(left, index):
+    if type(left) is Array and type(index) is Integer:
+        idx = index.value
+        elements = left.elements
+        if 0 <= idx < len(elements):
+            return elements[idx]
+        return NULL
+
+
+infix_specializations = {
+    ("+", Integer, Integer): add_integers,
+    ("-", Integer, Integer): subtract_integers,
+    ("*", Integer, Integer): multiply_integers,
+    ("/", Integer, Integer): divide_integers,
+    ("<", Integer, Integer): less_than_integers,
+    (">", Integer, Integer): greater_than_integers,
+    ("==", Integer, Integer): equal_integers,
+    ("!=", Integer, Integer): not_equal_integers,
+    ("+", String, String): concatenate_strings,
+    ("==", Boolean, Boolean): equal_booleans,
+    ("!=", Boolean, Boolean): not_equal_booleans,
+}
+
+index_specializations = {
+    (Array, Integer): index_array_with_integer,
+}
+
+
+def eval_infix_node(node, env):
+    left = evaluate(node.left, env)
+    if is_error(left):
+        return left
+    right = evaluate(node.right, env)
+    if is_error(right):
+        return right
+    specialized = node.specialized
+    if specialized is not None:
+        result = specialized(left, right)
+        if result is not None:
+            return result
+    return eval_infix_expression_quickening(node, left, right)
+
+
+def eval_index_node(node, env):
+    left = evaluate(node.left, env)
+    if is_error(left):
+        return left
+    index = evaluate(node.index, env)
+    if is_error(index):
+        return index
+    specialized = node.specialized
+    if specialized is not None:
+        result = specialized(left, index)
+        if result is not None:
+            return result
+    return eval_index_expression_quickening(node, left, index)
+
+
+def eval_infix_expression_quickening(node, left, right):
+    if node.specialized is not None:
+        node.guard_failures += 1
+    if node.guard_failures < MAX_GUARD_FAILURES:
+        node.specialized = infix_specializations.get((node.operator, type(left), type(right)))
+    else:
+        node.specialized = None
+    return eval_infix_expression(node.operator, left, right)
+
+
+def eval_index_expression_quickening(node, left, index):
+    if node.specialized is not None:
+        node.guard_failures += 1
+    if node.guard_failures < MAX_GUARD_FAILURES:
+        node.specialized = index_specializations.get((type(left), type(index)))
+    else:
+        node.specialized = None
+    return eval_index_expression(left, index)
+
+
 def eval_integer_infix_expression(operator, left, right):
     left_val = left.value
     right_val = right.value
     if operator == "+":
-        return Integer(left_val + right_val)
+        return new_integer(left_val + right_val)
     elif operator == "-":
-        return Integer(left_val - right_val)
+        return new_integer(left_val - right_val)
     elif operator == "*":
-        return Integer(left_val * right_val)
+        return new_integer(left_val * right_val)
     elif operator == "/":
         return Integer(left_val / right_val)
     elif operator == "<":
@@ -312,9 +636,9 @@ def eval_array_index_expression(array, index):
 
 
 def eval_hash_index_expression(hash, index):
-    if not isinstance(index, (String, Integer, Boolean)):
+    if not isinstance(index, Hashable):
         return new_error(f"unusable as hash key: {index.type()}")
-    pair = hash.pairs.get(index)
+    pair = hash.pairs.get(index.hash_key())
     if pair is None:
         return NULL
     return pair.value
@@ -337,10 +661,72 @@ def apply_function(fn, args):
         evaluated = evaluate(fn.body, extended_env)
         return unwrap_return_value(evaluated)
     elif isinstance(fn, Builtin):
-        return fn.fn(*args)
+        return fn.fn(args)
+    elif isinstance(fn, Memoized):
+        return fn.call(args, apply_function)
     return new_error(f"not a function: {fn.type()}")
 
 
+# The apply_function used while no profiler is set.
+plain_apply_function = apply_function
+
+profiler = None
+budget = None
+
+
+def set_profiler(new_profiler):
+    """Passes every call evaluate() makes through new_profiler, or stops when
+    it is None. This swaps apply_function, so calls cost nothing extra while
+    no profiler is set."""
+    global profiler
+    profiler = new_profiler
+    select_apply_function()
+
+
+def set_budget(new_budget):
+    """Charges every call evaluate() makes to new_budget, or stops when it is
+    None. Like set_profiler, this swaps apply_function."""
+    global budget
+    budget = new_budget
+    select_apply_function()
+
+
+def select_apply_function():
+    global apply_function
+    if budget is not None:
+        apply_function = budgeted_apply_function
+    elif profiler is not None:
+        apply_function = profiled_apply_function
+    else:
+        apply_function = plain_apply_function
+
+
+def profiled_apply_function(fn, args):
+    return profiler.call(fn, args, plain_apply_function)
+
+
+def budgeted_apply_function(fn, args):
+    budget.spend()
+    if profiler is not None:
+        return profiler.call(fn, args, plain_apply_function)
+    return plain_apply_function(fn, args)
+
+
+# How a builtin calls a function value of each engine's own function type,
+# such as the closures of the VM. The modules of those engines add them.
+function_callers = {}
+
+
+def call_function_value(fn, args):
+    """Calls a function value of any engine from a builtin."""
+    if type(fn) is Memoized:
+        return fn.call(args, call_function_value)
+    caller = function_callers.get(type(fn))
+    if caller is not None:
+        return caller(fn, args)
+    return apply_function(fn, args)
+
+
 def extend_function_env(fn, args):
     env = new_enclosed_environment(fn.env)
     for i, param in enumerate(fn.parameters):
@@ -360,11 +746,12 @@ def eval_hash_literal(node, env):
         key = evaluate(key_node, env)
         if is_error(key):
             return key
+        if not isinstance(key, Hashable):
+            return new_error(f"unusable as hash key: {key.type()}")
         value = evaluate(value_node, env)
         if is_error(value):
             return value
-        hash_key = key
-        pairs[hash_key] = HashPair(key, value)
+        pairs[key.hash_key()] = HashPair(key, value)
     return Hash(pairs)
 
 
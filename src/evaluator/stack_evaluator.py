@@ -0,0 +1,384 @@
+from src.ast import ast_
+from src.evaluator.evaluator import (
+    FALSE,
+    NULL,
+    TRUE,
+    apply_function,
+    eval_identifier,
+    eval_index_expression,
+    eval_infix_expression,
+    eval_prefix_expression,
+    extend_function_env,
+    function_callers,
+    new_error,
+)
+from src.object.object import *
+
+# Continuations. Each pending piece of work is a tuple whose first item is one
+# of these codes; the value being returned to it is held in a register.
+PROGRAM_NEXT = 0
+BLOCK_NEXT = 1
+RETURN_WRAP = 2
+LET = 3
+PREFIX = 4
+INFIX_RIGHT = 5
+INFIX_APPLY = 6
+IF = 7
+CALL_FUNCTION = 8
+CALL_ARGUMENT = 9
+# (UNWRAP, n) or, for a call, (UNWRAP, n, function running): the sampling
+# profiler reads the Monkey call stack from these.
+UNWRAP = 10
+ARRAY_ELEMENT = 11
+INDEX_RIGHT = 12
+INDEX_APPLY = 13
+HASH_KEY = 14
+HASH_VALUE = 15
+MEMO_STORE = 16
+PROFILE_EXIT = 17
+
+
+class StackFunction(Function):
+    """A Function made by the stack evaluator, which builtins such as map
+    call back on a continuation stack rather than through apply_function."""
+
+    __slots__ = ()
+
+
+def evaluate(node, env, stack=None):
+    """Evaluates node like evaluator.evaluate, but keeps its own continuation
+    stack instead of recursing, so Monkey recursion is bounded only by memory.
+
+    A call whose result is returned straight away (`return f(x)`, or the
+    last expression of a body) reuses the caller's continuation, so tail
+    recursion runs in constant space. The caller's pending unwrap of the
+    ReturnValue is kept as a count, which gives exactly the same result as
+    unwrapping once per call. The evaluation starts with the continuations
+    in stack if given."""
+    if stack is None:
+        stack = []
+    push = stack.append
+    pop = stack.pop
+    value = None
+
+    while True:
+        if node is not None:
+            t = type(node)
+
+            if t is ast_.Identifier:
+                value = eval_identifier(node, env)
+            elif t is ast_.IntegerLiteral:
+                value = node.constant
+                if value is None:
+                    value = node.constant = new_integer(node.value)
+            elif t is ast_.InfixExpression:
+                push((INFIX_RIGHT, node, env))
+                node = node.left
+                continue
+            elif t is ast_.ExpressionStatement:
+                node = node.expression
+                continue
+            elif t is ast_.CallExpression:
+                push((CALL_FUNCTION, node, env))
+                node = node.function
+                continue
+            elif t is ast_.IfExpression:
+                push((IF, node, env))
+                node = node.condition
+                continue
+            elif t is ast_.BlockStatement:
+                statements = node.statements
+                if not statements:
+                    value = None
+                else:
+                    if len(statements) > 1:
+                        push((BLOCK_NEXT, statements, 1, env))
+                    node = statements[0]
+                    continue
+            elif t is ast_.ReturnStatement:
+                push((RETURN_WRAP,))
+                node = node.return_value
+                continue
+            elif t is ast_.LetStatement:
+                push((LET, node.name.value, env))
+                node = node.value
+                continue
+            elif t is ast_.Boolean:
+                value = TRUE if node.value else FALSE
+            elif t is ast_.StringLiteral:
+                value = node.constant
+                if value is None:
+                    value = node.constant = new_string(node.value)
+            elif t is ast_.PrefixExpression:
+                push((PREFIX, node.operator))
+                node = node.right
+                continue
+            elif t is ast_.FunctionLiteral:
+                value = StackFunction(node.parameters, node.body, env)
+            elif t is ast_.ArrayLiteral:
+                if not node.elements:
+                    value = Array([])
+                else:
+                    push((ARRAY_ELEMENT, node.elements, [], env))
+                    node = node.elements[0]
+                    continue
+            elif t is ast_.IndexExpression:
+                push((INDEX_RIGHT, node, env))
+                node = node.left
+                continue
+            elif t is ast_.HashLiteral:
+                items = list(node.pairs.items())
+                if not items:
+                    value = Hash({})
+                else:
+                    push((HASH_KEY, items, 0, {}, env))
+                    node = items[0][0]
+                    continue
+            elif t is ast_.Program:
+                statements = node.statements
+                if not statements:
+                    value = None
+                else:
+                    push((PROGRAM_NEXT, statements, 1, env) if len(statements) > 1 else (UNWRAP, 1))
+                    node = statements[0]
+                    continue
+            else:
+                value = None
+            node = None
+
+        # Hand the value to the innermost pending continuation. An Error
+        # always ends the whole evaluation, as every caller of evaluate()
+        # passes it straight up.
+        if type(value) is Error or not stack:
+            return value
+        k = pop()
+        code = k[0]
+
+        if code == INFIX_APPLY:
+            left = k[2]
+            if type(left) is Integer and type(value) is Integer:
+                operator = k[1]
+                if operator == "+":
+                    value = new_integer(left.value + value.value)
+                elif operator == "-":
+                    value = new_integer(left.value - value.value)
+                elif operator == "<":
+                    value = TRUE if left.value < value.value else FALSE
+                elif operator == "==":
+                    value = TRUE if left.value == value.value else FALSE
+                else:
+                    value = eval_infix_expression(operator, left, value)
+            else:
+                value = eval_infix_expression(k[1], left, value)
+        elif code == INFIX_RIGHT:
+            push((INFIX_APPLY, k[1].operator, value))
+            node = k[1].right
+            env = k[2]
+        elif code == IF:
+            env = k[2]
+            if value is not NULL and value is not FALSE:
+                node = k[1].consequence
+            elif k[1].alternative is not None:
+                node = k[1].alternative
+            else:
+                value = NULL
+        elif code == CALL_FUNCTION:
+            env = k[2]
+            arguments = k[1].arguments
+            if arguments:
+                push((CALL_ARGUMENT, arguments, value, [], env))
+                node = arguments[0]
+            else:
+                node, env, value = apply(stack, value, [])
+        elif code == CALL_ARGUMENT:
+            args = k[3]
+            args.append(value)
+            arguments = k[1]
+            if len(args) < len(arguments):
+                push(k)
+                node = arguments[len(args)]
+                env = k[4]
+            else:
+                node, env, value = apply(stack, k[2], args)
+        elif code == UNWRAP:
+            for _ in range(k[1]):
+                if type(value) is not ReturnValue:
+                    break
+                value = value.value
+        elif code == BLOCK_NEXT:
+            if type(value) is not ReturnValue:
+                statements = k[1]
+                i = k[2]
+                if i + 1 < len(statements):
+                    push((BLOCK_NEXT, statements, i + 1, k[3]))
+                node = statements[i]
+                env = k[3]
+        elif code == RETURN_WRAP:
+            value = ReturnValue(value)
+        elif code == LET:
+            k[2].set(k[1], value)
+            value = None
+        elif code == PREFIX:
+            value = eval_prefix_expression(k[1], value)
+        elif code == ARRAY_ELEMENT:
+            elements = k[2]
+            elements.append(value)
+            if len(elements) < len(k[1]):
+                push(k)
+                node = k[1][len(elements)]
+                env = k[3]
+            else:
+                value = Array(elements)
+        elif code == INDEX_RIGHT:
+            push((INDEX_APPLY, value))
+            node = k[1].index
+            env = k[2]
+        elif code == INDEX_APPLY:
+            value = eval_index_expression(k[1], value)
+        elif code == HASH_KEY:
+            items = k[1]
+            i = k[2]
+            if not isinstance(value, Hashable):
+                return new_error(f"unusable as hash key: {value.type()}")
+            push((HASH_VALUE, items, i, k[3], k[4], value))
+            node = items[i][1]
+            env = k[4]
+        elif code == HASH_VALUE:
+            items = k[1]
+            i = k[2]
+            pairs = k[3]
+            key = k[5]
+            pairs[key.hash_key()] = HashPair(key, value)
+            if i + 1 < len(items):
+                push((HASH_KEY, items, i + 1, pairs, k[4]))
+                node = items[i + 1][0]
+                env = k[4]
+            else:
+                value = Hash(pairs)
+        elif code == MEMO_STORE:
+            k[1].put(k[2], value)
+        elif code == PROGRAM_NEXT:
+            if type(value) is ReturnValue:
+                return value.value
+            statements = k[1]
+            i = k[2]
+            push((PROGRAM_NEXT, statements, i + 1, k[3]) if i + 1 < len(statements) else (UNWRAP, 1))
+            node = statements[i]
+            env = k[3]
+        elif code == PROFILE_EXIT:
+            profiler.exit()
+
+
+def apply(stack, fn, args):
+    """Starts a call. Returns the (node, env, value) registers to continue with:
+    the body to evaluate for a Function, or the finished value otherwise.
+
+    A memoized Function missing its cache runs on this stack too, under a
+    continuation that stores its result."""
+    if type(fn) is Memoized and (type(fn.fn) is StackFunction or type(fn.fn) is Function):
+        result = memo_lookup(stack, fn, args)
+        if result is not None:
+            return None, None, result
+        fn = fn.fn
+    if type(fn) is not StackFunction and type(fn) is not Function:
+        return None, None, apply_function(fn, args)
+    extended_env = extend_function_env(fn, args)
+    if stack:
+        top = stack[-1]
+        if top[0] == UNWRAP:
+            stack[-1] = (UNWRAP, top[1] + 1, fn)
+            return fn.body, extended_env, None
+        if top[0] == RETURN_WRAP and len(stack) > 1 and stack[-2][0] == UNWRAP:
+            stack.pop()
+            stack[-1] = (UNWRAP, stack[-1][1], fn)
+            return fn.body, extended_env, None
+    stack.append((UNWRAP, 1, fn))
+    return fn.body, extended_env, None
+
+
+def call_from_builtin(fn, args):
+    """Calls a StackFunction for a builtin such as map. Its body runs on a
+    continuation stack of its own, so it can recurse as deeply as a call
+    made in the program."""
+    if budget is not None:
+        budget.spend()
+    if profiler is not None:
+        return profiler.call(fn, args, run_function)
+    return run_function(fn, args)
+
+
+def run_function(fn, args):
+    return evaluate(fn.body, extend_function_env(fn, args), [(UNWRAP, 1, fn)])
+
+
+function_callers[StackFunction] = call_from_builtin
+
+
+def memo_lookup(stack, fn, args):
+    """The cached result of a memoized Function for args, or None after
+    pushing the continuation that stores the result of the call to run."""
+    key = fn.key(args)
+    if key is None:
+        return None
+    result = fn.get(key)
+    if result is None:
+        stack.append((MEMO_STORE, fn, key))
+    return result
+
+
+# The apply used while no profiler is set.
+plain_apply = apply
+
+profiler = None
+budget = None
+
+
+def set_profiler(new_profiler):
+    """Passes every call evaluate() makes through new_profiler, or stops when
+    it is None. This swaps apply, so calls cost nothing extra while no
+    profiler is set."""
+    global profiler
+    profiler = new_profiler
+    select_apply()
+
+
+def set_budget(new_budget):
+    """Charges every call evaluate() makes to new_budget, or stops when it is
+    None. Like set_profiler, this swaps apply; tail calls stay tail calls."""
+    global budget
+    budget = new_budget
+    select_apply()
+
+
+def select_apply():
+    global apply
+    if budget is not None:
+        apply = budgeted_apply
+    elif profiler is not None:
+        apply = profiled_apply
+    else:
+        apply = plain_apply
+
+
+def budgeted_apply(stack, fn, args):
+    budget.spend()
+    if profiler is not None:
+        return profiled_apply(stack, fn, args)
+    return plain_apply(stack, fn, args)
+
+
+def profiled_apply(stack, fn, args):
+    """apply while a profiler is set. A Function's call ends in a
+    PROFILE_EXIT continuation, so it is never run as a tail call."""
+    if type(fn) is Memoized and (type(fn.fn) is StackFunction or type(fn.fn) is Function):
+        result = memo_lookup(stack, fn, args)
+        if result is not None:
+            return None, None, result
+        fn = fn.fn
+    if type(fn) is not StackFunction and type(fn) is not Function:
+        return None, None, profiler.call(fn, args, apply_function)
+    extended_env = extend_function_env(fn, args)
+    profiler.enter(fn)
+    stack.append((PROFILE_EXIT,))
+    stack.append((UNWRAP, 1, fn))
+    return fn.body, extended_env, None
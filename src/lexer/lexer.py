@@ -1,5 +1,17 @@
+import re
+
 from src.lexer.token_ import Token, TokenType
 
+keywords = {
+    "fn": TokenType.FUNCTION,
+    "let": TokenType.LET,
+    "true": TokenType.TRUE,
+    "false": TokenType.FALSE,
+    "if": TokenType.IF,
+    "else": TokenType.ELSE,
+    "return": TokenType.RETURN,
+}
+
 
 class Lexer:
     def __init__(self, input: str):
@@ -7,6 +19,11 @@ class Lexer:
         self.position = 0
         self.read_position = 0
         self.ch = ''
+        # The line at offset `counted` of input, and the offset its line
+        # starts at, which is negative when that was in text already dropped.
+        self.line = 1
+        self.counted = 0
+        self.line_start = 0
         self.read_char()
 
     def read_char(self):
@@ -97,9 +114,12 @@ class Lexer:
             tok = Token(TokenType.EOF, '')
         else:
             if self.ch.isalpha() or self.ch == '_':
+                start = self.position
                 literal = self.read_identifier()
                 token_type = self.lookup_ident(literal)
                 tok = Token(token_type, literal)
+                if token_type == TokenType.FUNCTION:
+                    tok.line, tok.column = self.locate(start)
                 return tok
             elif self.ch.isdigit():
                 literal = self.read_number()
@@ -112,14 +132,176 @@ class Lexer:
         return tok
 
     def lookup_ident(self, ident):
-        # Define the lookup table for keywords
-        keywords = {
-            "fn": TokenType.FUNCTION,
-            "let": TokenType.LET,
-            "true": TokenType.TRUE,
-            "false": TokenType.FALSE,
-            "if": TokenType.IF,
-            "else": TokenType.ELSE,
-            "return": TokenType.RETURN,
-        }
-        return keywords.get(ident, TokenType.IDENT)
\ No newline at end of file
+        return keywords.get(ident, TokenType.IDENT)
+
+    def locate(self, offset):
+        """The line and column of offset in input, counting the newlines
+        since the last offset located."""
+        self.line += self.input.count("\n", self.counted, offset)
+        self.counted = offset
+        newline = self.input.rfind("\n", 0, offset)
+        if newline >= 0:
+            self.line_start = newline + 1
+        return self.line, offset - self.line_start + 1
+
+
+operators = {
+    "==": TokenType.EQ,
+    "!=": TokenType.NOT_EQ,
+    "=": TokenType.ASSIGN,
+    "+": TokenType.PLUS,
+    "-": TokenType.MINUS,
+    "!": TokenType.BANG,
+    "/": TokenType.SLASH,
+    "*": TokenType.ASTERISK,
+    "<": TokenType.LT,
+    ">": TokenType.GT,
+    ";": TokenType.SEMICOLON,
+    ":": TokenType.COLON,
+    ",": TokenType.COMMA,
+    "{": TokenType.LBRACE,
+    "}": TokenType.RBRACE,
+    "(": TokenType.LPAREN,
+    ")": TokenType.RPAREN,
+    "[": TokenType.LBRACKET,
+    "]": TokenType.RBRACKET,
+}
+
+token_types = {
+    "int": TokenType.INT,
+    "string": TokenType.STRING,
+    "eof": TokenType.EOF,
+    "illegal": TokenType.ILLEGAL,
+}
+
+# One pattern for every token, tried at the current position after skipping
+# whitespace. It follows Lexer exactly for ASCII input: a NUL character reads
+# as EOF, and a string runs to the next quote or NUL, which it consumes.
+TOKEN_PATTERN = re.compile(r"""
+    [ \t\n\r]*
+    (?:
+        (?P<ident>[A-Za-z_]+)
+      | (?P<int>[0-9]+)
+      | "(?P<string>[^"\x00]*)["\x00]?
+      | (?P<operator>==|!=|[-=+!/*<>;:,{}()\[\]])
+      | (?:\x00|\Z)(?P<eof>)
+      | (?P<illegal>.)
+    )""", re.VERBOSE | re.DOTALL)
+
+
+CHUNK_SIZE = 1 << 16
+
+
+def tokenize(input: str):
+    """Yields the same tokens as Lexer.next_token, ending with EOF forever."""
+    return tokenize_chunks((input,))
+
+
+def tokenize_chunks(chunks):
+    """Like tokenize, for a source given as an iterable of str chunks.
+
+    Only the unread part of the current chunk is held. A match that reaches
+    the end of it may be a token cut in two, so more input is read and the
+    match is tried again. A chunk with non-ASCII text hands the rest of the
+    source to ChunkedLexer, since str.isalpha and str.isdigit accept far
+    more characters than the pattern does."""
+    chunks = iter(chunks)
+    more = True
+    buffer = ""
+    position = 0
+    match = TOKEN_PATTERN.match
+    # Positions are worked out only for `fn` tokens, as Lexer.locate does:
+    # the line at offset `counted` of buffer and the offset its line starts.
+    line = 1
+    counted = 0
+    line_start = 0
+    while True:
+        m = match(buffer, position)
+        if more and m.end() == len(buffer):
+            chunk = next(chunks, None)
+            if chunk is None:
+                more = False
+                continue
+            line += buffer.count("\n", counted, position)
+            newline = buffer.rfind("\n", 0, position)
+            line_start = (newline + 1 if newline >= 0 else line_start) - position
+            counted = 0
+            if not chunk.isascii():
+                lexer = ChunkedLexer(buffer[position:] + chunk, chunks)
+                lexer.line = line
+                lexer.line_start = line_start
+                while True:
+                    yield lexer.next_token()
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+
+        position = m.end()
+        kind = m.lastgroup
+        literal = m[kind]
+        if kind == "ident":
+            token = Token(keywords.get(literal, TokenType.IDENT), literal)
+            if literal == "fn":
+                start = m.start(kind)
+                line += buffer.count("\n", counted, start)
+                counted = start
+                newline = buffer.rfind("\n", 0, start)
+                if newline >= 0:
+                    line_start = newline + 1
+                token.line = line
+                token.column = start - line_start + 1
+            yield token
+        elif kind == "operator":
+            yield Token(operators[literal], literal)
+        else:
+            yield Token(token_types[kind], literal)
+
+
+def read_chunks(file, chunk_size=CHUNK_SIZE):
+    """Yields the text of an open file chunk_size characters at a time."""
+    return iter(lambda: file.read(chunk_size), "")
+
+
+class ChunkedLexer(Lexer):
+    """A Lexer whose input is read from an iterator of chunks as it goes.
+    Text before the current token is dropped once it passes CHUNK_SIZE."""
+
+    def __init__(self, input: str, chunks):
+        self.chunks = chunks
+        super().__init__(input)
+
+    def read_char(self):
+        if self.read_position >= len(self.input):
+            self.input += next(self.chunks, "")
+        super().read_char()
+
+    def peek_char(self):
+        if self.read_position >= len(self.input):
+            self.input += next(self.chunks, "")
+        return super().peek_char()
+
+    def next_token(self):
+        if self.position > CHUNK_SIZE:
+            self.locate(self.position)
+            self.line_start -= self.position
+            self.counted = 0
+            self.input = self.input[self.position:]
+            self.read_position -= self.position
+            self.position = 0
+        return super().next_token()
+
+
+class FastLexer:
+    """A drop-in replacement for Lexer that scans with TOKEN_PATTERN.
+    input is the source text, or an iterable of chunks of it such as
+    read_chunks(file). Tokens are produced lazily; iterate over it or call
+    next_token."""
+
+    def __init__(self, input):
+        self.tokens = tokenize(input) if isinstance(input, str) else tokenize_chunks(input)
+
+    def __iter__(self):
+        return self.tokens
+
+    def next_token(self):
+        return next(self.tokens)
@@ -47,6 +47,11 @@ class TokenType(Enum):
 
 
 class Token:
+    # Where the token starts in the source, counting from 1. The lexers only
+    # record it for `fn` tokens, which is what profiles report functions by.
+    line = None
+    column = None
+
     def __init__(self, token_type: TokenType, literal: str):
         self.token_type = token_type
         self.literal = literal
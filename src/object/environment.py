@@ -1,4 +1,6 @@
 class Environment:
+    __slots__ = ("store", "outer")
+
     def __init__(self, outer=None):
         self.store = {}
         self.outer = outer
@@ -14,6 +16,35 @@ class Environment:
         return val
 
 
+class Frame:
+    """An array-backed environment for one function call.
+
+    Names are resolved to slot indexes ahead of time (see src.resolver), so
+    compiled code reads `slots[i]` directly. `get` and `set` by name are kept
+    so a Frame can still be the outer scope of a plain Environment."""
+
+    __slots__ = ("names", "slots", "outer", "globals")
+
+    def __init__(self, names, outer, slots=None):
+        self.names = names
+        self.slots = slots if slots is not None else [None] * len(names)
+        self.outer = outer
+        self.globals = outer.globals if isinstance(outer, Frame) else outer
+
+    def get(self, name):
+        if name in self.names:
+            obj = self.slots[self.names.index(name)]
+            if obj is not None:
+                return obj
+        if self.outer is not None:
+            return self.outer.get(name)
+        return None
+
+    def set(self, name, val):
+        self.slots[self.names.index(name)] = val
+        return val
+
+
 def new_environment():
     return Environment()
 
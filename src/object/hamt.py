@@ -0,0 +1,185 @@
+BITS = 5
+MASK = (1 << BITS) - 1
+HASH_BITS = 64
+HASH_MASK = (1 << HASH_BITS) - 1
+
+# int.bit_count is only there from Python 3.10 on.
+popcount = getattr(int, "bit_count", None) or (lambda x: bin(x).count("1"))
+
+
+class Node:
+    """A trie node. Bit i of bitmap is set when the node has an entry for
+    hash fragment i, and entries holds those in fragment order. An entry is
+    either a (hash, key, value, order) leaf tuple or a child Node, where
+    order numbers the keys in the order they were first added."""
+
+    __slots__ = ("bitmap", "entries")
+
+    def __init__(self, bitmap, entries):
+        self.bitmap = bitmap
+        self.entries = entries
+
+
+class CollisionNode:
+    """Leaves whose whole hash is equal, kept below the last trie level."""
+
+    __slots__ = ("entries",)
+
+    def __init__(self, entries):
+        self.entries = entries
+
+
+EMPTY_NODE = Node(0, [])
+
+
+class Hamt:
+    """A persistent hash array mapped trie.
+
+    A Hamt is never changed once built. set returns a new Hamt that shares
+    every node off the path to the changed leaf, so lookups and inserts cost
+    O(log32 n) and an updated hash does not copy its old entries.
+
+    Iterating yields the keys in the order they were first added, like a
+    dict, rather than in the order of their hashes, which for strings
+    differ from one process to the next."""
+
+    __slots__ = ("root", "count", "next_order")
+
+    def __init__(self, root=EMPTY_NODE, count=0, next_order=0):
+        self.root = root
+        self.count = count
+        # The order of the next key added.
+        self.next_order = next_order
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        """Yields the (key, value) pairs in insertion order."""
+        leaves = sorted(iter_leaves(self.root), key=leaf_order)
+        return ((leaf[1], leaf[2]) for leaf in leaves)
+
+    def get(self, key, default=None):
+        h = hash(key) & HASH_MASK
+        node = self.root
+        shift = 0
+        while True:
+            if type(node) is CollisionNode:
+                for _, k, v, _ in node.entries:
+                    if k is key or k == key:
+                        return v
+                return default
+            bit = 1 << ((h >> shift) & MASK)
+            if not node.bitmap & bit:
+                return default
+            entry = node.entries[popcount(node.bitmap & (bit - 1))]
+            if type(entry) is tuple:
+                k = entry[1]
+                return entry[2] if k is key or k == key else default
+            node = entry
+            shift += BITS
+
+    def set(self, key, value):
+        """Returns a new Hamt with key mapped to value."""
+        root, added = assoc(self.root, 0, (hash(key) & HASH_MASK, key, value, self.next_order))
+        if added:
+            return Hamt(root, self.count + 1, self.next_order + 1)
+        return Hamt(root, self.count, self.next_order)
+
+    def values(self):
+        for _, value in self:
+            yield value
+
+
+def assoc(node, shift, leaf):
+    """Returns a copy of node with leaf added, and whether the key is new.
+    A leaf replacing one with the same key keeps that one's order."""
+    h, key = leaf[0], leaf[1]
+    if type(node) is CollisionNode:
+        entries = list(node.entries)
+        for i, entry in enumerate(entries):
+            if entry[1] == key:
+                entries[i] = leaf[:3] + entry[3:]
+                return CollisionNode(entries), False
+        return CollisionNode(entries + [leaf]), True
+
+    bit = 1 << ((h >> shift) & MASK)
+    i = popcount(node.bitmap & (bit - 1))
+    if not node.bitmap & bit:
+        return Node(node.bitmap | bit, node.entries[:i] + [leaf] + node.entries[i:]), True
+
+    entry = node.entries[i]
+    if type(entry) is tuple:
+        if entry[1] == key:
+            child, added = leaf[:3] + entry[3:], False
+        else:
+            child, added = merge_leaves(shift + BITS, entry, leaf), True
+    else:
+        child, added = assoc(entry, shift + BITS, leaf)
+    entries = list(node.entries)
+    entries[i] = child
+    return Node(node.bitmap, entries), added
+
+
+def merge_leaves(shift, a, b):
+    if shift >= HASH_BITS:
+        return CollisionNode([a, b])
+    fragment_a = (a[0] >> shift) & MASK
+    fragment_b = (b[0] >> shift) & MASK
+    if fragment_a == fragment_b:
+        return Node(1 << fragment_a, [merge_leaves(shift + BITS, a, b)])
+    entries = [a, b] if fragment_a < fragment_b else [b, a]
+    return Node((1 << fragment_a) | (1 << fragment_b), entries)
+
+
+def insert(node, shift, leaf):
+    """Adds leaf to node in place, for nodes nothing else refers to yet, and
+    returns whether the key is new."""
+    h, key = leaf[0], leaf[1]
+    if type(node) is CollisionNode:
+        for i, entry in enumerate(node.entries):
+            if entry[1] == key:
+                node.entries[i] = leaf[:3] + entry[3:]
+                return False
+        node.entries.append(leaf)
+        return True
+
+    bit = 1 << ((h >> shift) & MASK)
+    i = popcount(node.bitmap & (bit - 1))
+    if not node.bitmap & bit:
+        node.bitmap |= bit
+        node.entries.insert(i, leaf)
+        return True
+
+    entry = node.entries[i]
+    if type(entry) is not tuple:
+        return insert(entry, shift + BITS, leaf)
+    elif entry[1] == key:
+        node.entries[i] = leaf[:3] + entry[3:]
+        return False
+    node.entries[i] = merge_leaves(shift + BITS, entry, leaf)
+    return True
+
+
+def iter_leaves(node):
+    for entry in node.entries:
+        if type(entry) is tuple:
+            yield entry
+        else:
+            yield from iter_leaves(entry)
+
+
+def leaf_order(leaf):
+    return leaf[3]
+
+
+def new_hamt(items):
+    """Builds a Hamt from (key, value) pairs; a later pair replaces the value
+    of an earlier one with the same key. The nodes are new, so they are
+    filled in place rather than copied on every insert."""
+    root = Node(0, [])
+    count = 0
+    for key, value in items:
+        if insert(root, 0, (hash(key) & HASH_MASK, key, value, count)):
+            count += 1
+    return Hamt(root, count, count)
@@ -1,4 +1,8 @@
-import hashlib
+import collections
+import weakref
+
+from src.object.hamt import Hamt, new_hamt
+from src.object.vector import Vector, new_vector
 
 NULL_OBJ = "NULL"
 ERROR_OBJ = "ERROR"
@@ -10,9 +14,12 @@ FUNCTION_OBJ = "FUNCTION"
 BUILTIN_OBJ = "BUILTIN"
 ARRAY_OBJ = "ARRAY"
 HASH_OBJ = "HASH"
+COMPILED_FUNCTION_OBJ = "COMPILED_FUNCTION"
 
 
 class Object:
+    __slots__ = ()
+
     def type(self):
         raise NotImplementedError
 
@@ -21,11 +28,15 @@ class Object:
 
 
 class Hashable(Object):
+    __slots__ = ()
+
     def hash_key(self):
         raise NotImplementedError
 
 
 class Integer(Hashable):
+    __slots__ = ("value",)
+
     def __init__(self, value):
         self.value = value
 
@@ -39,7 +50,26 @@ class Integer(Hashable):
         return self.type(), self.value
 
 
+# Integer objects for the most common values are shared rather than
+# allocated each time. Objects are never mutated, so sharing is safe.
+SMALL_INTEGER_MIN = -5
+SMALL_INTEGER_MAX = 1024
+
+
+def new_integer(value):
+    """Returns an Integer for value, reusing the shared object when value is a
+    small int. Division results are floats and always get a new object."""
+    if type(value) is int and SMALL_INTEGER_MIN <= value <= SMALL_INTEGER_MAX:
+        return small_integers[value - SMALL_INTEGER_MIN]
+    return Integer(value)
+
+
+small_integers = [Integer(i) for i in range(SMALL_INTEGER_MIN, SMALL_INTEGER_MAX + 1)]
+
+
 class Boolean(Hashable):
+    __slots__ = ("value",)
+
     def __init__(self, value):
         self.value = value
 
@@ -55,6 +85,8 @@ class Boolean(Hashable):
 
 
 class Null(Object):
+    __slots__ = ()
+
     def type(self):
         return NULL_OBJ
 
@@ -63,6 +95,8 @@ class Null(Object):
 
 
 class ReturnValue(Object):
+    __slots__ = ("value",)
+
     def __init__(self, value):
         self.value = value
 
@@ -74,6 +108,8 @@ class ReturnValue(Object):
 
 
 class Error(Object):
+    __slots__ = ("message",)
+
     def __init__(self, message):
         self.message = message
 
@@ -85,6 +121,8 @@ class Error(Object):
 
 
 class Function(Object):
+    __slots__ = ("parameters", "body", "env")
+
     def __init__(self, parameters, body, env):
         self.parameters = parameters
         self.body = body
@@ -94,13 +132,16 @@ class Function(Object):
         return FUNCTION_OBJ
 
     def inspect(self):
-        params = ", ".join([p.string() for p in self.parameters])
+        params = ", ".join([str(p) for p in self.parameters])
         return f"fn({params}) {{\n{str(self.body)}\n}}"
 
 
 class String(Hashable):
+    __slots__ = ("value", "key", "__weakref__")
+
     def __init__(self, value):
         self.value = value
+        self.key = None
 
     def type(self):
         return STRING_OBJ
@@ -109,11 +150,35 @@ class String(Hashable):
         return self.value
 
     def hash_key(self):
-        h = hashlib.sha256(self.value.encode())
-        return self.type(), int(h.hexdigest(), 16)
+        # Built once per object. Hashing it reuses the hash that Python
+        # caches on the str itself.
+        key = self.key
+        if key is None:
+            key = self.key = (STRING_OBJ, self.value)
+        return key
+
+
+# String objects for identifier-like literals, shared by every literal with
+# the same value while any of them is alive. Weak, so that a long-lived
+# process such as a daemon or pmap worker does not keep the literals of
+# every program it has run.
+interned_strings = weakref.WeakValueDictionary()
+
+
+def new_string(value):
+    """Returns a String for a literal value, reusing the shared object when
+    the value is identifier-like."""
+    if not value.isidentifier():
+        return String(value)
+    string = interned_strings.get(value)
+    if string is None:
+        string = interned_strings[value] = String(value)
+    return string
 
 
 class Builtin(Object):
+    __slots__ = ("fn",)
+
     def __init__(self, fn):
         self.fn = fn
 
@@ -125,8 +190,11 @@ class Builtin(Object):
 
 
 class Array(Object):
+    __slots__ = ("elements",)
+
     def __init__(self, elements):
-        self.elements = elements
+        # Always a Vector, so push and rest can share structure.
+        self.elements = elements if type(elements) is Vector else new_vector(elements)
 
     def type(self):
         return ARRAY_OBJ
@@ -137,6 +205,8 @@ class Array(Object):
 
 
 class HashPair(Object):
+    __slots__ = ("key", "value")
+
     def __init__(self, key, value):
         self.key = key
         self.value = value
@@ -146,12 +216,154 @@ class HashPair(Object):
 
 
 class Hash(Object):
+    __slots__ = ("pairs",)
+
     def __init__(self, pairs):
-        self.pairs = pairs
+        # Maps each key's hash_key() to its HashPair. A dict is converted.
+        self.pairs = pairs if type(pairs) is Hamt else new_hamt(pairs.items())
 
     def type(self):
         return HASH_OBJ
 
     def inspect(self):
-        pairs = [p.inspect() for p in self.pairs]
+        pairs = [p.inspect() for p in self.pairs.values()]
         return f"{{{', '.join(pairs)}}}"
+
+
+class CompiledFunction(Object):
+    __slots__ = ("instructions", "num_locals", "num_parameters", "parameters", "body", "free_names", "cells",
+                 "outers")
+
+    def __init__(self, instructions, num_locals=0, num_parameters=0, parameters=None, body=None, free_names=None,
+                 cells=None, outers=None):
+        self.instructions = instructions
+        self.num_locals = num_locals
+        self.num_parameters = num_parameters
+        # Kept so a closure inspects exactly like an evaluated Function, and
+        # so that pmap can rebuild it in another process from its source and
+        # the names of its free values.
+        self.parameters = parameters if parameters is not None else []
+        self.body = body
+        self.free_names = free_names if free_names is not None else []
+        # A (slot, scope, index) for each local kept in a Cell, and the
+        # (scope, index) of the variable each local slot that may be read
+        # unset goes on to: a free variable or a global.
+        self.cells = cells if cells is not None else []
+        self.outers = outers if outers is not None else {}
+
+    def type(self):
+        return COMPILED_FUNCTION_OBJ
+
+    def inspect(self):
+        params = ", ".join([str(p) for p in self.parameters])
+        return f"fn({params}) {{\n{str(self.body)}\n}}"
+
+
+class Closure(Object):
+    __slots__ = ("fn", "free")
+
+    def __init__(self, fn, free=None):
+        self.fn = fn
+        self.free = free if free is not None else []
+
+    def type(self):
+        return FUNCTION_OBJ
+
+    def inspect(self):
+        return self.fn.inspect()
+
+
+class Cell:
+    """A local of a compiled function that an inner function refers to, so
+    that the closure sees the value it has when read rather than when the
+    closure was made. value is None until it is set; a read then goes on to
+    outer, the Cell of the same name in the enclosing function or the index
+    of the global."""
+
+    __slots__ = ("value", "outer")
+
+    def __init__(self, value, outer):
+        self.value = value
+        self.outer = outer
+
+
+# How many results a memoized function keeps unless memo() is given a size.
+DEFAULT_MEMO_SIZE = 4096
+
+# When set to a list, every Memoized made is added to it, so that its
+# statistics can be reported after a run.
+memo_registry = None
+
+
+class Memoized(Object):
+    """A function whose results are kept in a bounded LRU cache, keyed by the
+    hash_key() of its arguments.
+
+    Calls with an argument that is not Hashable, or a float Integer (whose
+    key equals that of the int), are not cached, and neither are Errors.
+    A cached Array or Hash result is the same object each time, so `==` on
+    two results is true where the unmemoized function would give false.
+
+    It inspects and reports its type like the function it wraps. Each engine
+    calls it in its own way, through key(), get() and put() or through
+    call()."""
+
+    __slots__ = ("fn", "size", "name", "cache", "hits", "misses", "evictions", "uncached")
+
+    def __init__(self, fn, size=DEFAULT_MEMO_SIZE, name=None):
+        self.fn = fn
+        self.size = size
+        self.name = name
+        self.cache = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.uncached = 0
+        if memo_registry is not None:
+            memo_registry.append(self)
+
+    def type(self):
+        return self.fn.type()
+
+    def inspect(self):
+        return self.fn.inspect()
+
+    def key(self, args):
+        """The cache key for args, or None when the call cannot be cached."""
+        key = []
+        for arg in args:
+            if not isinstance(arg, Hashable) or (type(arg) is Integer and type(arg.value) is not int):
+                self.uncached += 1
+                return None
+            key.append(arg.hash_key())
+        return tuple(key)
+
+    def get(self, key):
+        """The cached result for key, or None after counting a miss."""
+        result = self.cache.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.cache.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        if result is None or type(result) is Error:
+            return
+        self.cache[key] = result
+        if len(self.cache) > self.size:
+            self.cache.popitem(last=False)
+            self.evictions += 1
+
+    def call(self, args, call):
+        """Returns the result for args, running call(self.fn, args) on a
+        miss."""
+        key = self.key(args)
+        if key is None:
+            return call(self.fn, args)
+        result = self.get(key)
+        if result is None:
+            result = call(self.fn, args)
+            self.put(key, result)
+        return result
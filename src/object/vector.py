@@ -0,0 +1,108 @@
+BITS = 5
+WIDTH = 1 << BITS
+MASK = WIDTH - 1
+
+
+class Vector:
+    """A persistent vector: a 32-way trie with the last, partly filled leaf
+    kept aside as the tail.
+
+    A Vector is never changed once built. push and rest return a new Vector
+    that shares everything but the path they touch, so building an array one
+    push at a time costs O(1) per element instead of copying the whole list.
+    rest only moves `start` forward; the dropped elements stay in the trie
+    until the last Vector sharing it is gone."""
+
+    __slots__ = ("count", "shift", "root", "tail", "start")
+
+    def __init__(self, count=0, shift=BITS, root=None, tail=None, start=0):
+        # count includes the `start` elements that rest has dropped.
+        self.count = count
+        self.shift = shift
+        self.root = root if root is not None else []
+        self.tail = tail if tail is not None else []
+        self.start = start
+
+    def __len__(self):
+        return self.count - self.start
+
+    def __getitem__(self, i):
+        n = self.count - self.start
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("vector index out of range")
+        i += self.start
+        tail_offset = self.count - len(self.tail)
+        if i >= tail_offset:
+            return self.tail[i - tail_offset]
+        return self.leaf_for(i)[i & MASK]
+
+    def __iter__(self):
+        tail_offset = self.count - len(self.tail)
+        i = self.start
+        while i < tail_offset:
+            yield from self.leaf_for(i)[i & MASK:]
+            i = (i | MASK) + 1
+        yield from self.tail[i - tail_offset:]
+
+    def leaf_for(self, i):
+        node = self.root
+        for level in range(self.shift, 0, -BITS):
+            node = node[(i >> level) & MASK]
+        return node
+
+    def push(self, value):
+        """Returns a new Vector with value added at the end."""
+        if len(self.tail) < WIDTH:
+            return Vector(self.count + 1, self.shift, self.root, self.tail + [value], self.start)
+        root, shift = push_leaf(self.count, self.shift, self.root, self.tail)
+        return Vector(self.count + 1, shift, root, [value], self.start)
+
+    def rest(self):
+        """Returns a new Vector without the first element."""
+        return Vector(self.count, self.shift, self.root, self.tail, self.start + 1)
+
+
+def push_leaf(count, shift, root, leaf):
+    """Adds a full leaf to the trie. count is the number of elements once the
+    leaf is in. Returns the new root and shift."""
+    if (count >> BITS) > (1 << shift):
+        return [root, new_path(shift, leaf)], shift + BITS
+    return push_tail(count, shift, root, leaf), shift
+
+
+def push_tail(count, level, parent, leaf):
+    subidx = ((count - 1) >> level) & MASK
+    node = list(parent)
+    if level == BITS:
+        insert = leaf
+    elif subidx < len(parent):
+        insert = push_tail(count, level - BITS, parent[subidx], leaf)
+    else:
+        insert = new_path(level - BITS, leaf)
+    if subidx < len(node):
+        node[subidx] = insert
+    else:
+        node.append(insert)
+    return node
+
+
+def new_path(level, leaf):
+    node = leaf
+    while level:
+        node = [node]
+        level -= BITS
+    return node
+
+
+def new_vector(items):
+    """Builds a Vector holding items, filling the trie a leaf at a time."""
+    items = list(items)
+    n = len(items)
+    tail_start = ((n - 1) >> BITS) << BITS if n else 0
+    root = []
+    shift = BITS
+    for base in range(0, tail_start, WIDTH):
+        root, shift = push_leaf(base + WIDTH, shift, root, items[base:base + WIDTH])
+    return Vector(n, shift, root, items[tail_start:])
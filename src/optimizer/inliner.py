@@ -0,0 +1,402 @@
+import collections
+import mmap
+import re
+
+from src.ast import ast_
+from src.ast.walk import collect_nodes, identifier_names
+from src.evaluator.evaluator import builtins
+
+# Bodies with more nodes than this are not copied into their callers.
+MAX_INLINE_NODES = 24
+
+EFFECT = ("effect", None)
+
+
+class Definition:
+    """A function bound by `let name = fn(...) { expression }` whose calls
+    can be replaced by a copy of expression.
+
+    events lists what evaluating expression does, in order: ("param", name)
+    for each read of a parameter outside an if branch, ("conditional", name)
+    for a read inside one, and EFFECT for anything that may fail or have a
+    side effect (a call, an operator, a lookup of a name that may be
+    unbound)."""
+
+    def __init__(self, name, literal):
+        self.name = name
+        self.parameters = [p.value for p in literal.parameters]
+        self.expression = body_expression(literal)
+        self.free_names = {n for n in identifier_names(self.expression) if n not in self.parameters}
+        self.events = []
+        collect_events(self.expression, set(self.parameters), self.events)
+
+
+class Scope:
+    """A function body: the names it binds, how often each is bound by a
+    let, and the definitions made directly in it so far."""
+
+    def __init__(self, parameters=(), let_counts=None):
+        self.parameters = set(parameters)
+        self.let_counts = let_counts if let_counts is not None else collections.Counter()
+        self.names = self.parameters | set(self.let_counts)
+        self.definitions = {}
+
+    def is_final(self, name):
+        return self.let_counts[name] == 1
+
+
+class GlobalScope(Scope):
+    """The top level. Whether a top-level let is the only binding of its
+    name depends on statements that may not have been parsed yet, so the
+    caller passes the names known to be bound once; with none, top-level
+    functions are never inlined."""
+
+    def __init__(self, final_names=()):
+        super().__init__()
+        self.final_names = frozenset(final_names)
+
+    def is_final(self, name):
+        return name in self.final_names
+
+
+class Inliner:
+    """Replaces calls to small, non-recursive functions with their bodies.
+
+    A call `f(a, b)` is inlined when f was bound earlier in the same or an
+    enclosing function body, or at the top level, by a let that is its only
+    binding, to a function whose body is a single expression of at most
+    MAX_INLINE_NODES nodes that defines no functions, makes no bindings and
+    does not return. No function between the definition and the call may
+    bind f or any other name the body refers to, so every name means the
+    same thing in the copy.
+
+    Arguments are substituted for the parameters. A constant, or a
+    parameter of an enclosing function, may be read any number of times.
+    Any other argument must be read exactly once, outside if branches, in
+    parameter order and before anything in the body that can fail or have
+    an effect, so that it runs at the same point it would have in the call.
+    Calls whose arguments cannot be substituted that way are left alone.
+
+    One Inliner handles a whole program, whether it is given as a Program
+    or as top-level statements in order. `inlined` counts the inlined call
+    sites per function name."""
+
+    def __init__(self, final_names=()):
+        self.scopes = [GlobalScope(final_names)]
+        self.inlined = collections.Counter()
+
+    def inline(self, node):
+        """Inlines calls in a Program or a top-level statement and returns
+        the node to run in its place."""
+        if isinstance(node, ast_.Program):
+            node.statements = self.inline_statements(node.statements)
+            return node
+        return self.inline_statements([node])[0]
+
+    def inline_statements(self, statements):
+        scope = self.scopes[-1]
+        result = []
+        for statement in statements:
+            statement = self.inline_node(statement)
+            if isinstance(statement, ast_.LetStatement) and isinstance(statement.value, ast_.FunctionLiteral):
+                name = statement.name.value
+                if scope.is_final(name) and is_inlinable(statement.value, name):
+                    scope.definitions[name] = Definition(name, statement.value)
+            result.append(statement)
+        return result
+
+    def inline_node(self, node):
+        if isinstance(node, ast_.ExpressionStatement):
+            node.expression = self.inline_node(node.expression)
+        elif isinstance(node, ast_.LetStatement):
+            node.value = self.inline_node(node.value)
+        elif isinstance(node, ast_.ReturnStatement):
+            node.return_value = self.inline_node(node.return_value)
+        elif isinstance(node, ast_.BlockStatement):
+            node.statements = [self.inline_node(s) for s in node.statements]
+        elif isinstance(node, ast_.CallExpression):
+            return self.inline_call(node)
+        elif isinstance(node, ast_.FunctionLiteral):
+            let_counts = collections.Counter()
+            count_lets(node.body, let_counts, into_functions=False)
+            self.scopes.append(Scope([p.value for p in node.parameters], let_counts))
+            node.body.statements = self.inline_statements(node.body.statements)
+            self.scopes.pop()
+        elif isinstance(node, ast_.PrefixExpression):
+            node.right = self.inline_node(node.right)
+        elif isinstance(node, ast_.InfixExpression):
+            node.left = self.inline_node(node.left)
+            node.right = self.inline_node(node.right)
+        elif isinstance(node, ast_.IfExpression):
+            node.condition = self.inline_node(node.condition)
+            node.consequence = self.inline_node(node.consequence)
+            if node.alternative is not None:
+                node.alternative = self.inline_node(node.alternative)
+        elif isinstance(node, ast_.ArrayLiteral):
+            node.elements = [self.inline_node(e) for e in node.elements]
+        elif isinstance(node, ast_.IndexExpression):
+            node.left = self.inline_node(node.left)
+            node.index = self.inline_node(node.index)
+        elif isinstance(node, ast_.HashLiteral):
+            node.pairs = {self.inline_node(k): self.inline_node(v) for k, v in node.pairs.items()}
+        return node
+
+    def inline_call(self, node):
+        node.function = self.inline_node(node.function)
+        node.arguments = [self.inline_node(a) for a in node.arguments]
+        if not isinstance(node.function, ast_.Identifier):
+            return node
+
+        depth = self.binding_depth(node.function.value)
+        definition = self.scopes[depth].definitions.get(node.function.value)
+        if definition is None or len(node.arguments) != len(definition.parameters):
+            return node
+        for scope in self.scopes[depth + 1:]:
+            if not scope.names.isdisjoint(definition.free_names):
+                return node
+
+        substitutions = {}
+        for parameter, argument in zip(definition.parameters, node.arguments):
+            substitutions[parameter] = (argument, self.is_simple_argument(argument))
+        if not can_substitute(definition, substitutions):
+            return node
+
+        self.inlined[definition.name] += 1
+        return copy_expression(definition.expression, substitutions)
+
+    def binding_depth(self, name):
+        """The index in self.scopes of the innermost scope binding name."""
+        for depth in range(len(self.scopes) - 1, 0, -1):
+            if name in self.scopes[depth].names:
+                return depth
+        return 0
+
+    def is_simple_argument(self, argument):
+        """Whether reading argument has no effect and cannot fail, so that it
+        can be copied to every place the parameter is read."""
+        if isinstance(argument, ast_.Identifier):
+            depth = self.binding_depth(argument.value)
+            return depth > 0 and argument.value in self.scopes[depth].parameters
+        return is_constant(argument)
+
+
+def is_constant(node):
+    # Not array or hash literals: each copy would build an object of its
+    # own, which `==` tells apart.
+    node_type = type(node)
+    return node_type is ast_.IntegerLiteral or node_type is ast_.StringLiteral or node_type is ast_.Boolean
+
+
+def is_inlinable(literal, name):
+    parameters = [p.value for p in literal.parameters]
+    if len(set(parameters)) != len(parameters) or len(literal.body.statements) != 1:
+        return False
+    expression = body_expression(literal)
+    if expression is None:
+        return False
+    nodes = []
+    collect_nodes(expression, nodes)
+    if len(nodes) > MAX_INLINE_NODES:
+        return False
+    for node in nodes:
+        if type(node) in (ast_.FunctionLiteral, ast_.LetStatement, ast_.ReturnStatement):
+            return False
+        if type(node) is ast_.Identifier and node.value == name:
+            # Recursive.
+            return False
+    return True
+
+
+def body_expression(literal):
+    """The expression a one-statement function body gives as its value."""
+    statement = literal.body.statements[0]
+    if type(statement) is ast_.ExpressionStatement:
+        return statement.expression
+    elif type(statement) is ast_.ReturnStatement:
+        return statement.return_value
+    return None
+
+
+def can_substitute(definition, substitutions):
+    """Checks the order rule of Inliner for the arguments that are not
+    simple."""
+    pending = [p for p in definition.parameters if not substitutions[p][1]]
+    for kind, name in definition.events:
+        if not pending:
+            break
+        if kind == "effect" or kind == "conditional" and name in pending:
+            return False
+        if kind == "param" and name in pending:
+            if name != pending[0]:
+                return False
+            pending.pop(0)
+    if pending:
+        return False
+    # Each remaining parameter must be read only once.
+    reads = collections.Counter(name for kind, name in definition.events if kind != "effect")
+    return all(reads[p] == 1 for p in definition.parameters if not substitutions[p][1])
+
+
+def collect_events(node, parameters, events):
+    node_type = type(node)
+    if node_type is ast_.Identifier:
+        if node.value in parameters:
+            events.append(("param", node.value))
+        elif node.value not in builtins:
+            events.append(EFFECT)
+    elif node_type is ast_.PrefixExpression:
+        collect_events(node.right, parameters, events)
+        events.append(EFFECT)
+    elif node_type is ast_.InfixExpression:
+        collect_events(node.left, parameters, events)
+        collect_events(node.right, parameters, events)
+        events.append(EFFECT)
+    elif node_type is ast_.IndexExpression:
+        collect_events(node.left, parameters, events)
+        collect_events(node.index, parameters, events)
+        events.append(EFFECT)
+    elif node_type is ast_.CallExpression:
+        collect_events(node.function, parameters, events)
+        for argument in node.arguments:
+            collect_events(argument, parameters, events)
+        events.append(EFFECT)
+    elif node_type is ast_.ArrayLiteral:
+        for element in node.elements:
+            collect_events(element, parameters, events)
+    elif node_type is ast_.HashLiteral:
+        for key, value in node.pairs.items():
+            collect_events(key, parameters, events)
+            collect_events(value, parameters, events)
+            events.append(EFFECT)
+    elif node_type is ast_.IfExpression:
+        collect_events(node.condition, parameters, events)
+        events.append(EFFECT)
+        branches = [node.consequence] if node.alternative is None else [node.consequence, node.alternative]
+        for branch in branches:
+            for name in identifier_names(branch):
+                if name in parameters:
+                    events.append(("conditional", name))
+
+
+def count_lets(node, counts, into_functions):
+    """Counts the let bindings of each name in node. Those inside inner
+    function literals bind names of their own function and are only counted
+    when into_functions is set."""
+    nodes = []
+    collect_nodes(node, nodes, into_functions)
+    for inner in nodes:
+        if type(inner) is ast_.LetStatement:
+            counts[inner.name.value] += 1
+
+
+def copy_expression(node, substitutions):
+    """Returns a new tree for node, with each parameter read replaced by its
+    argument. Simple arguments are copied for every read; the others are
+    read once and used as they are."""
+    return copiers[type(node)](node, substitutions)
+
+
+def copy_identifier(node, substitutions):
+    substitution = substitutions.get(node.value)
+    if substitution is None:
+        return ast_.Identifier(node.token, node.value)
+    argument, simple = substitution
+    return copy_expression(argument, {}) if simple else argument
+
+
+def copy_integer_literal(node, substitutions):
+    copy = ast_.IntegerLiteral(node.token, node.value)
+    copy.constant = node.constant
+    return copy
+
+
+def copy_string_literal(node, substitutions):
+    copy = ast_.StringLiteral(node.token, node.value)
+    copy.constant = node.constant
+    return copy
+
+
+def copy_array_literal(node, substitutions):
+    return ast_.ArrayLiteral(node.token, [copy_expression(e, substitutions) for e in node.elements])
+
+
+def copy_hash_literal(node, substitutions):
+    pairs = {copy_expression(k, substitutions): copy_expression(v, substitutions) for k, v in node.pairs.items()}
+    return ast_.HashLiteral(node.token, pairs)
+
+
+def copy_block_statement(node, substitutions):
+    return ast_.BlockStatement(node.token, [copy_expression(s, substitutions) for s in node.statements])
+
+
+def copy_if_expression(node, substitutions):
+    alternative = None if node.alternative is None else copy_expression(node.alternative, substitutions)
+    return ast_.IfExpression(node.token, copy_expression(node.condition, substitutions),
+                             copy_expression(node.consequence, substitutions), alternative)
+
+
+copiers = {
+    ast_.Identifier: copy_identifier,
+    ast_.IntegerLiteral: copy_integer_literal,
+    ast_.StringLiteral: copy_string_literal,
+    ast_.Boolean: lambda n, s: ast_.Boolean(n.token, n.value),
+    ast_.PrefixExpression: lambda n, s: ast_.PrefixExpression(n.token, n.operator, copy_expression(n.right, s)),
+    ast_.InfixExpression: lambda n, s: ast_.InfixExpression(n.token, copy_expression(n.left, s), n.operator,
+                                                            copy_expression(n.right, s)),
+    ast_.IndexExpression: lambda n, s: ast_.IndexExpression(n.token, copy_expression(n.left, s),
+                                                            copy_expression(n.index, s)),
+    ast_.CallExpression: lambda n, s: ast_.CallExpression(n.token, copy_expression(n.function, s),
+                                                          [copy_expression(a, s) for a in n.arguments]),
+    ast_.IfExpression: copy_if_expression,
+    ast_.BlockStatement: copy_block_statement,
+    ast_.ExpressionStatement: lambda n, s: ast_.ExpressionStatement(n.token, copy_expression(n.expression, s)),
+    ast_.ArrayLiteral: copy_array_literal,
+    ast_.HashLiteral: copy_hash_literal,
+}
+
+
+def final_names(program):
+    """The names a whole Program binds with exactly one let, counting lets at
+    every depth."""
+    return names_bound_once(let_counts(program))
+
+
+def let_counts(program):
+    counts = collections.Counter()
+    count_lets(program, counts, into_functions=True)
+    return counts
+
+
+def names_bound_once(counts):
+    return {name for name, count in counts.items() if count == 1}
+
+
+# The lexer reads `let` followed by whitespace and a name as a let statement.
+# The same text inside a string is counted too, which only makes the result
+# more cautious.
+LET_PATTERN = re.compile(rb"(?<![A-Za-z_])let[ \t\n\r]+([A-Za-z_]+)")
+
+
+def scan_final_names(filename):
+    """The names a script binds with exactly one let, found by scanning its
+    text instead of parsing it, so that statements can still run as they are
+    parsed. Non-ASCII scripts, whose names the pattern cannot follow, give
+    none."""
+    counts = scan_let_counts(filename)
+    return names_bound_once(counts) if counts is not None else set()
+
+
+def scan_let_counts(filename):
+    """How many lets bind each name in a script, as scan_final_names finds
+    them, or None for a non-ASCII script."""
+    with open(filename, "rb") as file:
+        try:
+            text = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # An empty file cannot be mapped.
+            return collections.Counter()
+        with text:
+            if re.search(rb"[\x80-\xff]", text):
+                return None
+            counts = collections.Counter(LET_PATTERN.findall(text))
+    return collections.Counter({name.decode(): count for name, count in counts.items()})
@@ -0,0 +1,104 @@
+import collections
+
+from src.ast import ast_
+from src.ast.walk import collect_nodes
+from src.lexer.token_ import Token, TokenType
+from src.object.object import DEFAULT_MEMO_SIZE
+
+# Builtins whose result depends only on their arguments and that have no
+# effect. map, filter and reduce are not: they call the functions they are
+# given, which may have effects.
+PURE_BUILTINS = frozenset({"len", "first", "last", "rest", "push", "range", "sum", "min", "max", "zip"})
+
+LPAREN_TOKEN = Token(TokenType.LPAREN, "(")
+MEMO_TOKEN = Token(TokenType.IDENT, "memo")
+
+
+class Memoizer:
+    """Wraps pure, recursive top-level functions in the memo builtin.
+
+    `let f = fn(...) { ... }` becomes `let f = memo(fn(...) { ... }, size,
+    "f")` when that let is the only binding of f, the body calls f, and the
+    body is pure: it defines no functions, every call in it is to f, to an
+    earlier top-level function found pure, or to one of PURE_BUILTINS that
+    no let binds, and every other name it reads is a parameter, a local of
+    its own or a name bound once at the top level. A top-level name bound
+    once never changes, so the result of such a function depends only on
+    its arguments.
+
+    let_counts holds how many lets bind each name anywhere in the program;
+    without it, or when the program binds `memo` itself, nothing is
+    memoized. Like the Inliner, one Memoizer handles a Program or its
+    top-level statements in order. `memoized` lists the names wrapped."""
+
+    def __init__(self, let_counts=None, size=DEFAULT_MEMO_SIZE):
+        self.let_counts = let_counts
+        self.size = size
+        self.pure = set()
+        self.memoized = []
+
+    def memoize(self, node):
+        """Memoizes the functions a Program or a top-level statement defines
+        and returns the node to run in its place."""
+        if isinstance(node, ast_.Program):
+            node.statements = [self.memoize_statement(s) for s in node.statements]
+            return node
+        return self.memoize_statement(node)
+
+    def memoize_statement(self, statement):
+        if self.let_counts is None or self.let_counts["memo"] > 0:
+            return statement
+        if not isinstance(statement, ast_.LetStatement) or not isinstance(statement.value, ast_.FunctionLiteral):
+            return statement
+        name = statement.name.value
+        if self.let_counts[name] != 1:
+            return statement
+
+        called = self.pure_calls(name, statement.value)
+        if called is None:
+            return statement
+        self.pure.add(name)
+        if name in called:
+            statement.value = self.memo_call(name, statement.value)
+            self.memoized.append(name)
+        return statement
+
+    def pure_calls(self, name, literal):
+        """The names the body of function name calls, or None when it is not
+        pure."""
+        nodes = []
+        collect_nodes(literal.body, nodes)
+        parameters = {p.value for p in literal.parameters}
+        local_lets = collections.Counter(n.name.value for n in nodes if type(n) is ast_.LetStatement)
+        for local, count in local_lets.items():
+            # Before its let runs, a local name reads the global of the same
+            # name, which must then not change either.
+            if local not in parameters and self.let_counts[local] != count and self.let_counts[local] != count + 1:
+                return None
+        names = parameters | set(local_lets)
+
+        called = set()
+        for node in nodes:
+            node_type = type(node)
+            if node_type is ast_.FunctionLiteral:
+                return None
+            elif node_type is ast_.CallExpression:
+                function = node.function
+                if type(function) is not ast_.Identifier or function.value in names:
+                    return None
+                callee = function.value
+                if callee != name and callee not in self.pure and not self.is_pure_builtin(callee):
+                    return None
+                called.add(callee)
+            elif node_type is ast_.Identifier and node.value not in names:
+                if self.let_counts[node.value] != 1 and not self.is_pure_builtin(node.value):
+                    return None
+        return called
+
+    def is_pure_builtin(self, name):
+        return name in PURE_BUILTINS and self.let_counts[name] == 0
+
+    def memo_call(self, name, literal):
+        size = ast_.IntegerLiteral(Token(TokenType.INT, str(self.size)), self.size)
+        label = ast_.StringLiteral(Token(TokenType.STRING, name), name)
+        return ast_.CallExpression(LPAREN_TOKEN, ast_.Identifier(MEMO_TOKEN, "memo"), [literal, size, label])
@@ -0,0 +1,212 @@
+from src.ast import ast_
+from src.evaluator import evaluator
+from src.lexer.token_ import Token, TokenType
+from src.object.object import Array, Boolean, Hash, Hashable, HashPair, Integer, String
+
+
+def optimize(node):
+    """Rewrites a parsed Program or statement so that work whose result is
+    known before the program runs is done once, here, instead of each time
+    the node is reached. Returns the node to run in its place, which may be
+    node itself with its children replaced.
+
+    - Prefix, infix and index expressions whose operands are all constants
+      are folded into a single literal. The result is computed by the
+      evaluator itself, so it is exactly what running the node would give;
+      a node that would give an error, or raise, is left alone.
+    - An if expression whose condition is a constant keeps only the branch
+      that is taken.
+
+    Array and hash literals are still built each time they are evaluated,
+    even when all their elements are constants: `==` compares arrays and
+    hashes by identity, so sharing one object would change its result. An
+    index into such a literal is folded all the same."""
+    optimizer = optimizers.get(type(node))
+    return node if optimizer is None else optimizer(node)
+
+
+TRUE_TOKEN = Token(TokenType.TRUE, "true")
+FALSE_TOKEN = Token(TokenType.FALSE, "false")
+
+
+def constant_value(node):
+    """The object a constant node evaluates to, or None if node is not one."""
+    node_type = type(node)
+    if node_type is ast_.IntegerLiteral or node_type is ast_.StringLiteral:
+        return evaluator.evaluate(node, None)
+    elif node_type is ast_.Boolean:
+        return evaluator.native_bool_to_boolean_object(node.value)
+    elif node_type is ast_.ArrayLiteral:
+        elements = [constant_value(element) for element in node.elements]
+        return Array(elements) if None not in elements else None
+    elif node_type is ast_.HashLiteral:
+        pairs = {}
+        for key_node, value_node in node.pairs.items():
+            key = constant_value(key_node)
+            value = constant_value(value_node)
+            # An array key is an error, which is left for run time.
+            if not isinstance(key, Hashable) or value is None:
+                return None
+            pairs[key.hash_key()] = HashPair(key, value)
+        return Hash(pairs)
+    return None
+
+
+def new_literal(obj):
+    """A literal node for a folded value, or None when it has no literal
+    form."""
+    if type(obj) is Integer:
+        node = ast_.IntegerLiteral(Token(TokenType.INT, str(obj.value)), obj.value)
+        node.constant = obj
+        return node
+    elif type(obj) is String:
+        node = ast_.StringLiteral(Token(TokenType.STRING, obj.value), obj.value)
+        node.constant = obj
+        return node
+    elif type(obj) is Boolean:
+        return ast_.Boolean(TRUE_TOKEN if obj.value else FALSE_TOKEN, obj.value)
+    return None
+
+
+def fold(node):
+    """Replaces an operator node whose operands are all constants with the
+    literal for its value."""
+    try:
+        result = evaluator.evaluate(node, None)
+    except ArithmeticError:
+        # Division by zero raises at run time; keep it there.
+        return node
+    literal = new_literal(result)
+    return node if literal is None else literal
+
+
+def optimize_statements(statements):
+    optimized = []
+    for i, statement in enumerate(statements):
+        statement = optimize(statement)
+        # A block's value is that of its last statement, so only an if before
+        # it can be replaced by the statements of its taken branch.
+        if i < len(statements) - 1 and is_decided_if_statement(statement):
+            optimized.extend(statement.expression.consequence.statements)
+        else:
+            optimized.append(statement)
+    return optimized
+
+
+def is_decided_if_statement(statement):
+    # The shape optimize_if_expression leaves an if with a constant condition
+    # in, when its taken branch is more than a single expression.
+    if type(statement) is not ast_.ExpressionStatement:
+        return False
+    expression = statement.expression
+    return type(expression) is ast_.IfExpression and type(expression.condition) is ast_.Boolean \
+        and expression.alternative is None
+
+
+def optimize_program(node):
+    node.statements = optimize_statements(node.statements)
+    return node
+
+
+def optimize_block_statement(node):
+    node.statements = optimize_statements(node.statements)
+    return node
+
+
+def optimize_expression_statement(node):
+    node.expression = optimize(node.expression)
+    return node
+
+
+def optimize_return_statement(node):
+    node.return_value = optimize(node.return_value)
+    return node
+
+
+def optimize_let_statement(node):
+    node.value = optimize(node.value)
+    return node
+
+
+def optimize_prefix_expression(node):
+    node.right = optimize(node.right)
+    if constant_value(node.right) is not None:
+        return fold(node)
+    return node
+
+
+def optimize_infix_expression(node):
+    node.left = optimize(node.left)
+    node.right = optimize(node.right)
+    if constant_value(node.left) is not None and constant_value(node.right) is not None:
+        return fold(node)
+    return node
+
+
+def optimize_index_expression(node):
+    node.left = optimize(node.left)
+    node.index = optimize(node.index)
+    if constant_value(node.left) is not None and constant_value(node.index) is not None:
+        return fold(node)
+    return node
+
+
+def optimize_if_expression(node):
+    node.condition = optimize(node.condition)
+    node.consequence = optimize(node.consequence)
+    if node.alternative is not None:
+        node.alternative = optimize(node.alternative)
+
+    condition = constant_value(node.condition)
+    if condition is None:
+        return node
+    if evaluator.is_truthy(condition):
+        taken = node.consequence
+    elif node.alternative is not None:
+        taken = node.alternative
+    else:
+        # Neither branch runs and the value is null.
+        return ast_.IfExpression(node.token, ast_.Boolean(FALSE_TOKEN, False),
+                                 ast_.BlockStatement(node.consequence.token, []))
+
+    if len(taken.statements) == 1 and type(taken.statements[0]) is ast_.ExpressionStatement:
+        return taken.statements[0].expression
+    return ast_.IfExpression(node.token, ast_.Boolean(TRUE_TOKEN, True), taken)
+
+
+def optimize_function_literal(node):
+    node.body = optimize(node.body)
+    return node
+
+
+def optimize_call_expression(node):
+    node.function = optimize(node.function)
+    node.arguments = [optimize(argument) for argument in node.arguments]
+    return node
+
+
+def optimize_array_literal(node):
+    node.elements = [optimize(element) for element in node.elements]
+    return node
+
+
+def optimize_hash_literal(node):
+    node.pairs = {optimize(key): optimize(value) for key, value in node.pairs.items()}
+    return node
+
+
+optimizers = {
+    ast_.Program: optimize_program,
+    ast_.BlockStatement: optimize_block_statement,
+    ast_.ExpressionStatement: optimize_expression_statement,
+    ast_.ReturnStatement: optimize_return_statement,
+    ast_.LetStatement: optimize_let_statement,
+    ast_.PrefixExpression: optimize_prefix_expression,
+    ast_.InfixExpression: optimize_infix_expression,
+    ast_.IndexExpression: optimize_index_expression,
+    ast_.IfExpression: optimize_if_expression,
+    ast_.FunctionLiteral: optimize_function_literal,
+    ast_.CallExpression: optimize_call_expression,
+    ast_.ArrayLiteral: optimize_array_literal,
+    ast_.HashLiteral: optimize_hash_literal,
+}
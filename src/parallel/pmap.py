@@ -0,0 +1,292 @@
+"""pmap(fn, array, chunk): map on a pool of worker processes.
+
+fn is sent to the workers as its source together with the values it reads
+from the scopes around it, found by name in the engine that made it. Those
+values may be integers, strings, booleans, null, arrays, hashes, builtins
+and other functions, which are sent the same way; a function reached again,
+such as a recursive one reading its own name, is sent once. The workers
+rebuild every function with the closure compiler and run fn on one chunk
+of the array at a time; what each chunk prints is printed again here in
+order. fn should be pure: it runs on copies of what it reads."""
+import concurrent.futures
+import contextlib
+import io
+import math
+import multiprocessing
+import os
+import traceback
+
+from src.ast import ast_
+from src.ast.walk import collect_nodes
+from src.budget.budget import Budget, BudgetExceeded, run_within_budget
+from src.cache.cache import FUNCTION, decode, encode
+from src.evaluator import evaluator
+from src.evaluator.closure_compiler import compile_node
+from src.evaluator.evaluator import FALSE, NULL, TRUE, builtins, call_function_value, map_builtin, new_error
+from src.object.environment import Environment
+from src.object.object import BUILTIN_OBJ, FUNCTION_OBJ, Array, Boolean, Builtin, Closure, Error, Function, Hash, \
+    HashPair, Integer, Memoized, Null, String, new_integer
+from src.resolver.resolver import Resolver, collect_let_names
+
+# Chunks per worker when pmap is not given a chunk size, so that a slow
+# chunk leaves the other workers something to do.
+CHUNKS_PER_WORKER = 4
+
+# The pool, started by the first pmap.
+pool = None
+workers = os.cpu_count() or 1
+# Set in the workers, where pmap is map rather than start pools of their own.
+in_worker = False
+
+
+class Unsendable(Exception):
+    pass
+
+
+def pmap(args):
+    if not 2 <= len(args) <= 3:
+        return new_error(f"wrong number of arguments. got={len(args)}, want=2 or 3")
+    fn, array = args[0], args[1]
+    if fn.type() not in (FUNCTION_OBJ, BUILTIN_OBJ):
+        return new_error(f"first argument to `pmap` must be FUNCTION, got {fn.type()}")
+    if not isinstance(array, Array):
+        return new_error(f"second argument to `pmap` must be ARRAY, got {array.type()}")
+    if len(args) == 3:
+        if type(args[2]) is not Integer or type(args[2].value) is not int or args[2].value < 1:
+            return new_error(f"chunk size given to `pmap` must be a positive INTEGER, got {args[2].inspect()}")
+        chunk = args[2].value
+    else:
+        chunk = max(1, math.ceil(len(array.elements) / (workers * CHUNKS_PER_WORKER)))
+    if in_worker:
+        return map_builtin([fn, array])
+
+    try:
+        table = []
+        function = send(fn, table, {})
+        elements = [send(e, table, {}) for e in array.elements]
+    except Unsendable as e:
+        return new_error(f"pmap cannot send {e}, to another process")
+    if not elements:
+        return Array([])
+
+    global pool
+    # The workers spend what is left of the run's budget, and their calls
+    # are charged to it as each chunk comes back.
+    budget = evaluator.budget
+    limits = budget.remaining() if budget is not None else None
+    chunks = [elements[i:i + chunk] for i in range(0, len(elements), chunk)]
+    results = []
+    futures = []
+    try:
+        futures = [get_pool().submit(run_chunk, (table, function, c, limits)) for c in chunks]
+        for future in futures:
+            try:
+                values, output, error, calls = future.result(budget.seconds_left() if budget is not None else None)
+            except concurrent.futures.TimeoutError:
+                raise BudgetExceeded(budget.time_exceeded())
+            if output:
+                print(output, end="")
+            if budget is not None:
+                budget.charge(calls)
+                if error is not None:
+                    # A worker that ran out of time ran past the deadline of
+                    # the run, which reports it in its own words.
+                    budget.check()
+            if error is not None:
+                return new_error(error)
+            results.extend(values)
+    except concurrent.futures.process.BrokenProcessPool:
+        # The next pmap starts a new pool.
+        pool.shutdown(wait=False)
+        pool = None
+        return new_error("a `pmap` worker process died")
+    finally:
+        # Chunks still waiting are not run; a worker running one stops at
+        # its own copy of the deadline.
+        for future in futures:
+            future.cancel()
+    return Array([receive(value, None) for value in results])
+
+
+def get_pool():
+    global pool
+    if pool is None:
+        # A fork server rather than fork: pmap may run in a process with
+        # threads or open connections, such as the daemon.
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    return pool
+
+
+# Values are sent as plain Python values that pickle and that the other
+# process turns back into Monkey objects: integers, strings, booleans and
+# None stand for themselves, and the rest are tagged tuples. A function is
+# ("function", i), its entry in a table of (encoded literal, {name: value})
+# pairs.
+def send(value, table, sent):
+    """The plain form of value, adding the functions it holds to table.
+    sent maps the id of each function already in table to its index.
+    Without a table, as for results, a function cannot be sent."""
+    value_type = type(value)
+    if value_type is Integer or value_type is String:
+        return value.value
+    elif value_type is Boolean:
+        return value.value
+    elif value_type is Null:
+        return None
+    elif value_type is Array:
+        return ("array", [send(e, table, sent) for e in value.elements])
+    elif value_type is Hash:
+        return ("hash", [(send(p.key, table, sent), send(p.value, table, sent)) for p in value.pairs.values()])
+    elif value_type is Builtin:
+        for name, builtin in builtins.items():
+            if builtin is value:
+                return ("builtin", name)
+    elif value_type is Memoized:
+        # Each worker calls the function itself; its results are the same.
+        return send(value.fn, table, sent)
+    elif (value_type is Closure or isinstance(value, Function)) and table is not None:
+        index = sent.get(id(value))
+        if index is None:
+            index = sent[id(value)] = len(table)
+            table.append(None)
+            table[index] = send_function(value, table, sent)
+        return ("function", index)
+    raise Unsendable(f"a value of type {value.type()}")
+
+
+def send_function(fn, table, sent):
+    source = fn.fn if type(fn) is Closure else fn
+    parameters = [p.value for p in source.parameters]
+    literal = (FUNCTION, tuple(parameters), encode(source.body), None, None)
+    captured = {}
+    for name in free_names(parameters, source.body):
+        value = read_free_name(fn, name)
+        if value is None:
+            continue
+        try:
+            captured[name] = send(value, table, sent)
+        except Unsendable as e:
+            raise Unsendable(f"{name}, {e}")
+    return literal, captured
+
+
+def read_free_name(fn, name):
+    """The value name has where fn was made, or None for a builtin or an
+    unbound name."""
+    if type(fn) is not Closure:
+        return fn.env.get(name)
+    from src.vm import vm
+
+    compiled = fn.fn
+    running = vm.running
+    if name in compiled.free_names:
+        value = running.read_outer(fn.free[compiled.free_names.index(name)])
+        return None if type(value) is Error else value
+    if running is not None and name in running.global_names:
+        return running.globals[running.global_names.index(name)]
+    return None
+
+
+def free_names(parameters, body):
+    """The names body reads that are neither parameters nor its own lets, in
+    it or in the functions it defines."""
+    names = {}
+    collect_free_names(body, set(parameters) | set(collect_let_names(body.statements)), names)
+    return list(names)
+
+
+def collect_free_names(body, bound, names):
+    nodes = []
+    collect_nodes(body, nodes, into_functions=False)
+    for node in nodes:
+        if type(node) is ast_.Identifier and node.value not in bound:
+            names[node.value] = None
+        elif type(node) is ast_.FunctionLiteral:
+            inner = bound | {p.value for p in node.parameters} | set(collect_let_names(node.body.statements))
+            collect_free_names(node.body, inner, names)
+
+
+def receive(value, functions):
+    """The Monkey object for a value sent by send(), with functions the
+    rebuilt functions of its table."""
+    value_type = type(value)
+    if value_type is bool:
+        return TRUE if value else FALSE
+    elif value_type is int or value_type is float:
+        return new_integer(value)
+    elif value_type is str:
+        return String(value)
+    elif value is None:
+        return NULL
+    tag, content = value
+    if tag == "array":
+        return Array([receive(e, functions) for e in content])
+    elif tag == "hash":
+        pairs = {}
+        for key, item in content:
+            key = receive(key, functions)
+            pairs[key.hash_key()] = HashPair(key, receive(item, functions))
+        return Hash(pairs)
+    elif tag == "builtin":
+        return builtins[content]
+    return functions[content]
+
+
+def rebuild(table):
+    """The functions of a table, compiled by the closure compiler, each
+    reading its captured values from an Environment of its own."""
+    environments = []
+    functions = []
+    for literal, captured in table:
+        literal = decode(literal)
+        resolver = Resolver()
+        resolver.global_names.update(captured)
+        resolver.resolve(literal)
+        environment = Environment()
+        environments.append(environment)
+        functions.append(compile_node(literal)(environment))
+    for (_, captured), environment in zip(table, environments):
+        for name, value in captured.items():
+            environment.set(name, receive(value, functions))
+    return functions
+
+
+def run_chunk(task):
+    """Runs a function on a chunk of elements, in a worker, within the limits
+    of the run that called pmap, if any. Returns the plain results, what it
+    printed, the message of the first error, if any, and the calls made."""
+    global in_worker
+    in_worker = True
+    table, function, elements, limits = task
+    budget = Budget(*limits) if limits is not None else None
+    output = io.StringIO()
+    results = []
+    with contextlib.redirect_stdout(output):
+        error = run_within_budget(budget, run_elements, table, function, elements, results)
+    if type(error) is Error:
+        error = error.message
+    return results, output.getvalue(), error, budget.used() if budget is not None else 0
+
+
+def run_elements(table, function, elements, results):
+    """Adds the plain result for each element to results, and returns the
+    message of the first error, if any."""
+    try:
+        functions = rebuild(table)
+        fn = receive(function, functions)
+        for element in elements:
+            result = call_function_value(fn, [receive(element, functions)])
+            if result is not None and result.type() == "ERROR":
+                return result.message
+            results.append(send(result, None, None))
+    except Unsendable as e:
+        return f"pmap cannot send back {e}"
+    except Exception as e:
+        budget = evaluator.budget
+        if type(e) is BudgetExceeded or (type(e) is MemoryError and budget is not None and budget.max_bytes is not None):
+            # run_within_budget turns these into the budget's Error.
+            raise
+        return "".join(traceback.format_exception_only(type(e), e)).strip()
+    return None
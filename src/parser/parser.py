@@ -1,3 +1,5 @@
+import sys
+
 from src.lexer import token_
 from src.ast.ast_ import *
 
@@ -95,12 +97,17 @@ class Parser:
 
     def parse_program(self):
         program = Program()
+        program.statements.extend(self.parse_statements())
+        return program
+
+    def parse_statements(self):
+        """Yields the top-level statements one at a time, each as soon as it
+        has been parsed."""
         while self.cur_token.token_type != token_.TokenType.EOF:
             stmt = self.parse_statement()
             if stmt is not None:
-                program.statements.append(stmt)
+                yield stmt
             self.next_token()
-        return program
 
     def parse_identifier(self):
         return Identifier(token=self.cur_token, value=self.cur_token.literal)
@@ -115,7 +122,12 @@ class Parser:
             return None
 
     def parse_string_literal(self):
-        return StringLiteral(token=self.cur_token, value=self.cur_token.literal)
+        value = self.cur_token.literal
+        # Identifier-like strings are mostly hash keys. Interning them lets
+        # equal keys share one str, which compares by identity.
+        if value.isidentifier():
+            value = sys.intern(value)
+        return StringLiteral(token=self.cur_token, value=value)
 
     def parse_prefix_expression(self):
         token = self.cur_token
@@ -0,0 +1,148 @@
+import contextlib
+import gc
+import tracemalloc
+
+from src.object.environment import Environment, Frame
+from src.object.object import Array, Cell, Closure, Error, Function, Hash, HashPair, Integer, ReturnValue, String
+
+# The object types counted. Subclasses count as the type they derive from:
+# a ClosureFunction is a Function.
+TRACKED_TYPES = (Integer, String, Array, Hash, HashPair, Function, Closure, Cell, Environment, Frame, ReturnValue,
+                 Error)
+
+
+class TypeCounts:
+    __slots__ = ("allocated", "freed", "existing", "peak")
+
+    def __init__(self, existing):
+        self.allocated = 0
+        self.freed = 0
+        # Instances that already existed when counting started.
+        self.existing = existing
+        self.peak = existing
+
+    def live(self):
+        return self.existing + self.allocated - self.freed
+
+
+class AllocationCounter:
+    """Counts, for each of TRACKED_TYPES, the instances allocated and freed
+    while counting, how many are alive and the most that were alive at
+    once, and the peak bytes Python had allocated, from tracemalloc. Other
+    types can be counted instead by passing them as types.
+
+    start() wraps the __init__ of each type and gives it a __del__; stop()
+    takes them away again, so the types cost nothing extra when not counted.
+    Instances that existed before start() are found with the gc module.
+    tracemalloc slows the interpreter several times over, far more than the
+    counts do; without trace_memory the byte counts are None."""
+
+    def __init__(self, trace_memory=True, types=TRACKED_TYPES):
+        self.trace_memory = trace_memory
+        self.types = types
+        self.counts = {}
+        self.patched = []
+        self.started_tracemalloc = False
+        self.start_bytes = 0
+        self.peak_bytes = None
+        self.current_bytes = None
+
+    def start(self):
+        gc.collect()
+        existing = dict.fromkeys(self.types, 0)
+        kinds = {}
+        for obj in gc.get_objects():
+            cls = type(obj)
+            kind = kinds.get(cls, False)
+            if kind is False:
+                kind = kinds[cls] = tracked_type(cls, self.types)
+            if kind is not None:
+                existing[kind] += 1
+        self.counts = {kind: TypeCounts(existing[kind]) for kind in self.types}
+        for kind in self.types:
+            self.patch(kind, self.counts[kind])
+
+        if self.trace_memory:
+            self.started_tracemalloc = not tracemalloc.is_tracing()
+            if self.started_tracemalloc:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            self.start_bytes = tracemalloc.get_traced_memory()[0]
+
+    def stop(self):
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            self.current_bytes = current - self.start_bytes
+            self.peak_bytes = peak - self.start_bytes
+            if self.started_tracemalloc:
+                tracemalloc.stop()
+        for kind, init in self.patched:
+            kind.__init__ = init
+            del kind.__del__
+        self.patched = []
+
+    def patch(self, kind, counts):
+        init = kind.__dict__["__init__"]
+
+        def counted_init(obj, *args, **kwargs):
+            init(obj, *args, **kwargs)
+            counts.allocated += 1
+            live = counts.existing + counts.allocated - counts.freed
+            if live > counts.peak:
+                counts.peak = live
+
+        def counted_del(obj):
+            counts.freed += 1
+
+        kind.__init__ = counted_init
+        kind.__del__ = counted_del
+        self.patched.append((kind, init))
+
+    def allocated(self):
+        """The instances of all the types allocated while counting."""
+        return sum(counts.allocated for counts in self.counts.values())
+
+    def report(self):
+        """The counts of each type, most allocated first, and the bytes
+        allocated above what was allocated at start(): at the peak and when
+        counting stopped."""
+        types = []
+        for kind, counts in sorted(self.counts.items(), key=lambda item: (-item[1].allocated, item[0].__name__)):
+            types.append({
+                "type": kind.__name__,
+                "allocated": counts.allocated,
+                "freed": counts.freed,
+                "live": counts.live(),
+                "peak_live": counts.peak,
+            })
+        return {"types": types, "peak_bytes": self.peak_bytes, "retained_bytes": self.current_bytes}
+
+    def write_report(self, out_stream):
+        report = self.report()
+        out_stream.write(f"{'allocated':>12} {'freed':>12} {'live':>10} {'peak live':>10}  type\n")
+        for counts in report["types"]:
+            out_stream.write(f"{counts['allocated']:>12} {counts['freed']:>12} {counts['live']:>10} "
+                             f"{counts['peak_live']:>10}  {counts['type']}\n")
+        if report["peak_bytes"] is not None:
+            out_stream.write(f"peak bytes: {report['peak_bytes']}, retained bytes: {report['retained_bytes']}\n")
+
+
+def tracked_type(cls, types=TRACKED_TYPES):
+    for kind in cls.__mro__:
+        if kind in types:
+            return kind
+    return None
+
+
+@contextlib.contextmanager
+def counting_allocations(counter):
+    """Counts allocations with counter for the duration of the block,
+    unless it is None."""
+    if counter is None:
+        yield None
+        return
+    counter.start()
+    try:
+        yield counter
+    finally:
+        counter.stop()
@@ -0,0 +1,171 @@
+import contextlib
+import json
+import time
+
+from src.ast import ast_
+from src.ast.walk import collect_nodes
+from src.evaluator import closure_compiler, evaluator, stack_evaluator
+from src.object.object import Builtin, Closure, Function
+from src.vm import vm
+
+ANONYMOUS = "fn"
+
+
+class FunctionProfile:
+    __slots__ = ("name", "line", "column", "builtin", "calls", "inclusive", "exclusive", "active")
+
+    def __init__(self, name, line, column, builtin):
+        self.name = name
+        self.line = line
+        self.column = column
+        self.builtin = builtin
+        self.calls = 0
+        self.inclusive = 0.0
+        self.exclusive = 0.0
+        # Calls to the function that have started and not yet returned.
+        self.active = 0
+
+    def location(self):
+        if self.builtin:
+            return "builtin"
+        return f"{self.line}:{self.column}" if self.line is not None else "unknown"
+
+    def as_dict(self):
+        return {
+            "function": self.name,
+            "line": self.line,
+            "column": self.column,
+            "builtin": self.builtin,
+            "calls": self.calls,
+            "inclusive_seconds": self.inclusive,
+            "exclusive_seconds": self.exclusive,
+        }
+
+
+class Profiler:
+    """Counts the calls to each Monkey function and builtin, and the time
+    spent in them: inclusive of the calls they make, and exclusive of them.
+
+    A function is known by the body of its literal, and reported by the
+    name of the let that binds it (ANONYMOUS when there is none) and the
+    line and column of its `fn`. label() must see each statement before it
+    runs. While a call is running inside another call to the same function,
+    its time is only counted once in the inclusive time.
+
+    The engines report calls through enter() and exit(), or call(), once
+    profiling() has set the profiler on them."""
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.names = {builtin: (name, None, None) for name, builtin in evaluator.builtins.items()}
+        self.profiles = {}
+        # An entry per running call: its FunctionProfile, its start time and
+        # the time spent in the calls it made.
+        self.stack = []
+
+    def label(self, node):
+        label_functions(node, self.names)
+
+    def enter(self, fn):
+        if type(fn) is Closure:
+            key = fn.fn.body
+        elif type(fn) is Builtin:
+            key = fn
+        else:
+            key = fn.body
+        profile = self.profiles.get(key)
+        if profile is None:
+            name, line, column = self.names.get(key, (ANONYMOUS, None, None))
+            profile = self.profiles[key] = FunctionProfile(name, line, column, type(fn) is Builtin)
+        profile.calls += 1
+        profile.active += 1
+        self.stack.append([profile, self.clock(), 0.0])
+
+    def exit(self):
+        profile, start, children = self.stack.pop()
+        elapsed = self.clock() - start
+        profile.exclusive += elapsed - children
+        profile.active -= 1
+        if not profile.active:
+            profile.inclusive += elapsed
+        if self.stack:
+            self.stack[-1][2] += elapsed
+
+    def returned(self, fn, value):
+        """Ends the call to fn that returned value, for the VM."""
+        self.exit()
+
+    def call(self, fn, args, call):
+        """Returns call(fn, args), counted as a call to fn. Anything but a
+        function or builtin, such as a memoized function whose inner
+        function is counted instead, is called as it is."""
+        if not isinstance(fn, (Function, Closure, Builtin)):
+            return call(fn, args)
+        self.enter(fn)
+        try:
+            return call(fn, args)
+        finally:
+            self.exit()
+
+    def unwind(self):
+        """Ends every call still running, as after an Error, which returns
+        from every engine without finishing the calls in between."""
+        while self.stack:
+            self.exit()
+
+    def report(self):
+        """The profile of each function called, by exclusive time, most
+        first."""
+        self.unwind()
+        profiles = sorted(self.profiles.values(), key=lambda p: (-p.exclusive, -p.calls, p.name))
+        return [p.as_dict() for p in profiles]
+
+    def write_report(self, out_stream):
+        self.unwind()
+        profiles = sorted(self.profiles.values(), key=lambda p: (-p.exclusive, -p.calls, p.name))
+        out_stream.write(f"{'calls':>10} {'inclusive':>12} {'exclusive':>12}  function\n")
+        for p in profiles:
+            out_stream.write(f"{p.calls:>10} {p.inclusive:>12.6f} {p.exclusive:>12.6f}  {p.name} ({p.location()})\n")
+
+    def write_json(self, filename):
+        with open(filename, "w") as file:
+            json.dump(self.report(), file, indent=2)
+            file.write("\n")
+
+
+def label_functions(node, names):
+    """Maps the body of every function literal in node to its name, line and
+    column in names."""
+    nodes = []
+    collect_nodes(node, nodes)
+    for inner in nodes:
+        if type(inner) is ast_.LetStatement:
+            literal = bound_literal(inner.value)
+            if literal is not None:
+                names[literal.body] = (inner.name.value, literal.token.line, literal.token.column)
+        elif type(inner) is ast_.FunctionLiteral and inner.body not in names:
+            names[inner.body] = (ANONYMOUS, inner.token.line, inner.token.column)
+
+
+def bound_literal(value):
+    """The function literal a let binds, directly or through memo()."""
+    if type(value) is ast_.FunctionLiteral:
+        return value
+    if type(value) is ast_.CallExpression and type(value.function) is ast_.Identifier \
+            and value.function.value == "memo" and value.arguments \
+            and type(value.arguments[0]) is ast_.FunctionLiteral:
+        return value.arguments[0]
+    return None
+
+
+@contextlib.contextmanager
+def profiling(profiler):
+    """Sets profiler on every engine for the duration of the block."""
+    engines = (evaluator, stack_evaluator, closure_compiler, vm)
+    for engine in engines:
+        engine.set_profiler(profiler)
+    try:
+        yield profiler
+    finally:
+        for engine in engines:
+            engine.set_profiler(None)
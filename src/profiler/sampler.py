@@ -0,0 +1,154 @@
+import collections
+import contextlib
+import signal
+import sys
+import threading
+
+from src.evaluator import closure_compiler, evaluator, stack_evaluator
+from src.object.object import Closure, Function
+from src.profiler.profiler import ANONYMOUS, label_functions
+from src.vm.vm import VM
+
+# Seconds between samples.
+DEFAULT_INTERVAL = 0.005
+
+
+def apply_function_calls(frame):
+    fn = frame.f_locals.get("fn")
+    return (fn,) if isinstance(fn, Function) else ()
+
+
+def call_closure_calls(frame):
+    # slots is bound only once the Frame is about to be made, right before
+    # the ClosureFunction runs.
+    local_names = frame.f_locals
+    return (local_names["function"],) if "slots" in local_names else ()
+
+
+def vm_calls(frame):
+    local_names = frame.f_locals
+    closures = [f[0] for f in local_names.get("frames", ()) if f[0] is not None]
+    if local_names.get("cl") is not None:
+        closures.append(local_names["cl"])
+    return closures
+
+
+def stack_evaluator_calls(frame):
+    stack = frame.f_locals.get("stack", ())
+    return [k[2] for k in stack if k[0] == stack_evaluator.UNWRAP and len(k) > 2]
+
+
+# Maps the id of the code of each engine function that runs Monkey calls to
+# a function returning the Monkey functions a frame of it is running,
+# outermost first. Hashing a code object costs far more than hashing its id.
+ENGINE_FRAMES = {
+    id(evaluator.plain_apply_function.__code__): apply_function_calls,
+    id(closure_compiler.call_closure.__code__): call_closure_calls,
+    id(VM.run.__code__): vm_calls,
+    id(stack_evaluator.evaluate.__code__): stack_evaluator_calls,
+}
+
+
+class Sampler:
+    """Records the Monkey call stack every interval seconds of CPU time and
+    counts how often each stack was seen, for flame graphs.
+
+    On the main thread a SIGPROF timer interrupts the program to take each
+    sample; elsewhere, or where there is no such timer, a background thread
+    samples the thread that called start(). The call stack is read from the
+    Python frames of the engine running: apply_function calls for the
+    evaluator, call_closure calls for the closure compiler, the frame list of
+    each VM.run and the UNWRAP continuations of the stack evaluator. A
+    builtin is seen as the Python function implementing it. Like the
+    Profiler, a Sampler names functions after the lets label() has seen."""
+
+    def __init__(self, interval=DEFAULT_INTERVAL, root="monkey"):
+        if interval <= 0:
+            raise ValueError(f"sampling interval must be positive, got {interval}")
+        self.interval = interval
+        self.root = root
+        self.names = {}
+        # The frames sample() looks at: builtins, by name, and ENGINE_FRAMES.
+        self.frame_kinds = {id(b.fn.__code__): name for name, b in evaluator.builtins.items()}
+        self.frame_kinds.update(ENGINE_FRAMES)
+        self.stacks = collections.Counter()
+        self.thread_id = None
+        self.thread = None
+        self.stopped = threading.Event()
+        self.previous_handler = None
+
+    def label(self, node):
+        label_functions(node, self.names)
+
+    def start(self):
+        self.thread_id = threading.get_ident()
+        if hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread():
+            self.previous_handler = signal.signal(signal.SIGPROF, self.handle_signal)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        else:
+            self.stopped.clear()
+            self.thread = threading.Thread(target=self.sample_thread, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            self.stopped.set()
+            self.thread.join()
+            self.thread = None
+        elif self.previous_handler is not None:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, self.previous_handler)
+            self.previous_handler = None
+
+    def handle_signal(self, signum, frame):
+        self.sample(frame)
+
+    def sample_thread(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            self.sample(frame)
+
+    def sample(self, frame):
+        """Counts the Monkey call stack that frame, the innermost Python
+        frame of the sampled thread, is running."""
+        frame_kinds = self.frame_kinds
+        frames = []
+        while frame is not None:
+            kind = frame_kinds.get(id(frame.f_code))
+            if kind is not None:
+                frames.append((frame, kind))
+            frame = frame.f_back
+        stack = [self.root]
+        for frame, kind in reversed(frames):
+            if type(kind) is str:
+                stack.append(kind)
+            else:
+                stack.extend(self.frame_name(fn) for fn in kind(frame))
+        self.stacks[";".join(stack)] += 1
+
+    def frame_name(self, fn):
+        body = fn.fn.body if type(fn) is Closure else fn.body
+        name, line, column = self.names.get(body, (ANONYMOUS, None, None))
+        return f"{name} ({line}:{column})" if line is not None else name
+
+    def write_collapsed(self, out_stream):
+        """Writes the stacks seen in the collapsed format of flamegraph.pl:
+        one line per stack, its frames outermost first separated by `;`,
+        then a space and how many samples saw it."""
+        for stack, count in sorted(self.stacks.items()):
+            out_stream.write(f"{stack} {count}\n")
+
+
+@contextlib.contextmanager
+def sampling(sampler):
+    """Runs sampler for the duration of the block, unless it is None."""
+    if sampler is None:
+        yield None
+        return
+    sampler.start()
+    try:
+        yield sampler
+    finally:
+        sampler.stop()
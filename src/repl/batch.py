@@ -0,0 +1,83 @@
+import concurrent.futures
+import contextlib
+import functools
+import glob
+import io
+import sys
+import time
+import traceback
+
+from src.object.object import Error
+from src.repl.repl import start_with_file
+
+# Exit statuses of a file run.
+OK = 0
+MONKEY_ERROR = 1
+CRASHED = 2
+
+
+class FileResult:
+    __slots__ = ("filename", "status", "seconds", "output", "errors")
+
+    def __init__(self, filename, status, seconds, output, errors):
+        self.filename = filename
+        self.status = status
+        self.seconds = seconds
+        self.output = output
+        self.errors = errors
+
+
+def expand_paths(patterns):
+    """The files named by patterns, in order, with each glob pattern replaced
+    by the files matching it, sorted. A pattern matching nothing is kept, so
+    running it reports the missing file."""
+    filenames = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else []
+        filenames.extend(matches or [pattern])
+    return filenames
+
+
+def run_file(filename, options):
+    """Runs one script as start_with_file does with options, capturing what
+    it writes. The status is MONKEY_ERROR when the script evaluates to an
+    Error and CRASHED when the interpreter raises."""
+    output = io.StringIO()
+    errors = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(errors):
+        try:
+            result = start_with_file(filename, **options)
+            status = MONKEY_ERROR if isinstance(result, Error) else OK
+        except Exception as e:
+            # Only the exception itself: a RecursionError's traceback is
+            # thousands of lines long.
+            errors.write("".join(traceback.format_exception_only(type(e), e)))
+            status = CRASHED
+    return FileResult(filename, status, time.perf_counter() - start, output.getvalue(), errors.getvalue())
+
+
+def run_files(filenames, jobs=None, **options):
+    """Yields the FileResult of each file, in order. With more than one job
+    the files run on a pool of jobs processes (default: one per CPU), each
+    file with its own bindings."""
+    run = functools.partial(run_file, options=options)
+    if jobs == 1 or len(filenames) < 2:
+        yield from map(run, filenames)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(run, filenames)
+
+
+def write_results(results, out_stream=sys.stdout, err_stream=sys.stderr):
+    """Writes each file's output and errors as they come, then its status
+    and time, and returns the highest status."""
+    worst = OK
+    for result in results:
+        out_stream.write(f"{result.filename} output:\n{result.output}")
+        out_stream.flush()
+        err_stream.write(result.errors)
+        err_stream.write(f"{result.filename}: exit {result.status} in {result.seconds * 1000:.1f} ms\n")
+        err_stream.flush()
+        worst = max(worst, result.status)
+    return worst
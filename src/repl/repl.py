@@ -1,51 +1,303 @@
+import os
 import sys
 
 from src.evaluator import evaluator
+from src.evaluator.evaluator import builtins
 
 PROMPT = ">> "
 
+ENGINES = ("eval", "vm", "closure", "stack")
 
-def start(in_stream=sys.stdin, out_stream=sys.stdout):
+
+def new_runner(engine="eval", bindings=None):
+    """Returns a function that runs one parsed Program on the chosen engine.
+    The runner keeps its bindings between calls, so REPL lines can build on
+    each other. bindings maps names to objects bound before the first
+    Program runs."""
+    return new_engine(engine, bindings)[0]
+
+
+def new_statement_runner(engine="eval", bindings=None, global_names=None):
+    """Like new_runner, but the function runs a single top-level statement
+    and keeps a top-level return as a ReturnValue, so the caller can tell
+    that the program has ended. global_names holds every name a top-level
+    let of the later statements may bind; when it is None, any builtin's
+    name may be bound again."""
+    return new_engine(engine, bindings, builtins if global_names is None else global_names)[1]
+
+
+def new_engine(engine, bindings=None, global_names=()):
+    """Sets up engine with bindings bound, and returns a function that runs
+    a Program and one that runs a single statement, both sharing them. The
+    closure engine resolves each name before the lets after it have run,
+    and global_names tells it which builtins a later let may replace."""
+    setup = engine_setups.get(engine)
+    if setup is None:
+        raise ValueError(f"unknown engine: {engine}")
+    return setup(bindings or {}, global_names)
+
+
+def setup_eval(bindings, global_names):
+    env = new_environment(bindings)
+
+    def run(node):
+        return evaluator.evaluate(node, env)
+
+    return run, run
+
+
+def setup_vm(bindings, global_names):
+    from src.compiler.compiler import new_compiler, new_compiler_with_state
+    from src.object.object import ReturnValue
+    from src.vm.vm import new_globals_store, new_vm_with_globals_store
+
+    state = new_compiler()
+    symbols = [(state.symbol_table.define(name), value) for name, value in bindings.items()]
+    globals_store = new_globals_store(len(state.symbol_table.global_names))
+    for symbol, value in symbols:
+        globals_store[symbol.index] = value
+
+    def new_vm(program):
+        compiler = new_compiler_with_state(state.symbol_table, state.constants)
+        compiler.compile(program)
+        return new_vm_with_globals_store(compiler.bytecode(), globals_store)
+
+    def run_statement(statement):
+        vm = new_vm(as_program(statement))
+        result = vm.run()
+        return ReturnValue(result) if vm.returned else result
+
+    return lambda program: new_vm(program).run(), run_statement
+
+
+def setup_closure(bindings, global_names):
+    from src.evaluator.closure_compiler import compile_node, run as run_compiled
+    from src.resolver.resolver import Resolver
+
+    env = new_environment(bindings)
+    resolver = Resolver()
+    resolver.global_names.update(bindings)
+    resolver.global_names.update(global_names)
+
+    def run_statement(statement):
+        resolver.resolve(as_program(statement))
+        return compile_node(statement)(env)
+
+    return lambda program: run_compiled(program, env, resolver), run_statement
+
+
+def setup_stack(bindings, global_names):
+    from src.evaluator.stack_evaluator import evaluate as evaluate_on_stack
+
+    env = new_environment(bindings)
+
+    def run(node):
+        return evaluate_on_stack(node, env)
+
+    return run, run
+
+
+engine_setups = {
+    "eval": setup_eval,
+    "vm": setup_vm,
+    "closure": setup_closure,
+    "stack": setup_stack,
+}
+
+
+def new_environment(bindings):
     from src.object.environment import Environment
-    from src.lexer.lexer import Lexer
-    from src.parser.parser import Parser
-    from src.evaluator.evaluator import evaluate
 
     env = Environment()
+    for name, value in bindings.items():
+        env.set(name, value)
+    return env
 
-    while True:
-        out_stream.write(PROMPT)
-        out_stream.flush()
-        line = in_stream.readline()
-        if not line:
-            break  # EOF or Ctrl-D
 
-        lexer = Lexer(line)
-        parser = Parser(lexer)
+def as_program(statement):
+    from src.ast.ast_ import Program
 
-        program = parser.parse_program()
-        if parser.errors:
-            print_parser_errors(out_stream, parser.errors)
-            continue
+    program = Program()
+    program.statements.append(statement)
+    return program
 
-        evaluated = evaluate(program, env)
-        if evaluated is not None:
-            out_stream.write(evaluated.inspect() + '\n')
 
+def run_statements(statements, engine="eval", global_names=None):
+    """Runs statements one by one as they arrive and returns what running
+    them as one Program would. A statement is not kept once it has run.
+    global_names is as for new_statement_runner."""
+    from src.object.object import Error, ReturnValue
 
-def start_with_file(filename: str):
-    from src.object.environment import Environment
-    from src.lexer.lexer import Lexer
+    run = new_statement_runner(engine, global_names=global_names)
+    result = None
+    for statement in statements:
+        result = run(statement)
+        if isinstance(result, ReturnValue):
+            return result.value
+        elif isinstance(result, Error):
+            return result
+    return result
+
+
+def optimized(statements, inliner):
+    """Yields statements with small functions inlined, unless inliner is
+    None, and constants folded, one at a time."""
+    from src.optimizer.optimizer import optimize
+
+    for statement in statements:
+        yield optimize(inliner.inline(statement) if inliner is not None else statement)
+
+
+def memoized(statements, memoizer):
+    """Yields statements with pure recursive functions memoized, one at a
+    time."""
+    for statement in statements:
+        yield memoizer.memoize(statement)
+
+
+def profiled(statements, profiler):
+    """Yields statements once profiler, a Profiler or a Sampler, knows the
+    functions they define."""
+    for statement in statements:
+        profiler.label(statement)
+        yield statement
+
+
+def start(in_stream=sys.stdin, out_stream=sys.stdout, engine="eval", optimize=True, profile=False):
+    from src.lexer.lexer import FastLexer
+    from src.optimizer.inliner import Inliner
+    from src.optimizer.optimizer import optimize as optimize_program
     from src.parser.parser import Parser
+    from src.profiler.profiler import Profiler, profiling
 
-    with open(filename, 'r') as file:
-        input_ = file.read()
+    run = new_runner(engine)
+    # A later line may bind any top-level name again, so only functions
+    # defined inside function bodies are inlined. An inlined call would be
+    # missing from the profile, so none are while profiling.
+    inliner = Inliner() if not profile else None
+    profiler = Profiler() if profile else None
 
-    lexer = Lexer(input_)
-    parser = Parser(lexer)
-    program = parser.parse_program()
-    env = Environment()
-    print(evaluator.evaluate(program, env).value)
+    with profiling(profiler):
+        while True:
+            out_stream.write(PROMPT)
+            out_stream.flush()
+            line = in_stream.readline()
+            if not line:
+                break  # EOF or Ctrl-D
+
+            lexer = FastLexer(line)
+            parser = Parser(lexer)
+
+            program = parser.parse_program()
+            if parser.errors:
+                print_parser_errors(out_stream, parser.errors)
+                continue
+
+            if optimize:
+                program = optimize_program(inliner.inline(program) if inliner is not None else program)
+            if profiler is not None:
+                profiler.label(program)
+            evaluated = run(program)
+            if profiler is not None:
+                profiler.unwind()
+            if evaluated is not None:
+                out_stream.write(evaluated.inspect() + '\n')
+    if profiler is not None:
+        profiler.write_report(out_stream)
+
+
+def start_with_file(filename: str, engine="eval", cache=True, optimize=True, inline_stats=False, memoize=False,
+                    memo_size=None, memo_stats=False, profile=False, profile_json=None, sample=None,
+                    sample_interval=None, alloc_stats=False, max_calls=None, timeout=None, max_memory=None):
+    from src.budget.budget import new_budget, run_within_budget
+    from src.lexer.lexer import FastLexer, read_chunks
+    from src.object import object as object_
+    from src.optimizer.inliner import Inliner, names_bound_once, scan_let_counts
+    from src.optimizer.memoizer import Memoizer
+    from src.parser.parser import Parser
+    from src.profiler.allocations import AllocationCounter, counting_allocations
+    from src.profiler.profiler import Profiler, profiling
+    from src.profiler.sampler import DEFAULT_INTERVAL, Sampler, sampling
+
+    let_counts = scan_let_counts(filename) if optimize or memoize or engine == "closure" else None
+    # The names a let may bind, so that a builtin used above a top-level let
+    # of its name is not bound early; every builtin's name for a script that
+    # could not be scanned.
+    global_names = let_counts if let_counts is not None else builtins
+    inliner = None
+    # An inlined call would be missing from a profile or sample and would
+    # not count towards --max-calls, so calls are not inlined then.
+    if optimize and not (profile or profile_json or sample or max_calls is not None):
+        inliner = Inliner(names_bound_once(let_counts) if let_counts is not None else ())
+    memoizer = Memoizer(let_counts, memo_size or object_.DEFAULT_MEMO_SIZE) if memoize else None
+    if memo_stats:
+        object_.memo_registry = []
+    profiler = Profiler() if profile or profile_json else None
+    sampler = Sampler(sample_interval or DEFAULT_INTERVAL, os.path.basename(filename)) if sample else None
+    allocations = AllocationCounter() if alloc_stats else None
+    budget = new_budget(max_calls, timeout, max_memory)
+
+    def transformed(statements):
+        if optimize:
+            statements = optimized(statements, inliner)
+        if memoize:
+            statements = memoized(statements, memoizer)
+        if profiler is not None:
+            statements = profiled(statements, profiler)
+        if sampler is not None:
+            statements = profiled(statements, sampler)
+        return statements
+
+    # The source is lexed as it is read and each statement runs as soon as
+    # it is parsed, so neither the text nor the whole AST is held at once.
+    # The cache holds statements as parsed; they are optimized after loading.
+    if cache:
+        from src.cache.cache import cached_statements
+
+        statements = cached_statements(filename)
+        with profiling(profiler), sampling(sampler), counting_allocations(allocations):
+            result = run_within_budget(budget, run_statements, transformed(statements), engine, global_names)
+        statements.close()
+    else:
+        with open(filename, 'r') as file, profiling(profiler), sampling(sampler), \
+                counting_allocations(allocations):
+            statements = Parser(FastLexer(read_chunks(file))).parse_statements()
+            result = run_within_budget(budget, run_statements, transformed(statements), engine, global_names)
+    if inline_stats and inliner is not None:
+        print_inline_stats(sys.stderr, inliner.inlined)
+    if memo_stats:
+        print_memo_stats(sys.stderr, object_.memo_registry)
+        object_.memo_registry = None
+    if profile:
+        profiler.write_report(sys.stderr)
+    if profile_json:
+        profiler.write_json(profile_json)
+    if sample:
+        with open(sample, "w") as file:
+            sampler.write_collapsed(file)
+    if alloc_stats:
+        allocations.write_report(sys.stderr)
+    if hasattr(result, "value"):
+        print(result.value)
+    elif result is not None:
+        # Results without a value, such as the Null returned by puts, an
+        # Array or an Error, are printed as the REPL shows them.
+        print(result.inspect())
+    return result
+
+
+def print_inline_stats(out_stream, inlined):
+    out_stream.write(f"inlined calls: {sum(inlined.values())}\n")
+    for name, count in inlined.most_common():
+        out_stream.write(f"\t{name}: {count}\n")
+
+
+def print_memo_stats(out_stream, functions):
+    out_stream.write(f"memoized functions: {len(functions)}\n")
+    for function in sorted(functions, key=lambda m: m.name or ""):
+        out_stream.write(f"\t{function.name or 'anonymous'}: {function.hits} hits, {function.misses} misses, "
+                         f"{function.evictions} evictions, {function.uncached} uncached, "
+                         f"{len(function.cache)} entries\n")
 
 
 def print_parser_errors(out_stream, errors):
@@ -0,0 +1,177 @@
+from src.ast import ast_
+from src.evaluator.evaluator import builtins
+
+LOCAL = "LOCAL"
+GLOBAL = "GLOBAL"
+BUILTIN = "BUILTIN"
+
+
+class Resolution:
+    """Where an Identifier lives.
+
+    LOCAL names are found `depth` frames up the chain at index `slot`. Since
+    Monkey binds names at run time, a local slot may still be empty when it is
+    read (a `let` further down or in an untaken branch), so every LOCAL
+    resolution carries the resolution to try next, ending in GLOBAL or BUILTIN.
+    GLOBAL names are looked up in the top-level Environment and fall back to
+    the builtins; BUILTIN names are never bound globally and go straight to
+    the builtins table. For those two `depth` is the number of function
+    frames between the reference and the top level."""
+
+    def __init__(self, scope, depth=0, slot=0, outer=None):
+        self.scope = scope
+        self.depth = depth
+        self.slot = slot
+        self.outer = outer
+
+    def __repr__(self):
+        if self.scope == LOCAL:
+            return f"Resolution(LOCAL, depth={self.depth}, slot={self.slot}, outer={self.outer!r})"
+        return f"Resolution({self.scope})"
+
+
+class Scope:
+    def __init__(self, outer=None):
+        self.outer = outer
+        self.slots = {}
+
+    def declare(self, name):
+        if name not in self.slots:
+            self.slots[name] = len(self.slots)
+        return self.slots[name]
+
+
+class Resolver:
+    def __init__(self):
+        # Names bound by a top-level let, kept across REPL lines.
+        self.global_names = set()
+        self.scope = None
+
+    def resolve(self, node):
+        if isinstance(node, ast_.Program):
+            self.global_names.update(collect_let_names(node.statements))
+            for statement in node.statements:
+                self.resolve(statement)
+        elif isinstance(node, ast_.BlockStatement):
+            for statement in node.statements:
+                self.resolve(statement)
+        elif isinstance(node, ast_.ExpressionStatement):
+            self.resolve(node.expression)
+        elif isinstance(node, ast_.ReturnStatement):
+            self.resolve(node.return_value)
+        elif isinstance(node, ast_.LetStatement):
+            self.resolve(node.value)
+            if self.scope is None:
+                node.name.resolution = Resolution(GLOBAL, 0)
+            else:
+                node.name.resolution = Resolution(LOCAL, 0, self.scope.slots[node.name.value])
+        elif isinstance(node, ast_.Identifier):
+            node.resolution = self.lookup(node.value)
+        elif isinstance(node, ast_.FunctionLiteral):
+            self.resolve_function_literal(node)
+        elif isinstance(node, ast_.PrefixExpression):
+            self.resolve(node.right)
+        elif isinstance(node, ast_.InfixExpression):
+            self.resolve(node.left)
+            self.resolve(node.right)
+        elif isinstance(node, ast_.IfExpression):
+            self.resolve(node.condition)
+            self.resolve(node.consequence)
+            if node.alternative is not None:
+                self.resolve(node.alternative)
+        elif isinstance(node, ast_.CallExpression):
+            self.resolve(node.function)
+            for argument in node.arguments:
+                self.resolve(argument)
+        elif isinstance(node, ast_.ArrayLiteral):
+            for element in node.elements:
+                self.resolve(element)
+        elif isinstance(node, ast_.IndexExpression):
+            self.resolve(node.left)
+            self.resolve(node.index)
+        elif isinstance(node, ast_.HashLiteral):
+            for key, value in node.pairs.items():
+                self.resolve(key)
+                self.resolve(value)
+
+    def resolve_function_literal(self, node):
+        scope = Scope(self.scope)
+        node.parameter_slots = [scope.declare(p.value) for p in node.parameters]
+        for name in collect_let_names(node.body.statements):
+            scope.declare(name)
+        node.frame_names = tuple(scope.slots)
+
+        self.scope = scope
+        self.resolve(node.body)
+        self.scope = scope.outer
+
+    def lookup(self, name):
+        frames = []
+        depth = 0
+        scope = self.scope
+        while scope is not None:
+            slot = scope.slots.get(name)
+            if slot is not None:
+                frames.append((depth, slot))
+            scope = scope.outer
+            depth += 1
+
+        scope = GLOBAL if name in self.global_names or name not in builtins else BUILTIN
+        resolution = Resolution(scope, depth)
+        for depth, slot in reversed(frames):
+            resolution = Resolution(LOCAL, depth, slot, resolution)
+        return resolution
+
+
+def resolve(program, resolver=None):
+    if resolver is None:
+        resolver = Resolver()
+    resolver.resolve(program)
+    return program
+
+
+def collect_let_names(statements):
+    """Names bound by let statements in a function body or program, including
+    those nested in if blocks but not those inside inner function literals."""
+    names = []
+    for statement in statements:
+        collect_from_node(statement, names)
+    return names
+
+
+def collect_from_node(node, names):
+    if isinstance(node, ast_.LetStatement):
+        collect_from_node(node.value, names)
+        if node.name.value not in names:
+            names.append(node.name.value)
+    elif isinstance(node, ast_.BlockStatement):
+        for statement in node.statements:
+            collect_from_node(statement, names)
+    elif isinstance(node, ast_.ExpressionStatement):
+        collect_from_node(node.expression, names)
+    elif isinstance(node, ast_.ReturnStatement):
+        collect_from_node(node.return_value, names)
+    elif isinstance(node, ast_.IfExpression):
+        collect_from_node(node.condition, names)
+        collect_from_node(node.consequence, names)
+        if node.alternative is not None:
+            collect_from_node(node.alternative, names)
+    elif isinstance(node, ast_.PrefixExpression):
+        collect_from_node(node.right, names)
+    elif isinstance(node, ast_.InfixExpression):
+        collect_from_node(node.left, names)
+        collect_from_node(node.right, names)
+    elif isinstance(node, ast_.CallExpression):
+        collect_from_node(node.function, names)
+        for argument in node.arguments:
+            collect_from_node(argument, names)
+    elif isinstance(node, ast_.ArrayLiteral):
+        for element in node.elements:
+            collect_from_node(element, names)
+    elif isinstance(node, ast_.IndexExpression):
+        collect_from_node(node.left, names)
+        collect_from_node(node.index, names)
+    elif isinstance(node, ast_.HashLiteral):
+        for key, value in node.pairs.items():
+            collect_from_node(key, names)
+            collect_from_node(value, names)
@@ -0,0 +1,427 @@
+from src.code import code
+from src.compiler.compiler import Bytecode, builtin_names
+from src.compiler.symbol_table import FREE_SCOPE
+from src.evaluator.evaluator import (
+    FALSE,
+    NULL,
+    TRUE,
+    builtins,
+    eval_bang_operator_expression,
+    eval_index_expression,
+    eval_infix_expression,
+    eval_prefix_expression,
+    function_callers,
+    new_error,
+)
+from src.object.object import Array, Builtin, Cell, Closure, Error, Hash, Hashable, HashPair, Integer, Memoized, \
+    new_integer
+
+MAX_FRAMES = 100000
+
+OP_CONSTANT = code.OP_CONSTANT
+OP_POP = code.OP_POP
+OP_ADD = code.OP_ADD
+OP_SUB = code.OP_SUB
+OP_MUL = code.OP_MUL
+OP_DIV = code.OP_DIV
+OP_TRUE = code.OP_TRUE
+OP_FALSE = code.OP_FALSE
+OP_EQUAL = code.OP_EQUAL
+OP_NOT_EQUAL = code.OP_NOT_EQUAL
+OP_GREATER_THAN = code.OP_GREATER_THAN
+OP_LESS_THAN = code.OP_LESS_THAN
+OP_MINUS = code.OP_MINUS
+OP_BANG = code.OP_BANG
+OP_JUMP_NOT_TRUTHY = code.OP_JUMP_NOT_TRUTHY
+OP_JUMP = code.OP_JUMP
+OP_NULL = code.OP_NULL
+OP_NONE = code.OP_NONE
+OP_GET_GLOBAL = code.OP_GET_GLOBAL
+OP_SET_GLOBAL = code.OP_SET_GLOBAL
+OP_ARRAY = code.OP_ARRAY
+OP_HASH = code.OP_HASH
+OP_INDEX = code.OP_INDEX
+OP_CALL = code.OP_CALL
+OP_RETURN_VALUE = code.OP_RETURN_VALUE
+OP_GET_LOCAL = code.OP_GET_LOCAL
+OP_SET_LOCAL = code.OP_SET_LOCAL
+OP_GET_CELL = code.OP_GET_CELL
+OP_CLOSURE = code.OP_CLOSURE
+OP_GET_FREE = code.OP_GET_FREE
+OP_SET_CELL = code.OP_SET_CELL
+OP_LOAD_CELL = code.OP_LOAD_CELL
+OP_LOAD_FREE = code.OP_LOAD_FREE
+
+infix_operators = {
+    OP_ADD: "+",
+    OP_SUB: "-",
+    OP_MUL: "*",
+    OP_DIV: "/",
+    OP_EQUAL: "==",
+    OP_NOT_EQUAL: "!=",
+    OP_GREATER_THAN: ">",
+    OP_LESS_THAN: "<",
+}
+
+# Set by set_profiler and set_budget; each run() reads them once.
+profiler = None
+budget = None
+
+
+def set_profiler(new_profiler):
+    """Passes every call made by VMs run from now on through new_profiler,
+    or stops when it is None."""
+    global profiler
+    profiler = new_profiler
+
+
+def set_budget(new_budget):
+    """Charges every call made by VMs run from now on to new_budget, or stops
+    when it is None."""
+    global budget
+    budget = new_budget
+
+
+def call_builtin(fn, args):
+    return fn.fn(args)
+
+
+# The instructions of call_function for each number of arguments.
+call_instructions = {}
+
+# The VM that last started running, through which builtins such as map
+# call closures. A VM started while another runs is one of its
+# call_function() VMs, which shares its constants and globals, so running
+# need not be restored when it ends.
+running = None
+
+
+def call_closure(fn, args):
+    return running.call_function(fn, args)
+
+
+function_callers[Closure] = call_closure
+
+
+def new_globals_store(size=0):
+    """The globals of a new program: the builtins, which a Compiler
+    defines first, and then unset slots up to size. A VM adds the slots its
+    program needs."""
+    globals_store = [builtins[name] for name in builtin_names]
+    globals_store.extend([None] * (size - len(globals_store)))
+    return globals_store
+
+
+class VM:
+    def __init__(self, bytecode, globals_store=None):
+        self.constants = bytecode.constants
+        self.instructions = bytecode.instructions
+        self.global_names = bytecode.global_names
+        self.globals = globals_store if globals_store is not None else new_globals_store()
+        # A slot for every global the program was compiled with, including
+        # those defined since the store was last used.
+        if len(self.globals) < len(self.global_names):
+            self.globals.extend([None] * (len(self.global_names) - len(self.globals)))
+        # Set when the main program ends on a return statement.
+        self.returned = False
+
+    def run(self, stack=None):
+        """Runs the main program and returns the value evaluate() would return
+        for it: the last statement's value, a top-level return value or the
+        first Error raised anywhere. The program starts on stack if given."""
+        global running
+        running = self
+        constants = self.constants
+        globals_ = self.globals
+        if stack is None:
+            stack = []
+        push = stack.append
+        pop = stack.pop
+        frames = []
+        # Maps the depth of a frame to what to call with its return value:
+        # a list of (function, argument) pairs, each called as
+        # function(argument, value). A memoized closure stores its result
+        # this way, and a profiled call ends.
+        pending = {}
+        current_profiler = profiler
+        current_budget = budget
+
+        ins = self.instructions
+        ip = 0
+        bp = 0
+        cl = None
+        last_popped = None
+
+        while True:
+            op = ins[ip]
+
+            if op == OP_GET_LOCAL:
+                value = stack[bp + ins[ip + 1]]
+                if value is None:
+                    # Read before its let: the name is looked up further out.
+                    scope, index = cl.fn.outers[ins[ip + 1]]
+                    value = self.read_outer(cl.free[index] if scope == FREE_SCOPE else index)
+                    if type(value) is Error:
+                        return value
+                push(value)
+                ip += 2
+            elif op == OP_CONSTANT:
+                push(constants[ins[ip + 1]])
+                ip += 2
+            elif op == OP_GET_GLOBAL:
+                value = globals_[ins[ip + 1]]
+                if value is None:
+                    name = self.global_names[ins[ip + 1]]
+                    return new_error(f"identifier not found: {name}")
+                push(value)
+                ip += 2
+            elif op == OP_ADD or op == OP_SUB or op == OP_LESS_THAN or op == OP_GREATER_THAN or op == OP_MUL \
+                    or op == OP_EQUAL or op == OP_NOT_EQUAL or op == OP_DIV:
+                right = pop()
+                left = stack[-1]
+                if type(left) is Integer and type(right) is Integer:
+                    if op == OP_ADD:
+                        stack[-1] = new_integer(left.value + right.value)
+                    elif op == OP_SUB:
+                        stack[-1] = new_integer(left.value - right.value)
+                    elif op == OP_LESS_THAN:
+                        stack[-1] = TRUE if left.value < right.value else FALSE
+                    elif op == OP_GREATER_THAN:
+                        stack[-1] = TRUE if left.value > right.value else FALSE
+                    elif op == OP_MUL:
+                        stack[-1] = new_integer(left.value * right.value)
+                    elif op == OP_EQUAL:
+                        stack[-1] = TRUE if left.value == right.value else FALSE
+                    elif op == OP_NOT_EQUAL:
+                        stack[-1] = TRUE if left.value != right.value else FALSE
+                    else:
+                        stack[-1] = Integer(left.value / right.value)
+                else:
+                    result = eval_infix_expression(infix_operators[op], left, right)
+                    if type(result) is Error:
+                        return result
+                    stack[-1] = result
+                ip += 1
+            elif op == OP_JUMP_NOT_TRUTHY:
+                condition = pop()
+                if condition is FALSE or condition is NULL:
+                    ip = ins[ip + 1]
+                else:
+                    ip += 2
+            elif op == OP_CALL:
+                num_args = ins[ip + 1]
+                ip += 2
+                callee = stack[-1 - num_args]
+                if current_budget is not None:
+                    current_budget.spend()
+                if type(callee) is Closure:
+                    fn = callee.fn
+                    if num_args != fn.num_parameters:
+                        if num_args < fn.num_parameters:
+                            return new_error(
+                                f"wrong number of arguments: want={fn.num_parameters}, got={num_args}")
+                        del stack[len(stack) - num_args + fn.num_parameters:]
+                        num_args = fn.num_parameters
+                    if len(frames) >= MAX_FRAMES:
+                        return new_error("stack overflow")
+                    frames.append((cl, ins, ip, bp))
+                    if current_profiler is not None:
+                        current_profiler.enter(callee)
+                        pending.setdefault(len(frames), []).append((current_profiler.returned, callee))
+                    cl = callee
+                    ins = fn.instructions
+                    ip = 0
+                    bp = len(stack) - num_args
+                    if fn.num_locals > num_args:
+                        stack.extend([None] * (fn.num_locals - num_args))
+                    for slot, scope, index in fn.cells:
+                        stack[bp + slot] = Cell(stack[bp + slot], callee.free[index] if scope == FREE_SCOPE else index)
+                elif isinstance(callee, Builtin):
+                    start = len(stack) - num_args
+                    args = stack[start:]
+                    del stack[start - 1:]
+                    if current_profiler is None:
+                        result = callee.fn(args)
+                    else:
+                        result = current_profiler.call(callee, args, call_builtin)
+                    if type(result) is Error:
+                        return result
+                    push(result)
+                elif type(callee) is Memoized:
+                    start = len(stack) - num_args
+                    args = stack[start:]
+                    if type(callee.fn) is Closure:
+                        # A miss runs the closure in a frame of this loop,
+                        # and OP_RETURN_VALUE stores its result.
+                        key = callee.key(args)
+                        result = None if key is None else callee.get(key)
+                        if result is None:
+                            if key is not None:
+                                pending.setdefault(len(frames) + 1, []).append((callee.put, key))
+                            stack[start - 1] = callee.fn
+                            ip -= 2
+                            continue
+                    else:
+                        result = callee.call(args, self.call_function)
+                        if type(result) is Error:
+                            return result
+                    del stack[start - 1:]
+                    push(result)
+                else:
+                    return new_error(f"not a function: {callee.type()}")
+            elif op == OP_RETURN_VALUE:
+                value = pop()
+                if not frames:
+                    self.returned = True
+                    return value
+                if pending and len(frames) in pending:
+                    for function, argument in pending.pop(len(frames)):
+                        function(argument, value)
+                del stack[bp - 1:]
+                push(value)
+                cl, ins, ip, bp = frames.pop()
+            elif op == OP_JUMP:
+                ip = ins[ip + 1]
+            elif op == OP_GET_FREE:
+                cell = cl.free[ins[ip + 1]]
+                value = cell.value
+                if value is None:
+                    value = self.read_outer(cell.outer)
+                    if type(value) is Error:
+                        return value
+                push(value)
+                ip += 2
+            elif op == OP_GET_CELL:
+                cell = stack[bp + ins[ip + 1]]
+                value = cell.value
+                if value is None:
+                    value = self.read_outer(cell.outer)
+                    if type(value) is Error:
+                        return value
+                push(value)
+                ip += 2
+            elif op == OP_POP:
+                last_popped = pop()
+                ip += 1
+                if ip >= len(ins) and not frames:
+                    return last_popped
+            elif op == OP_SET_LOCAL:
+                stack[bp + ins[ip + 1]] = pop()
+                ip += 2
+            elif op == OP_SET_CELL:
+                stack[bp + ins[ip + 1]].value = pop()
+                ip += 2
+            elif op == OP_SET_GLOBAL:
+                globals_[ins[ip + 1]] = pop()
+                ip += 2
+            elif op == OP_TRUE:
+                push(TRUE)
+                ip += 1
+            elif op == OP_FALSE:
+                push(FALSE)
+                ip += 1
+            elif op == OP_NULL:
+                push(NULL)
+                ip += 1
+            elif op == OP_NONE:
+                push(None)
+                ip += 1
+            elif op == OP_LOAD_CELL:
+                push(stack[bp + ins[ip + 1]])
+                ip += 2
+            elif op == OP_LOAD_FREE:
+                push(cl.free[ins[ip + 1]])
+                ip += 2
+            elif op == OP_CLOSURE:
+                fn = constants[ins[ip + 1]]
+                num_free = ins[ip + 2]
+                if num_free:
+                    free = stack[len(stack) - num_free:]
+                    del stack[len(stack) - num_free:]
+                else:
+                    free = []
+                push(Closure(fn, free))
+                ip += 3
+            elif op == OP_INDEX:
+                index = pop()
+                left = stack[-1]
+                if type(left) is Array and type(index) is Integer:
+                    idx = index.value
+                    elements = left.elements
+                    stack[-1] = elements[idx] if 0 <= idx < len(elements) else NULL
+                else:
+                    result = eval_index_expression(left, index)
+                    if type(result) is Error:
+                        return result
+                    stack[-1] = result
+                ip += 1
+            elif op == OP_MINUS:
+                right = stack[-1]
+                if type(right) is Integer:
+                    stack[-1] = new_integer(-right.value)
+                else:
+                    result = eval_prefix_expression("-", right)
+                    if type(result) is Error:
+                        return result
+                    stack[-1] = result
+                ip += 1
+            elif op == OP_BANG:
+                stack[-1] = eval_bang_operator_expression(stack[-1])
+                ip += 1
+            elif op == OP_ARRAY:
+                num_elements = ins[ip + 1]
+                start = len(stack) - num_elements
+                elements = stack[start:]
+                del stack[start:]
+                push(Array(elements))
+                ip += 2
+            elif op == OP_HASH:
+                num_elements = ins[ip + 1]
+                start = len(stack) - num_elements
+                pairs = {}
+                for i in range(start, len(stack), 2):
+                    key = stack[i]
+                    if not isinstance(key, Hashable):
+                        return new_error(f"unusable as hash key: {key.type()}")
+                    pairs[key.hash_key()] = HashPair(key, stack[i + 1])
+                del stack[start:]
+                push(Hash(pairs))
+                ip += 2
+            else:
+                raise ValueError(f"unknown opcode {op}")
+
+    def read_outer(self, outer):
+        """The value of the variable outer, a Cell or the index of a global,
+        going on to the variable after it while it is unset, or an Error
+        when no variable of the name is set."""
+        while type(outer) is Cell:
+            if outer.value is not None:
+                return outer.value
+            outer = outer.outer
+        value = self.globals[outer]
+        if value is None:
+            return new_error(f"identifier not found: {self.global_names[outer]}")
+        return value
+
+    def call_function(self, fn, args):
+        """Calls a function value from Python and returns its result. A
+        closure runs in a VM of its own that shares this one's globals."""
+        if type(fn) is Closure:
+            instructions = call_instructions.get(len(args))
+            if instructions is None:
+                instructions = call_instructions[len(args)] = code.make(OP_CALL, len(args)) + code.make(OP_RETURN_VALUE)
+            vm = VM(Bytecode(instructions, self.constants, self.global_names), self.globals)
+            return vm.run([fn, *args])
+        elif isinstance(fn, Builtin):
+            return fn.fn(args) if profiler is None else profiler.call(fn, args, call_builtin)
+        elif type(fn) is Memoized:
+            return fn.call(args, self.call_function)
+        return new_error(f"not a function: {fn.type()}")
+
+
+def new_vm(bytecode):
+    return VM(bytecode)
+
+
+def new_vm_with_globals_store(bytecode, globals_store):
+    return VM(bytecode, globals_store)
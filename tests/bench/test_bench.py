@@ -0,0 +1,66 @@
+import copy
+
+from bench.bench import PHASES, compare, generated_name, generated_source, lex, measure, parse, workloads
+from src.lexer.token_ import TokenType
+from src.repl.repl import ENGINES, new_runner
+
+
+def test_workloads_run_on_every_engine():
+    sources = workloads()
+    assert {"fib", "arrays", "hashes", "strings", "closures", "generated"} <= set(sources)
+    source = generated_source(30)
+    expected = new_runner()(parse(lex(source))).inspect()
+    for engine in ENGINES:
+        actual = new_runner(engine)(parse(lex(source))).inspect()
+        assert actual == expected, f"{engine}: got={actual}, want={expected}"
+
+
+def test_generated_names_are_identifiers():
+    names = [generated_name(i) for i in range(30 * 26)]
+    assert len(set(names)) == len(names)
+    for name in names:
+        tokens = lex(name)
+        assert [t.token_type for t in tokens] == [TokenType.IDENT, TokenType.EOF], f"{name!r} lexed as {tokens}"
+
+
+def test_measure():
+    results = measure("let f = fn(x) { x * 2 }; f(21)", repeat=1)
+    assert results["result"] == "42"
+    for phase in PHASES:
+        measures = results["phases"][phase]
+        assert sorted(measures) == ["allocations", "peak_bytes", "seconds"], f"{phase}: {measures}"
+        assert measures["seconds"] >= 0 and measures["peak_bytes"] >= 0, f"{phase}: {measures}"
+    # 17 tokens and EOF; 14 AST nodes; f's Function and the Integer 42,
+    # small integers being shared, since f(21) is inlined and folded.
+    allocations = {phase: results["phases"][phase]["allocations"] for phase in PHASES}
+    assert allocations == {"lex": 18, "parse": 14, "evaluate": 2}, f"got={allocations}"
+    # As parsed, the call also makes an Environment.
+    results = measure("let f = fn(x) { x * 2 }; f(21)", repeat=1, optimize=False)
+    allocations = {phase: results["phases"][phase]["allocations"] for phase in PHASES}
+    assert results["result"] == "42" and allocations["evaluate"] == 3, f"got={allocations}"
+
+
+def test_compare():
+    phases = {phase: {"seconds": 0.1, "peak_bytes": 1000, "allocations": 10} for phase in PHASES}
+    baseline = {"engine": "eval", "optimize": True, "benchmarks": {"fib": {"phases": phases}}}
+    tests = [
+        (("lex", "seconds", 0.12), []),
+        (("lex", "seconds", 0.2), ["fib lex seconds: 0.2 against 0.1 (+100%)"]),
+        (("parse", "peak_bytes", 2000), ["fib parse peak_bytes: 2000 against 1000 (+100%)"]),
+        (("evaluate", "allocations", 100), []),
+    ]
+
+    for (phase, key, value), expected in tests:
+        results = copy.deepcopy(baseline)
+        results["benchmarks"]["fib"]["phases"][phase][key] = value
+        actual = compare(results, baseline)
+        assert actual == expected, f"{phase} {key}={value}: got={actual}, want={expected}"
+
+    small = copy.deepcopy(baseline)
+    for measures in small["benchmarks"]["fib"]["phases"].values():
+        measures["seconds"] = 0.0001
+    slower = copy.deepcopy(small)
+    slower["benchmarks"]["fib"]["phases"]["lex"]["seconds"] = 0.001
+    assert compare(slower, small) == [], "a difference below MIN_SECONDS was reported"
+    assert compare(dict(baseline, engine="vm"), baseline) == ["baseline is for engine eval, not vm"]
+    assert compare(dict(baseline, optimize=False), baseline) == ["baseline is for optimized programs, not programs as parsed"]
@@ -0,0 +1,94 @@
+import itertools
+import resource
+
+from src.budget.budget import Budget, new_budget, run_within_budget
+from src.evaluator import closure_compiler, evaluator, stack_evaluator
+from src.lexer.lexer import FastLexer
+from src.parser.parser import Parser
+from src.profiler.profiler import Profiler, profiling
+from src.repl.repl import ENGINES, new_runner, start_with_file
+from src.vm import vm
+
+# fib(10) makes 177 calls.
+FIB = "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };"
+
+
+def run(engine, source, budget):
+    program = Parser(FastLexer(source)).parse_program()
+    return run_within_budget(budget, new_runner(engine), program)
+
+
+def test_max_calls():
+    tests = [
+        (Budget(max_calls=177), "55"),
+        (Budget(max_calls=176), "ERROR: budget exceeded: more than 176 calls"),
+        (Budget(max_calls=176, check_every=7), "ERROR: budget exceeded: more than 176 calls"),
+        (Budget(max_calls=0), "ERROR: budget exceeded: more than 0 calls"),
+        (Budget(max_calls=10 ** 6, check_every=1), "55"),
+    ]
+    for engine in ENGINES:
+        for budget, expected in tests:
+            actual = run(engine, FIB + " fib(10)", budget).inspect()
+            assert actual == expected, f"{engine} {budget.max_calls}: expected={expected}, got={actual}"
+        budget = Budget(max_calls=1000, check_every=10)
+        run(engine, FIB + " fib(10)", budget)
+        assert budget.used() == 177, f"{engine}: used={budget.used()}"
+
+
+def test_timeout():
+    for engine in ENGINES:
+        # Each read of the clock is a second later than the one before.
+        clock = itertools.count().__next__
+        budget = Budget(seconds=20, clock=clock, check_every=5)
+        actual = run(engine, FIB + " fib(15)", budget).inspect()
+        assert actual == "ERROR: budget exceeded: ran for more than 20 seconds", f"{engine}: got={actual}"
+        assert budget.used() == 21 * 5 + 1, f"{engine}: used={budget.used()}"
+
+
+def test_max_memory():
+    # Doubles a string 26 times, to 128 MB, in 27 calls.
+    grow = 'let grow = fn(s, n) { if (n == 0) { len(s) } else { grow(s + s, n - 1) } }; grow("ab", 26)'
+    limits = resource.getrlimit(resource.RLIMIT_AS)
+    for engine in ENGINES:
+        actual = run(engine, grow, new_budget(max_memory=16)).inspect()
+        expected = f"ERROR: budget exceeded: used more than {16 * 1024 * 1024} bytes of memory"
+        assert actual == expected, f"{engine}: got={actual}"
+        actual = run(engine, grow.replace("26", "10"), new_budget(max_memory=16)).inspect()
+        assert actual == "2048", f"{engine}: got={actual}"
+        assert resource.getrlimit(resource.RLIMIT_AS) == limits, engine
+
+
+def test_budget_is_removed_after_run():
+    for engine in ENGINES:
+        run(engine, FIB + " fib(10)", Budget(max_calls=5))
+        assert evaluator.budget is None and stack_evaluator.budget is None, engine
+        assert closure_compiler.budget is None and vm.budget is None, engine
+        assert evaluator.apply_function is evaluator.plain_apply_function, engine
+        assert stack_evaluator.apply is stack_evaluator.plain_apply, engine
+    assert new_budget() is None
+
+
+def test_budget_with_profiler():
+    for engine in ENGINES:
+        profiler = Profiler()
+        program = Parser(FastLexer(FIB + " fib(10)")).parse_program()
+        profiler.label(program)
+        with profiling(profiler):
+            result = run_within_budget(Budget(max_calls=100), new_runner(engine), program)
+        assert result.inspect() == "ERROR: budget exceeded: more than 100 calls", f"{engine}: got={result.inspect()}"
+        calls = {entry["function"]: entry["calls"] for entry in profiler.report()}
+        assert calls["fib"] == 100, f"{engine}: got={calls}"
+
+
+def test_start_with_file(tmp_path, capsys):
+    script = tmp_path / "fib.monkey"
+    script.write_text(FIB + " fib(20)")
+    for engine in ENGINES:
+        start_with_file(str(script), engine=engine, cache=False, max_calls=1000)
+        assert capsys.readouterr().out == "ERROR: budget exceeded: more than 1000 calls\n", engine
+    # Calls to a small helper count, rather than being inlined.
+    script.write_text("let add = fn(a, b) { a + b };\n"
+                      "let loop = fn(n) { if (n == 0) { 0 } else { add(n, loop(n - 1)) } };\nloop(60)\n")
+    for engine in ENGINES:
+        start_with_file(str(script), engine=engine, cache=False, max_calls=100)
+        assert capsys.readouterr().out == "ERROR: budget exceeded: more than 100 calls\n", engine
@@ -0,0 +1,111 @@
+from src.cache import cache
+from src.cache.cache import cache_path, cached_statements, decode, encode
+from src.lexer.lexer import FastLexer
+from src.parser.parser import Parser
+
+SOURCES = [
+    "let a = 5; let b = a * 2; b + a", "return 10; 9;", "-5; !true; !!false; (1 + 2) * 3",
+    "if (1 > 2) { 10 } else { 20 }; if (true) { }",
+    "let add = fn(x, y) { x + y; }; add(5 + 5, add(5, 5)); fn() { }()",
+    '"Hello" + " " + "World!"; "name"', "[1, 2 * 2, 3 + 3][1]; []", '{"one": 1, true: 2, 3: [4]}; {}',
+    "007", "a == b != c < d > e / f",
+]
+
+
+def test_decode_rebuilds_the_parsed_statements():
+    for source in SOURCES:
+        for statement in Parser(FastLexer(source)).parse_statements():
+            decoded = decode(encode(statement))
+            assert describe(decoded) == describe(statement), f"{source!r}: {statement} decoded as {decoded}"
+
+
+def test_cache_hit_skips_the_parser(tmp_path, monkeypatch):
+    path = tmp_path / "script.monkey"
+    path.write_text("let a = 5;\na * 2\n")
+    assert [str(s) for s in cached_statements(str(path))] == ["let a = 5;", "(a * 2)"]
+
+    def no_parser(lexer):
+        raise AssertionError("parsed a script that was cached")
+
+    monkeypatch.setattr(cache, "Parser", no_parser)
+    assert [str(s) for s in cached_statements(str(path))] == ["let a = 5;", "(a * 2)"]
+
+
+def test_changed_source_invalidates_the_cache(tmp_path):
+    path = tmp_path / "script.monkey"
+    path.write_text("1 + 2")
+    assert [str(s) for s in cached_statements(str(path))] == ["(1 + 2)"]
+    path.write_text("3 * 4")
+    assert [str(s) for s in cached_statements(str(path))] == ["(3 * 4)"]
+
+
+def test_cache_key_is_that_of_the_parsed_source(tmp_path, monkeypatch):
+    path = tmp_path / "script.monkey"
+    path.write_text("1 + 2")
+    key = cache.cache_key
+
+    def key_then_change(filename):
+        # The script changes between hashing and parsing.
+        result = key(filename)
+        path.write_text("3 * 4")
+        return result
+
+    monkeypatch.setattr(cache, "cache_key", key_then_change)
+    assert [str(s) for s in cached_statements(str(path))] == ["(3 * 4)"]
+    monkeypatch.setattr(cache, "cache_key", key)
+    path.write_text("1 + 2")
+    assert [str(s) for s in cached_statements(str(path))] == ["(1 + 2)"]
+    monkeypatch.setattr(cache, "Parser", None)
+    assert [str(s) for s in cached_statements(str(path))] == ["(1 + 2)"]
+
+
+def test_stopping_early_still_writes_the_whole_cache(tmp_path, monkeypatch):
+    path = tmp_path / "script.monkey"
+    path.write_text("return 1; 2; 3")
+    statements = cached_statements(str(path))
+    next(statements)
+    statements.close()
+    assert (tmp_path / "__monkeycache__").is_dir() and len(list((tmp_path / "__monkeycache__").iterdir())) == 1
+    monkeypatch.setattr(cache, "Parser", None)
+    assert [str(s) for s in cached_statements(str(path))] == ["return 1;", "2", "3"]
+    assert cache_path(str(path)).startswith(str(tmp_path / "__monkeycache__"))
+
+
+def test_damaged_cache_is_parsed_again(tmp_path):
+    path = tmp_path / "script.monkey"
+    path.write_text("let a = 5;\na * 2;\n[a, a]")
+    expected = ["let a = 5;", "(a * 2)", "[a, a]"]
+    assert [str(s) for s in cached_statements(str(path))] == expected
+    entry = open(cache_path(str(path)), "rb").read()
+    for size in range(len(entry) - 1, len(entry) // 2, -3):
+        with open(cache_path(str(path)), "wb") as file:
+            file.write(entry[:size])
+        actual = [str(s) for s in cached_statements(str(path))]
+        assert actual == expected, f"cut to {size} of {len(entry)} bytes: got={actual}"
+        # The entry written in its place is whole.
+        assert open(cache_path(str(path)), "rb").read() == entry, f"cut to {size} bytes"
+
+
+def test_decoded_functions_keep_their_position(tmp_path, monkeypatch):
+    path = tmp_path / "script.monkey"
+    path.write_text("let f = fn(x) {\n  fn() { x }\n};")
+    for _ in range(2):
+        literal = next(cached_statements(str(path))).value
+        positions = [(literal.token.line, literal.token.column),
+                     (literal.body.statements[0].expression.token.line,
+                      literal.body.statements[0].expression.token.column)]
+        assert positions == [(1, 9), (2, 3)], f"got={positions}"
+        monkeypatch.setattr(cache, "Parser", None)
+
+
+def describe(node):
+    """Every attribute of a node and its children, tokens included."""
+    if isinstance(node, list):
+        return [describe(n) for n in node]
+    if isinstance(node, dict):
+        return [(describe(k), describe(v)) for k, v in node.items()]
+    if not hasattr(node, "__dict__"):
+        return node
+    if hasattr(node, "token_type"):
+        return node.token_type, node.literal
+    return type(node).__name__, {k: describe(v) for k, v in vars(node).items()}
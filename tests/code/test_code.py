@@ -0,0 +1,41 @@
+from src.code import code
+
+
+def test_make():
+    tests = [
+        (code.OP_CONSTANT, [65534], [code.OP_CONSTANT, 65534]),
+        (code.OP_ADD, [], [code.OP_ADD]),
+        (code.OP_GET_LOCAL, [255], [code.OP_GET_LOCAL, 255]),
+        (code.OP_CLOSURE, [65534, 255], [code.OP_CLOSURE, 65534, 255]),
+    ]
+
+    for op, operands, expected in tests:
+        instruction = code.make(op, *operands)
+        assert instruction == expected, f"instruction has wrong encoding. got={instruction}, want={expected}"
+
+
+def test_instructions_string():
+    instructions = (code.make(code.OP_ADD) + code.make(code.OP_GET_LOCAL, 1)
+                    + code.make(code.OP_CONSTANT, 2) + code.make(code.OP_CLOSURE, 65535, 255))
+    expected = """0000 OpAdd
+0001 OpGetLocal 1
+0003 OpConstant 2
+0005 OpClosure 65535 255
+"""
+    actual = code.instructions_string(instructions)
+    assert actual == expected, f"instructions wrongly formatted.\nwant={expected!r}\ngot={actual!r}"
+
+
+def test_read_operands():
+    tests = [
+        (code.OP_CONSTANT, [65535], 1),
+        (code.OP_GET_LOCAL, [255], 1),
+        (code.OP_CLOSURE, [65535, 255], 2),
+    ]
+
+    for op, operands, length in tests:
+        instruction = code.make(op, *operands)
+        definition = code.lookup(op)
+        operands_read, n = code.read_operands(definition, instruction, 1)
+        assert n == length, f"n wrong. want={length}, got={n}"
+        assert operands_read == operands, f"operand wrong. want={operands}, got={operands_read}"
@@ -0,0 +1,129 @@
+import asyncio
+import json
+
+from src.daemon.daemon import Daemon, from_json, parse_job, run_job
+from src.repl.repl import ENGINES
+
+
+def test_from_json():
+    tests = [
+        (None, "null"),
+        (True, "true"),
+        (False, "false"),
+        (42, "42"),
+        ("monkey", "monkey"),
+        ([1, "a", [None]], "[1, a, [null]]"),
+        ({"k": [1, 2]}, "{k: [1, 2]}"),
+    ]
+    for value, expected in tests:
+        actual = from_json(value).inspect()
+        assert actual == expected, f"{value!r}: expected={expected}, got={actual}"
+
+
+def test_parse_job_errors():
+    tests = [
+        ("{", "invalid JSON"),
+        ("[1]", "a job must be a JSON object"),
+        ('{"id": 1}', "source must be a string"),
+        ('{"source": "1", "bindings": [1]}', "bindings must be an object"),
+        ('{"source": "1", "engine": "jit"}', "unknown engine: jit"),
+        ('{"source": "1", "timeout": -1}', "timeout must be a non-negative number"),
+        ('{"source": "1", "max_calls": 1.5}', "max_calls must be a non-negative number"),
+        ('{"source": "1", "max_memory": "1"}', "max_memory must be a non-negative number"),
+    ]
+    for line, expected in tests:
+        try:
+            parse_job(line)
+        except ValueError as e:
+            assert str(e).startswith(expected), f"{line}: expected={expected}, got={e}"
+        else:
+            assert False, f"{line}: no error"
+
+
+def test_parse_job_limits():
+    tests = [
+        ('{"source": "1"}', None, {"max_calls": None, "timeout": None, "max_memory": None}),
+        ('{"source": "1", "max_calls": 10, "timeout": 0.5}', None,
+         {"max_calls": 10, "timeout": 0.5, "max_memory": None}),
+        ('{"source": "1", "max_calls": 10, "timeout": 5}', {"max_calls": 100, "timeout": 1, "max_memory": 64},
+         {"max_calls": 10, "timeout": 1, "max_memory": 64}),
+    ]
+    for line, limits, expected in tests:
+        actual = parse_job(line, limits=limits)["limits"]
+        assert actual == expected, f"{line} {limits}: expected={expected}, got={actual}"
+
+
+def test_run_job():
+    tests = [
+        ({"source": "puts(x); x * 2", "bindings": {"x": 21}}, {"result": "42", "type": "INTEGER", "output": "21\n"}),
+        ({"source": "let f = fn(s) { s + name }; f(\"hi \")", "bindings": {"name": "monkey"}},
+         {"result": "hi monkey", "type": "STRING", "output": ""}),
+        ({"source": "len(a) + h[\"k\"]", "bindings": {"a": [1, 2], "h": {"k": 5}}},
+         {"result": "7", "type": "INTEGER", "output": ""}),
+        ({"source": "1 + true"}, {"result": "ERROR: type mismatch: INTEGER + BOOLEAN", "type": "ERROR",
+                                  "error": "type mismatch: INTEGER + BOOLEAN", "output": ""}),
+        ({"source": "let = 1;"}, {"output": ""}),
+        ({"source": "let f = fn(n) { puts(n); f(n + 1) }; f(0)", "max_calls": 4},
+         {"result": "ERROR: budget exceeded: more than 4 calls", "type": "ERROR",
+          "error": "budget exceeded: more than 4 calls", "output": "0\n1\n"}),
+    ]
+    for engine in ENGINES:
+        for request, expected in tests:
+            job = parse_job(json.dumps(dict(request, id=7, engine=engine)))
+            response = run_job(job)
+            assert response.pop("id") == 7
+            assert response.pop("seconds") >= 0
+            if "result" not in expected:
+                assert "error" in response, f"{engine} {request}: got={response}"
+                response.pop("error")
+            assert response == expected, f"{engine} {request}: expected={expected}, got={response}"
+
+
+def test_serve():
+    lines = [
+        b'{"id": 1, "source": "let f = fn(n) { if (n < 2) { n } else { f(n - 1) + f(n - 2) } }; f(15)"}\n',
+        b"\n",
+        b"not json\n",
+        b'{"id": 3, "source": "puts(\\"x\\"); 3", "engine": "vm"}\n',
+    ]
+    written = []
+
+    async def readline():
+        return lines.pop(0) if lines else b""
+
+    async def write(data):
+        written.append(json.loads(data))
+
+    with Daemon(jobs=2) as daemon:
+        asyncio.run(daemon.serve(readline, write))
+    responses = {response["id"]: response for response in written}
+    assert len(written) == 3, written
+    assert responses[1]["result"] == "610", responses
+    assert responses[None]["error"].startswith("invalid job: invalid JSON"), responses
+    assert (responses[3]["result"], responses[3]["output"]) == ("3", "x\n"), responses
+
+
+def test_serve_unix(tmp_path):
+    path = str(tmp_path / "monkey.sock")
+
+    async def client(daemon, i):
+        reader, writer = await asyncio.open_unix_connection(path)
+        for j in range(3):
+            job = {"id": j, "source": "n * 10 + j", "bindings": {"n": i, "j": j}}
+            writer.write((json.dumps(job) + "\n").encode())
+        writer.write_eof()
+        responses = []
+        while line := await reader.readline():
+            responses.append(json.loads(line))
+        return sorted((response["id"], response["result"]) for response in responses)
+
+    async def serve(daemon):
+        server = await asyncio.start_unix_server(daemon.serve_client, path)
+        async with server:
+            return await asyncio.gather(*(client(daemon, i) for i in range(3)))
+
+    with Daemon(jobs=2) as daemon:
+        results = asyncio.run(serve(daemon))
+    for i, actual in enumerate(results):
+        expected = [(j, str(i * 10 + j)) for j in range(3)]
+        assert actual == expected, f"client {i}: expected={expected}, got={actual}"
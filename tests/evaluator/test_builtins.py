@@ -0,0 +1,77 @@
+from src.lexer.lexer import Lexer
+from src.parser.parser import Parser
+from src.repl.repl import ENGINES, new_runner
+
+
+def test_higher_order_builtins():
+    tests = [
+        ("map(fn(x) { x * 2 }, [1, 2, 3])", "[2, 4, 6]"),
+        ("let k = 10; map(fn(x) { x + k }, range(3))", "[10, 11, 12]"),
+        ('map(len, ["ab", "", "c"])', "[2, 0, 1]"),
+        ("map(memo(fn(x) { x * x }), [3, 3, 4])", "[9, 9, 16]"),
+        ("map(fn(x) { x }, [])", "[]"),
+        ("filter(fn(x) { x > 2 }, [1, 5, 2, 3])", "[5, 3]"),
+        ("filter(fn(x) { if (x > 1) { x } }, [1, 2])", "[2]"),
+        ("reduce(fn(a, b) { a + b }, range(101))", "5050"),
+        ("reduce(fn(a, b) { push(a, b * 2) }, [1, 2], [])", "[2, 4]"),
+        ("reduce(fn(a, b) { a + b }, [], 7)", "7"),
+        ("let add = fn(a, b) { a + b }; let total = fn(xs) { reduce(add, xs, 0) }; total(map(total, [[1, 2], [3]]))",
+         "6"),
+        ("map(fn(x) { x + true }, [1])", "ERROR: type mismatch: INTEGER + BOOLEAN"),
+        ("map(1, [1])", "ERROR: first argument to `map` must be FUNCTION, got INTEGER"),
+        ("filter(fn(x) { x }, 1)", "ERROR: second argument to `filter` must be ARRAY, got INTEGER"),
+        ("reduce(fn(a, b) { a }, [])", "ERROR: `reduce` of an empty ARRAY needs an initial value"),
+        ("map(fn(x) { x })", "ERROR: wrong number of arguments. got=1, want=2"),
+    ]
+    check(tests)
+
+
+def test_callbacks_recurse_as_deeply_as_calls():
+    define = "let d = fn(n) { if (n == 0) { 0 } else { d(n - 1) } }; "
+    for engine in ENGINES:
+        called = run(engine, define + "d(5000)")
+        mapped = run(engine, define + "map(d, [5000])")
+        expected = called if called == "RecursionError" else f"[{called}]"
+        assert mapped == expected, f"{engine}: map gave {mapped}, a call gave {called}"
+    assert run("stack", define + "map(d, [5000])") == "[0]"
+
+
+def test_sequence_builtins():
+    tests = [
+        ("range(4)", "[0, 1, 2, 3]"),
+        ("range(2, 5)", "[2, 3, 4]"),
+        ("range(10, 0, -4)", "[10, 6, 2]"),
+        ("range(3, 1)", "[]"),
+        ("range(1, 2, 0)", "ERROR: step given to `range` must not be 0"),
+        ('range("a")', "ERROR: arguments to `range` must be INTEGER, got a"),
+        ("sum(range(10))", "45"),
+        ("sum([])", "0"),
+        ('sum([1, "a"])', "ERROR: elements summed by `sum` must be INTEGER, got STRING"),
+        ("min([3, 1, 2])", "1"),
+        ("max(3, 7, 5)", "7"),
+        ('max(["b", "c", "a"])', "c"),
+        ("min([])", "null"),
+        ('min([1, "a"])', "ERROR: values compared by `min` must all be INTEGER, got STRING"),
+        ("max([true])", "ERROR: values compared by `max` must be INTEGER or STRING, got BOOLEAN"),
+        ("max(1)", "ERROR: argument to `max` must be ARRAY, got INTEGER"),
+        ('zip([1, 2, 3], ["a", "b"])', "[[1, a], [2, b]]"),
+        ("zip([1], [2], [3])", "[[1, 2, 3]]"),
+        ("zip()", "ERROR: wrong number of arguments. got=0, want=at least 1"),
+    ]
+    check(tests)
+
+
+def run(engine, input_):
+    program = Parser(Lexer(input_)).parse_program()
+    try:
+        return new_runner(engine)(program).inspect()
+    except RecursionError:
+        return "RecursionError"
+
+
+def check(tests):
+    for engine in ENGINES:
+        for input_, expected in tests:
+            program = Parser(Lexer(input_)).parse_program()
+            actual = new_runner(engine)(program).inspect()
+            assert actual == expected, f"{engine} {input_!r}: got={actual}, want={expected}"
@@ -0,0 +1,48 @@
+from src.evaluator import evaluator
+from src.evaluator.closure_compiler import ClosureFunction, compile_node, run
+from src.lexer.lexer import Lexer
+from src.object.environment import Environment
+from src.parser.parser import Parser
+from src.resolver.resolver import resolve
+
+
+def test_closure_compiler_matches_evaluator():
+    tests = [
+        "5 + 5 + 5 + 5 - 10", "(5 + 10 * 2 + 15 / 3) * 2 + -10", "-5", "!!5", "1 < 2", "1 > 2",
+        "1 == 1", "1 != 2", "true != false", "(1 < 2) == true",
+        "if (true) { 10 }", "if (false) { 10 }", "if (1 > 2) { 10 } else { 20 }", "if (true) { }",
+        "let a = 5; let b = a * 2; b + a", "let a = 5;", "return 10; 9;",
+        "if (10 > 1) { if (10 > 1) { return 10; } return 1; }",
+        "let add = fn(x, y) { x + y; }; add(5 + 5, add(5, 5));", "fn(x) { x; }(5)",
+        "let newAdder = fn(x) { fn(y) { x + y } }; let addTwo = newAdder(2); addTwo(3);",
+        "let f = fn() { let g = fn() { y }; let y = 2; g() }; f()",
+        "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(12);",
+        '"Hello" + " " + "World!"', '"a" == "a"', "[1, 2 * 2, 3 + 3][1]", "[1, 2, 3][3]",
+        'len("four")', "rest([1, 2, 3])", "push([1], 2)", '{"one": 1, "two": 2}',
+        "5 + true;", "-true", "if (10 > 1) { true + false; }", "foobar", "1(2)",
+        '{"one": 1, "two": 2}["two"]', 'let h = {1: "a", true: "b", "c": 3}; h[1] + h[true]', '{1: 2}[2]', '{[1]: 2}', '{"a": 1}[fn(x) { x }]',
+    ]
+
+    for input_ in tests:
+        program = Parser(Lexer(input_)).parse_program()
+        expected = evaluator.evaluate(program, Environment())
+        actual = run(program, Environment())
+        assert describe(actual) == describe(expected), \
+            f"{input_!r}: got={describe(actual)}, want={describe(expected)}"
+
+
+def test_program_is_compiled_once():
+    program = Parser(Lexer("let double = fn(x) { x * 2 }; double(21)")).parse_program()
+    resolve(program)
+    code = compile_node(program)
+
+    for _ in range(3):
+        env = Environment()
+        assert code(env).value == 42
+        assert isinstance(env.get("double"), ClosureFunction)
+
+
+def describe(obj):
+    if obj is None:
+        return None
+    return obj.type(), obj.inspect()
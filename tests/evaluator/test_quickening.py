@@ -0,0 +1,52 @@
+from src.evaluator import evaluator
+from src.lexer.lexer import Lexer
+from src.object.environment import Environment
+from src.parser.parser import Parser
+
+
+def test_infix_node_is_specialized():
+    program = Parser(Lexer("let f = fn(a, b) { a + b }; f(1, 2); f(3, 4)")).parse_program()
+    env = Environment()
+    evaluated = evaluator.evaluate(program, env)
+    node = program.statements[0].value.body.statements[0].expression
+
+    assert evaluated.value == 7, f"got={evaluated.inspect()}, want=7"
+    assert node.specialized is evaluator.add_integers, f"node not specialized. got={node.specialized}"
+
+
+def test_guard_failure_respecializes():
+    input_ = 'let f = fn(a, b) { a + b }; f(1, 2); f("a", "b")'
+    program = Parser(Lexer(input_)).parse_program()
+    evaluated = evaluator.evaluate(program, Environment())
+    node = program.statements[0].value.body.statements[0].expression
+
+    assert evaluated.value == "ab", f"got={evaluated.inspect()}, want=ab"
+    assert node.specialized is evaluator.concatenate_strings, f"node not respecialized. got={node.specialized}"
+    assert node.guard_failures == 1, f"got={node.guard_failures} guard failures, want=1"
+
+
+def test_megamorphic_node_stays_generic():
+    input_ = 'let f = fn(a, b) { a == b }; f(1, 1); f(true, true); f(1, 1); f(true, false); f(1, 2); f(1, 2)'
+    program = Parser(Lexer(input_)).parse_program()
+    evaluated = evaluator.evaluate(program, Environment())
+    node = program.statements[0].value.body.statements[0].expression
+
+    assert evaluated.value is False, f"got={evaluated.inspect()}, want=false"
+    assert node.specialized is None, f"node still specialized. got={node.specialized}"
+
+
+def test_specialized_results_match_generic_results():
+    tests = [
+        ("let f = fn(a, b) { a - b }; f(5, 3); f(5, true)", "type mismatch: INTEGER - BOOLEAN"),
+        ("let f = fn(a, i) { a[i] }; f([1, 2], 1); f([1, 2], 5)", "null"),
+        ('let f = fn(a, i) { a[i] }; f([1, 2], 1); f({"a": 1}, 0)', "null"),
+        ("let f = fn(a, i) { a[i] }; f([1, 2], 1); f(1, 0)", "ERROR: index operator not supported: INTEGER"),
+        ('let f = fn(a, b) { a < b }; f(1, 2); f("a", "b")', "ERROR: unknown operator: STRING < STRING"),
+    ]
+
+    for input_, expected in tests:
+        evaluated = evaluator.evaluate(Parser(Lexer(input_)).parse_program(), Environment())
+        actual = evaluated.inspect()
+        if evaluated.type() == "ERROR" and not expected.startswith("ERROR"):
+            actual = evaluated.message
+        assert actual == expected, f"{input_!r}: got={actual}, want={expected}"
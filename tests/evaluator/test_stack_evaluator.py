@@ -0,0 +1,64 @@
+import tracemalloc
+
+from src.evaluator import evaluator, stack_evaluator
+from src.lexer.lexer import Lexer
+from src.object.environment import Environment
+from src.parser.parser import Parser
+
+
+def test_stack_evaluator_matches_evaluator():
+    tests = [
+        "5 + 5 + 5 + 5 - 10", "(5 + 10 * 2 + 15 / 3) * 2 + -10", "-5", "!!5", "1 < 2", "1 > 2",
+        "1 == 1", "1 != 2", "true != false", "(1 < 2) == true",
+        "if (true) { 10 }", "if (false) { 10 }", "if (1 > 2) { 10 } else { 20 }", "if (true) { }",
+        "let a = 5; let b = a * 2; b + a", "let a = 5;", "return 10; 9;", "9; return 10;",
+        "if (10 > 1) { if (10 > 1) { return 10; } return 1; }",
+        "let f = fn() { return if (true) { return 5; }; }; f()",
+        "let f = fn() { 1 + if (true) { return 5; } }; f()",
+        "let add = fn(x, y) { x + y; }; add(5 + 5, add(5, 5));", "fn(x) { x; }(5)", "fn() { }()",
+        "let newAdder = fn(x) { fn(y) { x + y } }; let addTwo = newAdder(2); addTwo(3);",
+        "let f = fn() { let g = fn() { y }; let y = 2; g() }; f()",
+        "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(12);",
+        '"Hello" + " " + "World!"', '"a" == "a"', "[1, 2 * 2, 3 + 3][1]", "[1, 2, 3][3]", "[]",
+        'len("four")', "rest([1, 2, 3])", "push([1], 2)", '{"one": 1, "two": 2}', "{}",
+        "5 + true;", "-true", "if (10 > 1) { true + false; }", "foobar", "1(2)", "len(1)",
+        '{"one": 1, "two": 2}["two"]', 'let h = {1: "a", true: "b", "c": 3}; h[1] + h[true]', '{1: 2}[2]', '{[1]: 2}', '{"a": 1}[fn(x) { x }]',
+    ]
+
+    for input_ in tests:
+        program = Parser(Lexer(input_)).parse_program()
+        expected = evaluator.evaluate(program, Environment())
+        actual = stack_evaluator.evaluate(program, Environment())
+        assert describe(actual) == describe(expected), \
+            f"{input_!r}: got={describe(actual)}, want={describe(expected)}"
+
+
+def test_deep_recursion():
+    input_ = "let count = fn(n) { if (n == 0) { 0 } else { 1 + count(n - 1) } }; count(20000);"
+    program = Parser(Lexer(input_)).parse_program()
+    evaluated = stack_evaluator.evaluate(program, Environment())
+    assert evaluated.value == 20000, f"got={evaluated.inspect()}, want=20000"
+
+
+def test_tail_calls_run_in_constant_space():
+    tests = [
+        "let loop = fn(n, acc) { if (n == 0) { return acc; } return loop(n - 1, acc + 1); }; loop({n}, 0);",
+        "let loop = fn(n, acc) { if (n == 0) { acc } else { loop(n - 1, acc + 1) } }; loop({n}, 0);",
+    ]
+
+    for input_ in tests:
+        peaks = []
+        for n in (1000, 10000):
+            program = Parser(Lexer(input_.replace("{n}", str(n)))).parse_program()
+            tracemalloc.start()
+            evaluated = stack_evaluator.evaluate(program, Environment())
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            assert evaluated.value == n, f"got={evaluated.inspect()}, want={n}"
+        assert peaks[1] < peaks[0] * 2, f"{input_!r}: memory grew with depth. peaks={peaks}"
+
+
+def describe(obj):
+    if obj is None:
+        return None
+    return obj.type(), obj.inspect()
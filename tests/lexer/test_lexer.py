@@ -1,4 +1,4 @@
-from src.lexer.lexer import Lexer
+from src.lexer.lexer import FastLexer, Lexer
 from src.lexer.token_ import TokenType
 
 
@@ -118,10 +118,63 @@ if (5 < 10) {
         (TokenType.EOF, ""),
     ]
 
-    lexer = Lexer(input_)
+    for lexer in (Lexer(input_), FastLexer(input_)):
+        for i, (expected_type, expected_literal) in enumerate(tests):
+            tok = lexer.next_token()
+            assert tok.token_type == expected_type, \
+                f"{type(lexer).__name__} test {i} - Expected token_type={expected_type}, got={tok.token_type}"
+            assert tok.literal == expected_literal, \
+                f"{type(lexer).__name__} test {i} - Expected literal={expected_literal}, got={tok.literal}"
 
-    for i, (expected_type, expected_literal) in enumerate(tests):
-        tok = lexer.next_token()
-        assert tok.token_type == expected_type, f"Test {i} - Expected token_type={expected_type}, got={tok.token_type}"
-        assert tok.literal == expected_literal, f"Test {i} - Expected literal={expected_literal}, got={tok.literal}"
 
+def test_fast_lexer_matches_lexer():
+    inputs = [
+        "", "   \t\r\n", "x1y22 z_ _a", "!==!=", "=!", "@#$.~`", '"', '"abc', '"a\x00b" c', "a\x00b",
+        'let s = "foo bar";', "if(a<b){return!c;}else{[1,2][0]}", "héllo ²3 \"é\"", "fn(x) { x * 2 / 1 - -3 }",
+    ]
+    for input_ in inputs:
+        lexer = Lexer(input_)
+        fast_lexer = FastLexer(input_)
+        # Read past the end as well: both keep returning EOF.
+        for i in range(len(input_) + 3):
+            expected = lexer.next_token()
+            tok = fast_lexer.next_token()
+            assert (tok.token_type, tok.literal) == (expected.token_type, expected.literal), \
+                f"{input_!r} token {i}: got=({tok.token_type}, {tok.literal!r}), " \
+                f"want=({expected.token_type}, {expected.literal!r})"
+
+
+
+def test_fast_lexer_reads_chunks():
+    inputs = [
+        'let add = fn(x, y) { x + y; }; add(10, 200) != 3 == "a long string";',
+        '"unterminated', "héllo ²3 \"é\" ok", "a\x00b   ",
+    ]
+    for input_ in inputs:
+        for size in (1, 2, 3, 7):
+            chunks = [input_[i:i + size] for i in range(0, len(input_), size)]
+            lexer = Lexer(input_)
+            fast_lexer = FastLexer(chunks)
+            for i in range(len(input_) + 3):
+                expected = lexer.next_token()
+                tok = fast_lexer.next_token()
+                assert (tok.token_type, tok.literal) == (expected.token_type, expected.literal), \
+                    f"{input_!r} in chunks of {size}, token {i}: got=({tok.token_type}, {tok.literal!r}), " \
+                    f"want=({expected.token_type}, {expected.literal!r})"
+
+
+def test_function_tokens_record_their_position():
+    input_ = 'let f = fn(x) {\n  fn() { x }\n};\n"é\nfn" fn(){}\n\tfn'
+    expected = [(1, 9), (2, 3), (5, 5), (6, 2)]
+    for size in (None, 1, 2, 5):
+        chunks = input_ if size is None else [input_[i:i + size] for i in range(0, len(input_), size)]
+        for lexer in (Lexer(input_), FastLexer(chunks)):
+            positions = []
+            while True:
+                tok = lexer.next_token()
+                if tok.token_type == TokenType.EOF:
+                    break
+                if tok.token_type == TokenType.FUNCTION:
+                    positions.append((tok.line, tok.column))
+            assert positions == expected, \
+                f"{type(lexer).__name__} in chunks of {size}: got={positions}, want={expected}"
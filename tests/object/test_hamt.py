@@ -0,0 +1,71 @@
+from src.evaluator import evaluator
+from src.lexer.lexer import Lexer
+from src.object.environment import Environment
+from src.object.hamt import Hamt, new_hamt
+from src.parser.parser import Parser
+from src.repl.repl import ENGINES, new_runner
+
+
+class CollidingKey:
+    def __init__(self, value):
+        self.value = value
+
+    def __hash__(self):
+        return 42
+
+    def __eq__(self, other):
+        return isinstance(other, CollidingKey) and self.value == other.value
+
+
+def test_set_and_get():
+    keys = [("INTEGER", i) for i in range(5000)] + [CollidingKey(i) for i in range(5)]
+    hamt = new_hamt((k, i) for i, k in enumerate(keys))
+    assert len(hamt) == len(keys)
+    for i, key in enumerate(keys):
+        assert hamt.get(key) == i, f"get({key!r}) = {hamt.get(key)!r}, want {i}"
+    assert hamt.get(("INTEGER", -1)) is None
+    assert hamt.get(CollidingKey(99), "missing") == "missing"
+    assert dict(hamt) == {k: i for i, k in enumerate(keys)}
+
+
+def test_set_leaves_original_unchanged():
+    original = new_hamt([("a", 1), ("b", 2)])
+    replaced = original.set("a", 10)
+    added = original.set("c", 3)
+    assert dict(original) == {"a": 1, "b": 2}
+    assert dict(replaced) == {"a": 10, "b": 2} and len(replaced) == 2
+    assert dict(added) == {"a": 1, "b": 2, "c": 3} and len(added) == 3
+    assert len(Hamt()) == 0 and list(Hamt()) == []
+
+
+def test_hash_index_uses_hash_key():
+    tests = [
+        ('{"one": 1, "two": 2}["two"]', 2),
+        ('let key = "k"; {"k": 5}[key]', 5),
+        ("{1: 10, 2: 20}[1 + 1]", 20),
+        ("{true: 1, false: 0}[1 < 2]", 1),
+        ('{"a": 1, "a": 2}["a"]', 2),
+    ]
+    for input_, expected in tests:
+        result = evaluator.evaluate(Parser(Lexer(input_)).parse_program(), Environment())
+        assert result.value == expected, f"{input_!r}: got={result.inspect()}, want={expected}"
+
+
+def test_iterates_in_insertion_order():
+    keys = [("STRING", c) for c in "qwertyuiopasdfghjklzxcvbnm"] + [CollidingKey(i) for i in (3, 1, 2)]
+    hamt = new_hamt((k, i) for i, k in enumerate(keys))
+    assert [k for k, _ in hamt] == keys, f"got={[k for k, _ in hamt]}"
+    replaced = hamt.set(keys[0], -1).set(CollidingKey(1), -2).set("new", 0)
+    want = keys + ["new"]
+    assert [k for k, _ in replaced] == want, f"got={[k for k, _ in replaced]}"
+    assert replaced.get(keys[0]) == -1 and replaced.get(CollidingKey(1)) == -2
+    duplicated = new_hamt([("a", 1), ("b", 2), ("a", 3)])
+    assert list(duplicated) == [("a", 3), ("b", 2)] and len(duplicated) == 2
+
+
+def test_hash_inspect_in_insertion_order():
+    input_ = '{"c": 1, "a": 2, "b": 3, "kiwi": 4, "apple": 5, 10: 6, true: 7}'
+    expected = "{c: 1, a: 2, b: 3, kiwi: 4, apple: 5, 10: 6, true: 7}"
+    for engine in ENGINES:
+        actual = new_runner(engine)(Parser(Lexer(input_)).parse_program()).inspect()
+        assert actual == expected, f"{engine}: got={actual}, want={expected}"
@@ -0,0 +1,82 @@
+import gc
+
+from src.evaluator import evaluator
+from src.lexer.lexer import Lexer
+from src.object.environment import Environment
+from src.object.object import Builtin, Error, Integer, Memoized, String, interned_strings, new_integer, new_string
+from src.parser.parser import Parser
+
+
+def test_new_integer_shares_small_values():
+    tests = [(0, True), (-5, True), (1024, True), (-6, False), (1025, False), (2.0, False)]
+    for value, shared in tests:
+        assert (new_integer(value) is new_integer(value)) == shared, f"new_integer({value!r}) shared is not {shared}"
+        assert new_integer(value).value == value
+        assert type(new_integer(value).value) is type(value), f"new_integer({value!r}) changed the value type"
+
+
+def test_objects_have_no_instance_dict():
+    assert not hasattr(Integer(5), "__dict__")
+
+
+def test_literal_nodes_return_one_object():
+    program = Parser(Lexer('fn() { 5000; "a" }')).parse_program()
+    body = program.statements[0].expression.body.statements
+    for statement in body:
+        first = evaluator.evaluate(statement, Environment())
+        second = evaluator.evaluate(statement, Environment())
+        assert first is second, f"{statement} gave a new object on each evaluation"
+
+
+def test_identifier_like_string_literals_are_shared():
+    program = Parser(Lexer('{"name": 1}["name"]; "a b"; "a b"')).parse_program()
+    results = [evaluator.evaluate(s, Environment()) for s in program.statements]
+    assert results[0].value == 1
+    key_node = list(program.statements[0].expression.left.pairs)[0]
+    index_node = program.statements[0].expression.index
+    assert key_node.value is index_node.value, "parser did not intern the key"
+    assert new_string("name") is new_string("name")
+    assert new_string("a b") is not new_string("a b")
+
+
+def test_interned_strings_are_freed():
+    program = Parser(Lexer('"only_here"')).parse_program()
+    evaluator.evaluate(program, Environment())
+    assert "only_here" in interned_strings, "the literal was not interned"
+    del program
+    gc.collect()
+    assert "only_here" not in interned_strings, "the table kept a literal no program refers to"
+
+
+def test_string_hash_key_is_cached():
+    string = String("name")
+    assert string.hash_key() is string.hash_key()
+    assert string.hash_key() == String("name").hash_key()
+    assert string.hash_key() != String("other").hash_key()
+
+
+def test_memoized_keeps_recent_results():
+    calls = []
+
+    def double(args):
+        calls.append(args[0].value)
+        return Integer(args[0].value * 2)
+
+    memoized = Memoized(Builtin(double), size=2)
+    call = lambda fn, args: fn.fn(args)
+    for value in [1, 2, 1, 3, 2, 1]:
+        result = memoized.call([new_integer(value)], call)
+        assert result.value == value * 2, f"call({value}) gave {result.value}"
+    assert calls == [1, 2, 3, 2, 1], f"calls={calls}"
+    assert (memoized.hits, memoized.misses, memoized.evictions) == (1, 5, 3)
+    assert [key[0][1] for key in memoized.cache] == [2, 1]
+
+
+def test_memoized_does_not_cache_errors_or_unhashable_arguments():
+    memoized = Memoized(Builtin(lambda args: Error("no")))
+    call = lambda fn, args: fn.fn(args)
+    memoized.call([new_integer(1)], call)
+    memoized.call([Integer(1.0)], call)
+    memoized.call([Memoized(Builtin(len))], call)
+    assert not memoized.cache, f"cached {list(memoized.cache)}"
+    assert (memoized.misses, memoized.uncached) == (1, 2)
@@ -0,0 +1,44 @@
+from src.object.vector import Vector, new_vector
+
+# Sizes around the tail and trie level boundaries.
+SIZES = [0, 1, 31, 32, 33, 64, 1024, 1056, 1057, 33 * 32 * 32 + 1]
+
+
+def test_new_vector_and_push_match_list():
+    for n in SIZES:
+        expected = list(range(n))
+        pushed = Vector()
+        for x in expected:
+            pushed = pushed.push(x)
+        for vector in (new_vector(expected), pushed):
+            assert len(vector) == n, f"n={n}: len={len(vector)}"
+            assert list(vector) == expected, f"n={n}: iteration differs"
+            assert [vector[i] for i in range(n)] == expected, f"n={n}: indexing differs"
+
+
+def test_rest():
+    for n in SIZES:
+        vector = new_vector(range(n))
+        for dropped in range(1, min(n, 40) + 1):
+            vector = vector.rest()
+            assert list(vector) == list(range(dropped, n)), f"n={n}: rest x{dropped} differs"
+        if len(vector):
+            assert vector[0] == min(n, 40) and vector[-1] == n - 1
+
+
+def test_push_leaves_original_unchanged():
+    original = new_vector(range(32))
+    a = original.push("a")
+    b = original.push("b")
+    assert list(original) == list(range(32))
+    assert a[32] == "a" and b[32] == "b"
+    assert list(original.rest().push("c")) == list(range(1, 32)) + ["c"]
+
+
+def test_index_out_of_range():
+    for vector, i in [(Vector(), 0), (new_vector([1]), 1), (new_vector([1]).rest(), -1)]:
+        try:
+            vector[i]
+        except IndexError:
+            continue
+        assert False, f"index {i} of a {len(vector)}-element vector did not raise"
@@ -0,0 +1,135 @@
+from src.lexer.lexer import FastLexer
+from src.optimizer.inliner import Inliner, final_names, scan_final_names
+from src.optimizer.optimizer import optimize
+from src.parser.parser import Parser
+from src.repl.repl import ENGINES, new_runner, new_statement_runner, start_with_file
+
+# Each program, and how many of its calls should be inlined.
+PROGRAMS = [
+    ("let add = fn(x, y) { x + y }; add(1, 2)", 1),
+    ("let add = fn(x, y) { x + y }; let f = fn(a, b) { add(a, b) * add(b, 2) }; f(3, 4)", 3),
+    ("let add = fn(x, y) { return x + y; }; add(5, 6)", 1),
+    ("let sq = fn(x) { x * x }; let f = fn(n) { sq(n) + sq(n + 1) }; f(3)", 2),
+    ("let sq = fn(x) { x * x }; let f = fn(n) { sq(n + 1) }; f(3)", 1),
+    ("let inc = fn(x) { x + 1 }; let f = fn(n) { inc(n * 2) }; f(3)", 2),
+    ("let max = fn(a, b) { if (a > b) { a } else { b } }; let f = fn(x, y) { max(x, y) * 2 }; f(3, 9)", 2),
+    ("let max = fn(a, b) { if (a > b) { a } else { b } }; let f = fn(x) { max(x * 2, 5) }; f(4)", 1),
+    ("let k = 10; let addk = fn(x) { x + k }; let f = fn(k) { addk(k) }; f(1)", 1),
+    ("let k = 10; let addk = fn(x) { x + k }; let f = fn(n) { addk(n) }; f(1)", 2),
+    ("let f = fn(x) { let g = fn(y) { y * x }; g(3) + g(4) }; f(2)", 2),
+    ("let f = fn(x) { let g = fn(y) { y * x }; let h = fn(x) { g(x) }; h(5) }; f(2)", 1),
+    ("let f = fn(x) { let g = fn(y) { y * x }; let h = fn(z) { g(z) }; h(5) }; f(2)", 2),
+    ("let fact = fn(n) { if (n < 2) { 1 } else { n * fact(n - 1) } }; fact(5)", 0),
+    ("let id = fn(x) { x }; let id = fn(x) { x + 1 }; id(1)", 0),
+    ("let id = fn(x) { x }; let f = fn() { id(1) }; let id = fn(x) { x + 1 }; f()", 1),
+    ("let id = fn(x) { x }; id(1, 2)", 0),
+    ("let first = fn(a, b) { a }; let f = fn(n) { first(n, undefined) }; f(1)", 1),
+    ("let first = fn(a, b) { a }; let f = fn(n, m) { first(n, m) }; f(1, 2)", 2),
+    ("let pair = fn(a, b) { [a, b] }; let f = fn(n) { pair(n, n + 1)[1] }; f(1)", 2),
+    ("let swap = fn(a, b) { [b, a] }; let f = fn(n) { swap(n + 1, n * 2) }; f(1)", 1),
+    ("let get = fn(h, k) { h[k] }; get({\"a\": 1}, \"a\")", 1),
+    ("let g = fn(f, x) { f(x) }; g(len, \"abc\")", 1),
+    ("let g = fn(x) { len(x) + 1 }; let f = fn(len) { g(len) }; f(\"ab\")", 1),
+    ("let g = fn(x) { len(x) + 1 }; let f = fn(s) { g(s) }; f(\"ab\")", 2),
+    ("let bad = fn(x) { x + true }; let f = fn(n) { bad(n) }; f(1)", 2),
+    ("let mk = fn(x) { fn(y) { x + y } }; mk(1)(2)", 0),
+    ("let add = fn(x, y) { x + y }; if (true) { let add = fn(x, y) { x * y }; } add(2, 3)", 0),
+    ("let same = fn(a) { a == a }; let f = fn() { same([1]) }; f()", 1),
+]
+
+
+def test_inlined_program_matches_original(capsys):
+    for engine in ENGINES:
+        for input_, _ in PROGRAMS:
+            expected = new_runner(engine)(parse(input_))
+            expected_output = capsys.readouterr().out
+            program = parse(input_)
+            actual = new_runner(engine)(optimize(Inliner(final_names(program)).inline(program)))
+            assert describe(actual) == describe(expected), \
+                f"{engine} {input_!r}: got={describe(actual)}, want={describe(expected)}"
+            assert capsys.readouterr().out == expected_output, f"{engine} {input_!r}: output differs"
+
+
+def test_inlined_call_counts():
+    for input_, want in PROGRAMS:
+        program = parse(input_)
+        inliner = Inliner(final_names(program))
+        inliner.inline(program)
+        got = sum(inliner.inlined.values())
+        assert got == want, f"{input_!r}: inlined {got} calls, want {want}"
+
+
+def test_arguments_run_in_order(capsys):
+    tests = [
+        "let add = fn(a, b) { a + b }; add(puts(1), puts(2))",
+        "let sub = fn(a, b) { b - a }; sub(puts(1), puts(2))",
+        "let f = fn(a) { puts(3) + a }; f(puts(1))",
+        "let f = fn(a, b) { b }; f(puts(1), 2)",
+    ]
+
+    for input_ in tests:
+        new_runner()(parse(input_))
+        expected = capsys.readouterr().out
+        program = parse(input_)
+        new_runner()(optimize(Inliner(final_names(program)).inline(program)))
+        actual = capsys.readouterr().out
+        assert actual == expected, f"{input_!r}: got={actual!r}, want={expected!r}"
+
+
+def test_inlined_body():
+    program = parse("let add = fn(x, y) { x + y }; let f = fn(n) { add(n, 2) * add(1, 2) }")
+    program = optimize(Inliner(final_names(program)).inline(program))
+    assert str(program.statements[1]) == "let f = fn(n) ((n + 2) * 3);"
+
+
+def test_top_level_functions_need_final_names():
+    program = parse("let add = fn(x, y) { x + y }; add(1, 2)")
+    inliner = Inliner()
+    inliner.inline(program)
+    assert not inliner.inlined, f"inlined {dict(inliner.inlined)} without knowing the final names"
+
+
+def test_statements_are_inlined_one_at_a_time():
+    inliner = Inliner({"add"})
+    statements = Parser(FastLexer("let add = fn(x, y) { x + y }; let f = fn(n) { add(n, 1) }; f(2)")) \
+        .parse_statements()
+    run = new_statement_runner()
+    result = None
+    for statement in statements:
+        result = run(inliner.inline(statement))
+    assert result.value == 3
+    assert inliner.inlined == {"add": 1}
+
+
+def test_start_with_file_reports_inlined_calls(tmp_path, capsys):
+    path = tmp_path / "script.monkey"
+    path.write_text("let add = fn(x, y) { x + y };\nlet f = fn(n) { add(n, n) };\nputs(f(2));\nf(3)\n")
+    start_with_file(str(path), cache=False, inline_stats=True)
+    captured = capsys.readouterr()
+    assert captured.out == "4\n6\n"
+    assert captured.err == "inlined calls: 3\n\tf: 2\n\tadd: 1\n", captured.err
+
+
+def test_scan_final_names(tmp_path):
+    tests = [
+        ("let a = 1; let b = 2; let a = 3;", {"b"}),
+        ("let f = fn(x) { let y = x; y }; let y = 2;", {"f"}),
+        ('let a = 1; "let b = 2"', {"a", "b"}),
+        ("letx = 1; let\n\tc = 2", {"c"}),
+        ("", set()),
+        ('let a = "é";', set()),
+    ]
+
+    for source, expected in tests:
+        path = tmp_path / "script.monkey"
+        path.write_text(source, encoding="utf-8")
+        actual = scan_final_names(str(path))
+        assert actual == expected, f"{source!r}: got={actual}, want={expected}"
+
+
+def parse(input_):
+    return Parser(FastLexer(input_)).parse_program()
+
+
+def describe(obj):
+    return None if obj is None else (obj.type(), obj.inspect())
@@ -0,0 +1,98 @@
+from src.lexer.lexer import FastLexer
+from src.optimizer.inliner import let_counts
+from src.optimizer.memoizer import Memoizer
+from src.parser.parser import Parser
+from src.repl.repl import ENGINES, new_runner, start_with_file
+
+FIB = "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };"
+
+# Each program, and the functions that should be memoized in it.
+PROGRAMS = [
+    (FIB + " fib(20)", ["fib"]),
+    (FIB + " let k = 3; let g = fn(n) { if (n == 0) { k } else { g(n - 1) + fib(n) } }; g(10)", ["fib", "g"]),
+    ("let sq = fn(x) { x * x }; let f = fn(n) { if (n == 0) { 0 } else { sq(n) + f(n - 1) } }; f(10)",
+     ["f"]),
+    ("let f = fn(a) { if (len(a) == 0) { 0 } else { first(a) + f(rest(a)) } }; f([1, 2, 3])", ["f"]),
+    ("let f = fn(n) { let m = n - 1; if (n == 0) { 0 } else { n + f(m) } }; f(5)", ["f"]),
+    ("let f = fn(s, n) { if (n == 0) { s } else { f(s + \"a\", n - 1) } }; f(\"\", 3)", ["f"]),
+    ("let sq = fn(x) { x * x }; sq(3)", []),
+    ("let f = fn(n) { if (n == 0) { 0 } else { puts(n); f(n - 1) } }; f(3)", []),
+    ("let f = fn(n) { if (n == 0) { 0 } else { f(n - 1) } }; let f = 2; f", []),
+    ("let k = 1; let f = fn(n) { if (n == 0) { k } else { f(n - 1) } }; f(2); let k = 5; f(2)", []),
+    ("let f = fn(n) { if (n == 0) { 0 } else { g(n - 1) } }; let g = fn(n) { f(n) }; f(3)", []),
+    ("let f = fn(n, h) { if (n == 0) { h(0) } else { f(n - 1, h) } }; f(2, fn(x) { x + 1 })", []),
+    ("let f = fn(n) { let g = fn(x) { x }; if (n == 0) { 0 } else { f(g(n) - 1) } }; f(2)", []),
+    ("let len = fn(a) { 0 }; let f = fn(a) { if (len(a) == 0) { 0 } else { f(rest(a)) } }; f([1])", ["f"]),
+    ("let f = fn(a) { if (len(a) == 0) { 0 } else { f(rest(a)) } }; let len = fn(a) { 0 }; f([1])", []),
+    ("let memo = 1; " + FIB + " fib(5)", []),
+    ("let f = fn(n) { if (n == 0) { 0 } else { f(n - 1) } }; if (true) { let f = 1; } f", []),
+]
+
+
+def test_memoized_program_matches_original(capsys):
+    for engine in ENGINES:
+        for input_, _ in PROGRAMS:
+            expected = new_runner(engine)(parse(input_))
+            expected_output = capsys.readouterr().out
+            program = parse(input_)
+            actual = new_runner(engine)(Memoizer(let_counts(program)).memoize(program))
+            assert describe(actual) == describe(expected), \
+                f"{engine} {input_!r}: got={describe(actual)}, want={describe(expected)}"
+            assert capsys.readouterr().out == expected_output, f"{engine} {input_!r}: output differs"
+
+
+def test_memoized_functions():
+    for input_, want in PROGRAMS:
+        program = parse(input_)
+        memoizer = Memoizer(let_counts(program))
+        memoizer.memoize(program)
+        assert memoizer.memoized == want, f"{input_!r}: memoized {memoizer.memoized}, want {want}"
+
+
+def test_memoized_body():
+    program = parse(FIB)
+    program = Memoizer(let_counts(program), size=10).memoize(program)
+    assert str(program.statements[0]) == \
+        'let fib = memo(fn(n) if (n < 2) n else (fib((n - 1)) + fib((n - 2))), 10, "fib");'
+
+
+def test_memo_builtin():
+    stats = 'let s = memo_stats(f); [s["hits"], s["misses"], s["evictions"], s["uncached"], s["entries"]]'
+    tests = [
+        ("let f = memo(fn(n) { if (n < 2) { n } else { f(n - 1) + f(n - 2) } }); f(60)", "1548008755920"),
+        ("let f = memo(fn(n) { if (n < 2) { n } else { f(n - 1) + f(n - 2) } }); f(60); " + stats,
+         "[58, 61, 0, 0, 61]"),
+        ("let f = memo(fn(x) { x * 2 }, 2); f(1); f(2); f(3); f(1); f(3 / 3); " + stats, "[0, 4, 2, 1, 2]"),
+        ('let f = memo(len); f("ab"); f("ab"); f([1]); ' + stats, "[1, 1, 0, 1, 1]"),
+        ("let f = memo(memo(fn(x) { x + 1 })); [f(1), f(1)]", "[2, 2]"),
+        ("let f = memo(fn(x) { x + true }); f(1)", "ERROR: type mismatch: INTEGER + BOOLEAN"),
+        ("memo(1)", "ERROR: argument to `memo` must be FUNCTION, got INTEGER"),
+        ("memo(len, 0)", "ERROR: size given to `memo` must be a positive INTEGER, got 0"),
+        ("memo(len, 1, 2)", "ERROR: name given to `memo` must be STRING, got INTEGER"),
+        ("memo_stats(len)", "ERROR: argument to `memo_stats` must be a memoized FUNCTION, got BUILTIN"),
+    ]
+
+    for engine in ENGINES:
+        for input_, expected in tests:
+            actual = new_runner(engine)(parse(input_)).inspect()
+            assert actual == expected, f"{engine} {input_!r}: got={actual}, want={expected}"
+
+
+def test_start_with_file_reports_memo_stats(tmp_path, capsys):
+    path = tmp_path / "script.monkey"
+    path.write_text(FIB + "\nfib(30)\n")
+    for engine in ENGINES:
+        start_with_file(str(path), engine=engine, cache=False, memoize=True, memo_size=8, memo_stats=True)
+        captured = capsys.readouterr()
+        assert captured.out == "832040\n", f"{engine}: {captured.out!r}"
+        assert captured.err == "memoized functions: 1\n" \
+                               "\tfib: 28 hits, 31 misses, 23 evictions, 0 uncached, 8 entries\n", \
+            f"{engine}: {captured.err!r}"
+
+
+def parse(input_):
+    return Parser(FastLexer(input_)).parse_program()
+
+
+def describe(obj):
+    return None if obj is None else (obj.type(), obj.inspect())
@@ -0,0 +1,89 @@
+from src.ast import ast_
+from src.lexer.lexer import FastLexer
+from src.optimizer.optimizer import optimize
+from src.parser.parser import Parser
+from src.repl.repl import ENGINES, new_runner
+
+CORPUS = [
+    "5 + 5 + 5 + 5 - 10", "(5 + 10 * 2 + 15 / 3) * 2 + -10", "-5", "!!5", "!-3", "-(2 * 3)", "1 < 2", "2 > 1",
+    "1 == 1", "1 != 2", "true != false", "(1 < 2) == true", "!(1 == 2)", '"Hello" + " " + "World!"',
+    "10 / 4 * 2", "let a = 2; a * (3 + 4)",
+    "5 + true;", "-true", "!\"a\"", '"a" - "b"', '"a" == "a"', "true + false", "[1] + [2]", "-[1]",
+    "if (true) { 10 }", "if (false) { 10 }", "if (false) { 10 } else { 20 }", "if (1 < 2) { 10 } else { 20 }",
+    "if (1 > 2) { 10 }", "if (0) { 1 } else { 2 }", 'if ("") { 1 }', "if ([]) { 1 }", "if (true) { }",
+    "if (true) { let a = 1; a + 1 }", "if (true) { let a = 1; } a", "if (2 > 1) { let a = 3; } a * 2",
+    "if (false) { let a = 3; } 7", "if (true) { return 1; } 2", "if (1 > 2) { return 1; } 2",
+    "if (true) { if (false) { 1 } else { return 2; } } 3", "if (true) { 1 + true; } 5",
+    "let f = fn(x) { if (true) { let y = x * 2; } y + (1 + 1) }; f(3)",
+    "let f = fn(x) { if (1 == 1) { return x * (2 + 3); } 0 }; f(2)",
+    "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(10);",
+    "[1, 2 * 2, 3 + 3][1]", "[1, 2, 3][3]", "[1, [2, 3], \"a\"][1][0]", "[][0]", "[1, 2][-1]",
+    '{"one": 1, "two": 1 + 1}["two"]', '{"a": [1, 2]}["a"][1]', '{1: "a", true: "b"}[true]', '{1: 2}[2]',
+    '{[1]: 2}', '{"a": 1}[[1]]', '{"a": 1, "a": 2}["a"]', "let h = {}; h", "[1, true, \"x\", [2], {3: 4}]",
+    "let f = fn() { [1, 2, 3] }; len(f()) + f()[2]", "let a = [1, 2]; a == a", "[1] == [1]",
+    "let f = fn() { {\"k\": 1} }; f()[\"k\"]", "push([1, 2], 3)", "rest([1, 2, 3])",
+    "let x = 5; [x, 2][0] + {1: x}[1]", "len(\"ab\" + \"cd\")", "foobar + (1 + 2)",
+]
+
+
+def test_optimized_program_matches_unoptimized():
+    for engine in ENGINES:
+        for input_ in CORPUS:
+            expected = new_runner(engine)(parse(input_))
+            actual = new_runner(engine)(optimize(parse(input_)))
+            assert describe(actual) == describe(expected), \
+                f"{engine} {input_!r}: got={describe(actual)}, want={describe(expected)}"
+
+
+def test_optimize():
+    tests = [
+        ("(5 + 10 * 2 + 15 / 3) * 2 + -10", "50.0"),
+        ('"a" + "b" + "c"', '"abc"'),
+        ("!(1 < 2)", "false"),
+        ("x + (1 + 2)", "(x + 3)"),
+        ("1 + 2 + x", "(3 + x)"),
+        ("1 / 0", "(1 / 0)"),
+        ("1 + true", "(1 + true)"),
+        ("[10, 20][1]", "20"),
+        ('{"a": 1 + 1}["a"]', "2"),
+        ("if (1 < 2) { x } else { y }", "x"),
+        ("if (false) { x } else { y }", "y"),
+        ("if (false) { x }", "if false "),
+        ("if (true) { let a = 1; a }", "if true let a = 1;a"),
+        ("if (x) { 1 + 1 }", "if x 2"),
+        ("if (true) { let a = 1; } a", "let a = 1;a"),
+        ("if (false) { let a = 1; } a", "a"),
+        ("fn(x) { if (true) { return x; } 1 + 1 }", "fn(x) return x;2"),
+    ]
+
+    for input_, expected in tests:
+        actual = str(optimize(parse(input_)))
+        assert actual == expected, f"{input_!r}: got={actual!r}, want={expected!r}"
+
+
+def test_literals_are_built_each_time():
+    tests = [
+        ("let f = fn() { [1, 2] }; f() == f()", False),
+        ('let f = fn() { {"a": 1} }; f() != f()', True),
+        ("let f = fn(x) { [x] }; f(1) == f(1)", False),
+        ("let a = [1, 2]; a == a", True),
+    ]
+    for engine in ENGINES:
+        for input_, expected in tests:
+            for program in (parse(input_), optimize(parse(input_))):
+                result = new_runner(engine)(program)
+                assert result.value is expected, f"{engine} {program}: got={result.inspect()}, want={expected}"
+
+
+def test_folded_literals_are_literal_nodes():
+    expression = optimize(parse("2 * 3 - 1")).statements[0].expression
+    assert type(expression) is ast_.IntegerLiteral, f"got {type(expression).__name__}"
+    assert expression.constant.value == 5
+
+
+def parse(input_):
+    return Parser(FastLexer(input_)).parse_program()
+
+
+def describe(obj):
+    return None if obj is None else (obj.type(), obj.inspect())
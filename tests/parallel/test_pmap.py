@@ -0,0 +1,63 @@
+from src.budget.budget import new_budget, run_within_budget
+from src.lexer.lexer import Lexer
+from src.object.object import Error
+from src.parser.parser import Parser
+from src.repl.repl import ENGINES, new_runner
+
+
+def test_pmap():
+    tests = [
+        ("pmap(fn(x) { x * 2 }, [1, 2, 3])", "[2, 4, 6]"),
+        ("pmap(fn(x) { x * 2 }, range(10), 3)", "[0, 2, 4, 6, 8, 10, 12, 14, 16, 18]"),
+        ("pmap(fn(x) { x }, [])", "[]"),
+        ("let k = 10; pmap(fn(x) { x + k }, range(3))", "[10, 11, 12]"),
+        ("let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; pmap(fib, range(8))",
+         "[0, 1, 1, 2, 3, 5, 8, 13]"),
+        ("let add = fn(a) { fn(b) { a + b } }; pmap(add(5), [1, 2])", "[6, 7]"),
+        ('pmap(fn(h) { h["a"] }, [{"a": [1, "x"]}, {"a": true}])', "[[1, x], true]"),
+        ("pmap(len, [[1], [], [1, 2]])", "[1, 0, 2]"),
+        ("pmap(fn(x) { pmap(fn(y) { x * y }, [1, 2]) }, [1, 2])", "[[1, 2], [2, 4]]"),
+        ("pmap(fn(x) { x + true }, [1])", "ERROR: type mismatch: INTEGER + BOOLEAN"),
+        ("pmap(fn(x) { fn() { x } }, [1])", "ERROR: pmap cannot send back a value of type FUNCTION"),
+        ("pmap(1, [1])", "ERROR: first argument to `pmap` must be FUNCTION, got INTEGER"),
+        ("pmap(fn(x) { x }, 1)", "ERROR: second argument to `pmap` must be ARRAY, got INTEGER"),
+        ("pmap(fn(x) { x }, [1], 0)", "ERROR: chunk size given to `pmap` must be a positive INTEGER, got 0"),
+        ("pmap(fn(x) { x })", "ERROR: wrong number of arguments. got=1, want=2 or 3"),
+    ]
+    for engine in ENGINES:
+        for input_, expected in tests:
+            actual = run(engine, input_).inspect()
+            assert actual == expected, f"{engine} {input_!r}: got={actual}, want={expected}"
+
+
+def test_pmap_output_in_order(capsys):
+    for engine in ENGINES:
+        run(engine, "pmap(fn(x) { puts(x) }, range(6), 2)")
+        actual = capsys.readouterr().out
+        assert actual == "0\n1\n2\n3\n4\n5\n", f"{engine}: got={actual!r}"
+
+
+def test_pmap_unsendable_capture():
+    expected = "ERROR: pmap cannot send e, a value of type ERROR, to another process"
+    for engine in ENGINES:
+        actual = run(engine, "pmap(fn(x) { e }, [1])", {"e": Error("x")}).inspect()
+        assert actual == expected, f"{engine}: got={actual}, want={expected}"
+
+
+def test_pmap_spends_the_budget():
+    fib = "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; "
+    tests = [
+        (fib + "pmap(fib, [27])", {"timeout": 0.3}, "ERROR: budget exceeded: ran for more than 0.3 seconds"),
+        (fib + "pmap(fib, [15, 10], 1)", {"max_calls": 1000}, "ERROR: budget exceeded: more than 1000 calls"),
+        (fib + "pmap(fib, [10, 10], 1)", {"max_calls": 1000}, "[55, 55]"),
+    ]
+    for engine in ENGINES:
+        for input_, limits, expected in tests:
+            program = Parser(Lexer(input_)).parse_program()
+            actual = run_within_budget(new_budget(**limits), new_runner(engine), program).inspect()
+            assert actual == expected, f"{engine} {input_!r} {limits}: got={actual}, want={expected}"
+
+
+def run(engine, input_, bindings=None):
+    program = Parser(Lexer(input_)).parse_program()
+    return new_runner(engine, bindings)(program)
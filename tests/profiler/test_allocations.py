@@ -0,0 +1,77 @@
+from src.lexer.lexer import FastLexer
+from src.object.object import Array, Integer
+from src.parser.parser import Parser
+from src.profiler.allocations import TRACKED_TYPES, AllocationCounter, counting_allocations
+from src.repl.repl import ENGINES, new_runner, start_with_file
+
+# Builds a 20 element array with push, one copy per element, returning
+# through a ReturnValue at each level.
+BUILD = "let build = fn(a, n) { if (n == 0) { return a; } else { return build(push(a, n * 5000), n - 1); } };"
+
+
+def test_allocations_by_type():
+    # Each engine's (Array, ReturnValue, Environment, Frame, Integer)
+    # allocations. The evaluator wraps every return in a ReturnValue, the
+    # stack evaluator only the one not in tail position, and the VM needs
+    # neither wrappers nor environments; the closure compiler calls with
+    # Frames. Integers above 1024 are allocated, smaller ones are shared:
+    # here 5000 and the 20 products.
+    tests = {
+        "eval": (21, 21, 22, 0, 21),
+        "vm": (21, 0, 0, 0, 21),
+        "closure": (21, 21, 1, 21, 21),
+        "stack": (21, 1, 22, 0, 21),
+    }
+
+    for engine, expected in tests.items():
+        program = Parser(FastLexer(BUILD + " len(build([], 20))")).parse_program()
+        counter = AllocationCounter()
+        with counting_allocations(counter):
+            result = new_runner(engine)(program)
+        assert result.inspect() == "20", engine
+        counts = {t["type"]: t for t in counter.report()["types"]}
+        actual = tuple(counts[name]["allocated"]
+                       for name in ("Array", "ReturnValue", "Environment", "Frame", "Integer"))
+        assert actual == expected, f"{engine}: got={actual}, want={expected}"
+
+
+def test_live_and_peak_counts():
+    counter = AllocationCounter()
+    program = Parser(FastLexer(BUILD + " let kept = build([], 10); build([], 30); 1")).parse_program()
+    with counting_allocations(counter):
+        new_runner("eval")(program)
+        arrays = [t for t in counter.report()["types"] if t["type"] == "Array"][0]
+    assert (arrays["allocated"], arrays["freed"]) == (42, 41), arrays
+    # Only kept is left, but all 31 arrays of the second build were alive
+    # until its calls returned.
+    assert arrays["peak_live"] - arrays["live"] == 31, arrays
+    report = counter.report()
+    assert report["peak_bytes"] >= report["retained_bytes"] > 0, report
+
+
+def test_types_are_restored():
+    counter = AllocationCounter(trace_memory=False)
+    with counting_allocations(counter):
+        Array([])
+    Array([])
+    report = counter.report()
+    assert report["types"][0]["allocated"] == 1
+    assert report["peak_bytes"] is None and report["retained_bytes"] is None
+    for kind in TRACKED_TYPES:
+        assert "__del__" not in kind.__dict__, kind.__name__
+    assert Integer.__init__.__qualname__ == "Integer.__init__"
+
+
+def test_start_with_file_reports_allocations(tmp_path, capsys):
+    path = tmp_path / "script.monkey"
+    path.write_text(BUILD + "\nlen(build([], 5))\n")
+    for engine in ENGINES:
+        start_with_file(str(path), engine=engine, cache=False, alloc_stats=True)
+        captured = capsys.readouterr()
+        assert captured.out == "5\n", engine
+        lines = captured.err.splitlines()
+        assert lines[0].split() == ["allocated", "freed", "live", "peak", "live", "type"], lines[0]
+        allocated = {line.split()[-1]: int(line.split()[0]) for line in lines[1:-1]}
+        assert sorted(allocated) == sorted(t.__name__ for t in TRACKED_TYPES), f"{engine}: {lines}"
+        assert allocated["Array"] == 6, f"{engine}: {lines}"
+        assert lines[-1].startswith("peak bytes: "), lines[-1]
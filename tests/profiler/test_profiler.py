@@ -0,0 +1,92 @@
+import itertools
+import json
+
+from src.lexer.lexer import FastLexer
+from src.parser.parser import Parser
+from src.profiler.profiler import Profiler, profiling
+from src.repl.repl import ENGINES, new_runner, start_with_file
+
+FIB = "let fib = fn(n) {\n  if (n < 2) { n } else { fib(n - 1) + fib(n - 2) }\n};\n"
+
+# Each program, and the (function, line, column, calls) of its profile by
+# function name.
+PROGRAMS = [
+    (FIB + "fib(10)", [("fib", 1, 11, 177)]),
+    ("let twice = fn(f, x) { f(f(x)) };\ntwice(fn(x) { x * 2 }, 3)",
+     [("fn", 2, 7, 2), ("twice", 1, 13, 1)]),
+    ("let f = fn(a) { len(a) + len(push(a, 1)) }; f([1, 2]); puts(f([])); f([3])",
+     [("f", 1, 9, 3), ("len", None, None, 6), ("push", None, None, 3), ("puts", None, None, 1)]),
+    ("let f = memo(fn(n) { if (n < 2) { n } else { f(n - 1) + f(n - 2) } }); f(20)",
+     [("f", 1, 14, 21), ("memo", None, None, 1)]),
+    ("let mk = fn(x) { fn(y) { x + y } }; let add = mk(1); add(2) + add(3)",
+     [("fn", 1, 18, 2), ("mk", 1, 10, 1)]),
+    ("let f = fn(x) { x + true }; let g = fn() { f(1) }; g(); g()", [("f", 1, 9, 1), ("g", 1, 37, 1)]),
+]
+
+
+def test_profile_counts_calls():
+    for engine in ENGINES:
+        for input_, expected in PROGRAMS:
+            profiler = profile(input_, engine)
+            actual = sorted((p["function"], p["line"], p["column"], p["calls"]) for p in profiler.report())
+            assert actual == expected, f"{engine} {input_!r}: got={actual}, want={expected}"
+
+
+def test_profile_times():
+    # The clock ticks once on every call and return, and fib(2) calls
+    # fib(1) and fib(0), which take a tick each.
+    tests = [
+        ("let g = fn() { 1 }; let f = fn() { g() }; f()", {"f": (3, 2), "g": (1, 1)}),
+        (FIB + "fib(2)", {"fib": (5, 5)}),
+    ]
+
+    for engine in ENGINES:
+        for input_, expected in tests:
+            profiler = profile(input_, engine, clock=itertools.count().__next__)
+            actual = {p["function"]: (p["inclusive_seconds"], p["exclusive_seconds"]) for p in profiler.report()}
+            assert actual == expected, f"{engine} {input_!r}: got={actual}, want={expected}"
+
+
+def test_profiling_is_off_afterwards():
+    profiler = profile(FIB + "fib(5)", "closure")
+    for engine in ENGINES:
+        new_runner(engine)(Parser(FastLexer(FIB + "fib(5)")).parse_program())
+    assert profiler.report()[0]["calls"] == 15
+
+
+def test_start_with_file_writes_profile(tmp_path, capsys):
+    path = tmp_path / "script.monkey"
+    path.write_text(FIB + "puts(1);\nfib(6)\n")
+    output = tmp_path / "profile.json"
+    for engine in ENGINES:
+        start_with_file(str(path), engine=engine, cache=False, profile=True, profile_json=str(output))
+        captured = capsys.readouterr()
+        assert captured.out == "1\n8\n", f"{engine}: {captured.out!r}"
+        lines = captured.err.splitlines()
+        assert lines[0].split() == ["calls", "inclusive", "exclusive", "function"], f"{engine}: {lines[0]!r}"
+        assert [line.split()[0] + " " + " ".join(line.split()[3:]) for line in lines[1:]] == \
+               ["25 fib (1:11)", "1 puts (builtin)"], f"{engine}: {captured.err!r}"
+        report = json.loads(output.read_text())
+        assert [(p["function"], p["calls"], p["builtin"]) for p in report] == [("fib", 25, False), ("puts", 1, True)]
+
+
+def test_start_with_file_profiles_small_helpers(tmp_path, capsys):
+    path = tmp_path / "script.monkey"
+    path.write_text("let add = fn(a, b) { a + b };\n"
+                    "let loop = fn(n) { if (n == 0) { 0 } else { add(n, loop(n - 1)) } };\nloop(50)\n")
+    output = tmp_path / "profile.json"
+    for engine in ENGINES:
+        start_with_file(str(path), engine=engine, cache=False, profile_json=str(output))
+        assert capsys.readouterr().out == "1275\n", engine
+        report = json.loads(output.read_text())
+        calls = {p["function"]: p["calls"] for p in report}
+        assert calls == {"loop": 51, "add": 50}, f"{engine}: got={calls}"
+
+
+def profile(input_, engine, clock=None):
+    profiler = Profiler() if clock is None else Profiler(clock)
+    program = Parser(FastLexer(input_)).parse_program()
+    profiler.label(program)
+    with profiling(profiler):
+        new_runner(engine)(program)
+    return profiler
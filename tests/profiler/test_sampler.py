@@ -0,0 +1,74 @@
+import re
+import sys
+import threading
+
+from src.evaluator import evaluator
+from src.lexer.lexer import FastLexer
+from src.parser.parser import Parser
+from src.profiler.sampler import Sampler, sampling
+from src.repl.repl import ENGINES, new_runner, start_with_file
+
+PROGRAM = "let f = fn(n) {\n  if (n == 0) { puts(0) } else { f(n - 1) }\n};\nlet g = fn() { f(2); 1 };\ng()"
+
+
+def test_sample_records_the_monkey_call_stack(monkeypatch):
+    # f(n - 1) is a tail call, which the stack evaluator runs in the frame
+    # of the call it replaces.
+    expected = {
+        "eval": "monkey;g (4:9);f (1:9);f (1:9);f (1:9);puts",
+        "vm": "monkey;g (4:9);f (1:9);f (1:9);f (1:9);puts",
+        "closure": "monkey;g (4:9);f (1:9);f (1:9);f (1:9);puts",
+        "stack": "monkey;g (4:9);f (1:9);puts",
+    }
+
+    def sampled_puts(args):
+        sampler.sample(sys._getframe())
+        return evaluator.NULL
+
+    monkeypatch.setattr(evaluator.builtins["puts"], "fn", sampled_puts)
+    for engine in ENGINES:
+        sampler = Sampler()
+        program = Parser(FastLexer(PROGRAM)).parse_program()
+        sampler.label(program)
+        new_runner(engine)(program)
+        assert dict(sampler.stacks) == {expected[engine]: 1}, f"{engine}: got={dict(sampler.stacks)}"
+
+
+def test_sampling_from_a_thread():
+    fib = "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(17)"
+    sampler = Sampler(interval=0.001)
+
+    def run():
+        program = Parser(FastLexer(fib)).parse_program()
+        sampler.label(program)
+        with sampling(sampler):
+            new_runner("eval")(program)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    assert sampler.thread is None
+    assert sampler.stacks, "no samples taken"
+    assert all(re.fullmatch(r"monkey(;fib \(1:11\))*", stack) for stack in sampler.stacks), dict(sampler.stacks)
+
+
+def test_start_with_file_writes_collapsed_stacks(tmp_path, capsys):
+    path = tmp_path / "script.monkey"
+    path.write_text("let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };\nfib(19)\n")
+    output = tmp_path / "stacks.txt"
+    for engine in ENGINES:
+        start_with_file(str(path), engine=engine, cache=False, sample=str(output), sample_interval=0.0005)
+        assert capsys.readouterr().out == "4181\n", engine
+        lines = output.read_text().splitlines()
+        assert lines, f"{engine}: no samples taken"
+        for line in lines:
+            assert re.fullmatch(r"script\.monkey(;fib \(1:11\))* [1-9][0-9]*", line), f"{engine}: {line!r}"
+
+
+def test_interval_must_be_positive():
+    try:
+        Sampler(interval=0)
+    except ValueError as e:
+        assert str(e) == "sampling interval must be positive, got 0"
+    else:
+        raise AssertionError("no error for a zero interval")
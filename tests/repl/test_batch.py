@@ -0,0 +1,49 @@
+import io
+
+from src.repl.batch import CRASHED, MONKEY_ERROR, OK, expand_paths, run_files, write_results
+
+SCRIPTS = [
+    ("a.monkey", "let f = fn(n) { if (n < 2) { n } else { f(n - 1) + f(n - 2) } }; puts(1); f(10)", OK, "1\n55\n"),
+    ("b.monkey", "let x = 1; puts(x + 1)", OK, "2\nnull\n"),
+    ("c.monkey", "let x = 1 + true; 3", MONKEY_ERROR, "ERROR: type mismatch: INTEGER + BOOLEAN\n"),
+    ("d.monkey", "let f = fn(n) { f(n + 1) }; f(1)", CRASHED, ""),
+    ("e.monkey", "let x = 2; x * x", OK, "4\n"),
+]
+
+
+def test_run_files_in_order(tmp_path):
+    for name, source, _, _ in SCRIPTS:
+        (tmp_path / name).write_text(source)
+    filenames = expand_paths([str(tmp_path / "*.monkey")])
+    assert filenames == [str(tmp_path / name) for name, _, _, _ in SCRIPTS]
+
+    for jobs in (1, 2):
+        results = list(run_files(filenames, jobs, cache=False))
+        actual = [(r.filename, r.status, r.output) for r in results]
+        expected = [(str(tmp_path / name), status, output) for name, _, status, output in SCRIPTS]
+        assert actual == expected, f"{jobs} jobs: got={actual}"
+        assert results[3].errors.startswith("RecursionError"), results[3].errors
+        assert all(r.seconds > 0 for r in results)
+
+
+def test_expand_paths_keeps_unmatched_names(tmp_path):
+    (tmp_path / "b.monkey").write_text("1")
+    (tmp_path / "a.monkey").write_text("2")
+    patterns = [str(tmp_path / "x.monkey"), str(tmp_path / "?.monkey"), str(tmp_path / "*.txt")]
+    expected = [str(tmp_path / "x.monkey"), str(tmp_path / "a.monkey"), str(tmp_path / "b.monkey"),
+                str(tmp_path / "*.txt")]
+    assert expand_paths(patterns) == expected
+
+
+def test_write_results(tmp_path):
+    (tmp_path / "ok.monkey").write_text("puts(1); 2")
+    filenames = [str(tmp_path / "ok.monkey"), str(tmp_path / "missing.monkey")]
+    out_stream = io.StringIO()
+    err_stream = io.StringIO()
+    status = write_results(run_files(filenames, 1, cache=False), out_stream, err_stream)
+    assert status == CRASHED
+    assert out_stream.getvalue() == f"{filenames[0]} output:\n1\n2\n{filenames[1]} output:\n"
+    lines = err_stream.getvalue().splitlines()
+    assert lines[0].startswith(f"{filenames[0]}: exit 0 in ") and lines[0].endswith(" ms"), lines
+    assert lines[1].startswith("FileNotFoundError"), lines
+    assert lines[2].startswith(f"{filenames[1]}: exit 2 in "), lines
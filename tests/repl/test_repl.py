@@ -0,0 +1,66 @@
+from src.lexer.lexer import FastLexer
+from src.parser.parser import Parser
+from src.repl.repl import ENGINES, new_runner, new_statement_runner, run_statements, start_with_file
+
+INPUTS = [
+    "5; 10", "let a = 5;", "let a = 5; a * 2", "return 10; 9;", "9; return 10; 11",
+    "if (true) { return 1; } 2", "if (false) { return 1; } 2", "5 + true; 5;", "foobar; 1",
+    "let f = fn() { g() }; let g = fn() { 7 }; f()",
+    "let newAdder = fn(x) { fn(y) { x + y } }; let addTwo = newAdder(2); addTwo(3);",
+    'let h = {"a": 1}; h["a"] + len([1, 2])',
+    "let f = fn() { len([1]) }; let len = fn(x) { 42 }; f()",
+]
+
+
+def test_run_statements_matches_whole_program():
+    for engine in ENGINES:
+        for input_ in INPUTS:
+            expected = new_runner(engine)(Parser(FastLexer(input_)).parse_program())
+            actual = run_statements(Parser(FastLexer(input_)).parse_statements(), engine)
+            assert describe(actual) == describe(expected), \
+                f"{engine} {input_!r}: got={describe(actual)}, want={describe(expected)}"
+
+
+def test_statements_run_as_they_are_parsed():
+    parsed = []
+    ran = []
+
+    def statements():
+        for statement in Parser(FastLexer("puts(1); puts(2); 3")).parse_statements():
+            parsed.append(statement)
+            yield statement
+            ran.append(len(parsed))
+
+    result = run_statements(statements())
+    assert result.value == 3
+    assert ran == [1, 2, 3], f"statements ran after {ran} had been parsed"
+
+
+def test_start_with_file(tmp_path, capsys):
+    path = tmp_path / "script.monkey"
+    path.write_text("let a = 5;\nlet b = fn(x) { x * a };\nputs(b(2));\nb(3)\n")
+    for engine in ENGINES:
+        for optimize in (True, False):
+            start_with_file(str(path), engine, optimize=optimize)
+            assert capsys.readouterr().out == "10\n15\n", f"{engine} optimize={optimize}"
+
+
+def test_start_with_file_binds_builtins_late(tmp_path, capsys):
+    path = tmp_path / "script.monkey"
+    path.write_text("let f = fn() { len([1]) };\nlet len = fn(x) { 42 };\nf()\n")
+    for engine in ENGINES:
+        for cache in (True, False):
+            start_with_file(str(path), engine, cache=cache, optimize=False)
+            assert capsys.readouterr().out == "42\n", f"{engine} cache={cache}"
+
+
+def test_statement_runner_takes_bindings():
+    bindings = {"x": new_runner()(Parser(FastLexer("21")).parse_program())}
+    for engine in ENGINES:
+        statement = next(Parser(FastLexer("x * 2")).parse_statements())
+        result = new_statement_runner(engine, bindings)(statement)
+        assert describe(result) == ("INTEGER", "42"), f"{engine}: got={describe(result)}"
+
+
+def describe(obj):
+    return None if obj is None else (obj.type(), obj.inspect())
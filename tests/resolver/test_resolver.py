@@ -0,0 +1,55 @@
+from src.evaluator.closure_compiler import run
+from src.lexer.lexer import Lexer
+from src.object.environment import Environment
+from src.parser.parser import Parser
+from src.resolver.resolver import BUILTIN, GLOBAL, LOCAL, resolve
+
+
+def test_resolve_identifiers():
+    input_ = "let a = 1; let f = fn(b) { let c = 2; fn(d) { a + b + c + d + len } };"
+    program = resolve(Parser(Lexer(input_)).parse_program())
+
+    outer = program.statements[1].value
+    assert outer.frame_names == ("b", "c"), f"wrong frame names. got={outer.frame_names}"
+    assert outer.parameter_slots == [0], f"wrong parameter slots. got={outer.parameter_slots}"
+
+    inner = outer.body.statements[1].expression
+    identifiers = []
+    exp = inner.body.statements[0].expression
+    while hasattr(exp, "left"):
+        identifiers.insert(0, exp.right)
+        exp = exp.left
+    identifiers.insert(0, exp)
+
+    tests = [
+        ("a", GLOBAL, None, None),
+        ("b", LOCAL, 1, 0),
+        ("c", LOCAL, 1, 1),
+        ("d", LOCAL, 0, 0),
+        ("len", BUILTIN, None, None),
+    ]
+
+    for ident, (name, scope, depth, slot) in zip(identifiers, tests):
+        resolution = ident.resolution
+        assert ident.value == name, f"wrong identifier. got={ident.value}, want={name}"
+        assert resolution.scope == scope, f"{name}: wrong scope. got={resolution.scope}, want={scope}"
+        if scope == LOCAL:
+            assert (resolution.depth, resolution.slot) == (depth, slot), \
+                f"{name}: wrong slot. got={(resolution.depth, resolution.slot)}, want={(depth, slot)}"
+
+
+def test_resolved_programs():
+    tests = [
+        ("let x = 1; let f = fn() { let a = x; let x = 2; a + x }; f()", 3),
+        ("let f = fn(c) { if (c) { let x = 10; } x }; let x = 1; f(false)", 1),
+        ("let f = fn(a) { fn(b) { fn(c) { a + b + c } } }; f(1)(2)(3)", 6),
+        ("let f = fn() { let g = fn() { y }; let y = 2; g() }; f()", 2),
+        ("let f = fn() { len([1, 2]) }; let len = fn(x) { 99 }; f()", 99),
+        ("let f = fn(len) { len }; f(7)", 7),
+        ("let f = fn(x, x) { x }; f(1, 2)", 2),
+    ]
+
+    for input_, expected in tests:
+        program = Parser(Lexer(input_)).parse_program()
+        evaluated = run(program, Environment())
+        assert evaluated.value == expected, f"{input_!r}: got={evaluated.inspect()}, want={expected}"
@@ -0,0 +1,98 @@
+from src.compiler.compiler import Compiler
+from src.evaluator import evaluator
+from src.lexer.lexer import Lexer
+from src.object.environment import Environment
+from src.parser.parser import Parser
+from src.vm.vm import VM
+
+# Every input is run through both engines and must give the same result.
+PARITY_INPUTS = [
+    "5", "-10", "5 + 5 + 5 + 5 - 10", "2 * (5 + 10)", "(5 + 10 * 2 + 15 / 3) * 2 + -10",
+    "true", "1 < 2", "1 > 2", "1 == 1", "1 != 2", "true == false", "(1 < 2) == true",
+    "!true", "!5", "!!5",
+    "if (true) { 10 }", "if (false) { 10 }", "if (1 > 2) { 10 } else { 20 }", "if (true) { }",
+    "let a = 5; let b = a * 2; b + a", "let a = 5;",
+    "return 10; 9;", "if (10 > 1) { if (10 > 1) { return 10; } return 1; }",
+    "let identity = fn(x) { x; }; identity(5);",
+    "let identity = fn(x) { return x; }; identity(5);",
+    "let add = fn(x, y) { x + y; }; add(5 + 5, add(5, 5));",
+    "fn(x) { x; }(5)",
+    "let f = fn() { let a = 1; }; f()",
+    "let newAdder = fn(x) { fn(y) { x + y } }; let addTwo = newAdder(2); addTwo(3);",
+    "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(15);",
+    "let f = fn() { g() }; let g = fn() { 7 }; f()",
+    "let outer = fn() { let countDown = fn(x) { if (x == 0) { 0 } else { countDown(x - 1) } }; countDown(5) }; outer()",
+    '"Hello" + " " + "World!"', '"a" == "a"',
+    "[1, 2 * 2, 3 + 3]", "[1, 2, 3][1]", "[1, 2, 3][3]", "[1, 2, 3][-1]", "let a = [1, 2]; a[0] + a[1]",
+    'len("four")', "len([1, 2, 3])", "len(1)", "first([1, 2])", "last([1, 2])", "rest([1, 2, 3])",
+    "push([1], 2)", "rest([])",
+    '{"one": 1, "two": 2}', "{}[1]",
+    "5 + true;", "5 + true; 5;", "-true", "true + false;", "if (10 > 1) { true + false; }",
+    "foobar", "1(2)", "[1][true]",
+    '{"one": 1, "two": 2}["two"]', 'let h = {1: "a", true: "b", "c": 3}; h[1] + h[true]', '{1: 2}[2]', '{[1]: 2}', '{"a": 1}[fn(x) { x }]',
+    # A local read above its let is the function's own, or the next one out
+    # while it is unset.
+    "let f = fn() { let g = fn() { y }; let y = 2; g() }; f()",
+    "let f = fn() { let even = fn(n) { if (n == 0) { true } else { odd(n - 1) } }; "
+    "let odd = fn(n) { if (n == 0) { false } else { even(n - 1) } }; even(10) }; f()",
+    "let x = 1; let f = fn() { let y = x; let x = 2; y + x }; f()",
+    "let f = fn() { let y = z; let z = 2; y }; f()",
+    "let x = 1; let f = fn() { let g = fn() { x }; let a = g(); let x = 2; a + g() }; f()",
+    "let f = fn(x) { let g = fn() { let h = fn() { x }; let x = 10; h() }; g() }; f(5)",
+    "let x = 1; let f = fn(x) { x }; f(if (true) { })",
+    # A closure sees a later let of the variables it refers to.
+    "let f = fn() { let a = 1; let h = fn(x) { x + a }; let a = 100; h(5) }; f()",
+    "let f = fn(n) { let g = fn() { n }; let n = n + 1; g() }; f(1)",
+    "let f = fn(n) { let count = fn(x) { if (x == 0) { n } else { count(x - 1) } }; let g = count; "
+    "let count = fn(x) { 99 }; g(3) }; f(0)",
+    # A top-level let of a builtin's name replaces it, even for functions
+    # defined above it.
+    "let f = fn() { len([1]) }; let len = fn(x) { 42 }; f()",
+    "let f = fn() { fn() { len([1]) } }; let g = f(); let len = fn(x) { 42 }; g()",
+    "let first = 5; first",
+]
+
+
+def test_vm_matches_evaluator():
+    for input_ in PARITY_INPUTS:
+        expected = run_evaluator(input_)
+        actual = run_vm(input_)
+        assert describe(actual) == describe(expected), \
+            f"{input_!r}: vm gave {describe(actual)}, evaluator gave {describe(expected)}"
+
+
+def test_vm_deep_recursion():
+    input_ = "let count = fn(n) { if (n == 0) { 0 } else { 1 + count(n - 1) } }; count(5000);"
+    assert run_vm(input_).value == 5000
+
+
+def test_vm_keeps_globals_between_runs():
+    compiler = Compiler()
+    globals_store = None
+    for line, expected in [("let a = 2;", None), ("let b = fn(x) { a * x };", None), ("b(21)", 42)]:
+        program = Parser(Lexer(line)).parse_program()
+        compiler = Compiler(compiler.symbol_table, compiler.constants)
+        compiler.compile(program)
+        vm = VM(compiler.bytecode(), globals_store)
+        globals_store = vm.globals
+        result = vm.run()
+        if expected is not None:
+            assert result.value == expected, f"got={result.value}, want={expected}"
+
+
+def run_evaluator(input_):
+    program = Parser(Lexer(input_)).parse_program()
+    return evaluator.evaluate(program, Environment())
+
+
+def run_vm(input_):
+    program = Parser(Lexer(input_)).parse_program()
+    compiler = Compiler()
+    compiler.compile(program)
+    return VM(compiler.bytecode()).run()
+
+
+def describe(obj):
+    if obj is None:
+        return None
+    return type(obj).__name__ if obj.type() == "FUNCTION" else (obj.type(), obj.inspect())